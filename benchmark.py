@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Endpoint load generator and latency benchmark.
+Replays a JSONL of job inputs against a RunPod endpoint (or runpod_api_stub.py)
+either open-loop at a fixed arrival rate or closed-loop at a fixed concurrency,
+and prints a JSON report of queue delay, execution time, end-to-end latency
+percentiles, throughput and failure rate for comparing runs.
+
+Usage:
+    python benchmark.py --endpoint-id ID --input benchmark_jobs.jsonl --rate 0.5 --num-jobs 20
+    python benchmark.py --endpoint-id stub --api-base-url http://127.0.0.1:8000/v2 \\
+        --input benchmark_jobs.jsonl --concurrency 4 --output run.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from requests.adapters import HTTPAdapter
+
+from generate_video_client import GenerateVideoClient, WAIT_MODES
+
+logger = logging.getLogger("benchmark")
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def load_jobs(path: str) -> List[Dict[str, Any]]:
+    """Job inputs from a JSONL file; each line is {"input": {...}} or the input itself"""
+    jobs = []
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise Exception(f"{path}:{line_number}: invalid JSON: {e}")
+            jobs.append(entry.get("input", entry) if isinstance(entry, dict) else entry)
+    if not jobs:
+        raise Exception(f"No jobs in {path}")
+    return jobs
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Linear-interpolated percentile of a sorted list"""
+    if len(values) == 1:
+        return values[0]
+    rank = (len(values) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (rank - low)
+
+
+def summarize(values: List[Optional[float]]) -> Optional[Dict[str, float]]:
+    """count/mean/min/max and percentiles of the non-missing values"""
+    values = sorted(v for v in values if v is not None)
+    if not values:
+        return None
+    summary = {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 3),
+        "min": round(values[0], 3),
+        "max": round(values[-1], 3),
+    }
+    for pct in PERCENTILES:
+        summary[f"p{pct}"] = round(percentile(values, pct), 3)
+    return summary
+
+
+class Benchmark:
+    def __init__(
+        self,
+        client: GenerateVideoClient,
+        jobs: List[Dict[str, Any]],
+        num_jobs: int,
+        rate: Optional[float] = None,
+        concurrency: int = 1,
+        arrival: str = "poisson",
+        check_interval: float = 10,
+        max_wait_time: float = 1800
+    ):
+        """
+        Initialize benchmark run
+
+        Args:
+            client: Client pointed at the endpoint under test
+            jobs: Job inputs, replayed in order and cycled up to num_jobs
+            num_jobs: Jobs to send
+            rate: Open-loop arrival rate (jobs/second); None runs closed-loop
+            concurrency: Closed-loop jobs in flight
+            arrival: Open-loop inter-arrival distribution, "poisson" or "uniform"
+            check_interval: Longest status check interval (seconds)
+            max_wait_time: Per-job wait limit (seconds)
+        """
+        self.client = client
+        self.jobs = jobs
+        self.num_jobs = num_jobs
+        self.rate = rate
+        self.concurrency = concurrency
+        self.arrival = arrival
+        self.check_interval = check_interval
+        self.max_wait_time = max_wait_time
+        self.records: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def run_one(self, index: int, scheduled: float) -> None:
+        """Send one job and record its timings (latency counts from the scheduled send time)"""
+        job_input = self.jobs[index % len(self.jobs)]
+        record = {"index": index, "status": None, "job_id": None}
+        sent = time.time()
+        record["send_lag"] = round(sent - scheduled, 3)
+        try:
+            result = self.client.run_job(job_input, self.check_interval, self.max_wait_time)
+        except Exception as e:
+            result = {"error": str(e)}
+        finished = time.time()
+
+        output = result.get("output") or {}
+        record.update({
+            "status": result.get("status") or "SUBMIT_FAILED",
+            "job_id": result.get("job_id"),
+            "error": result.get("error") or (output.get("error") if isinstance(output, dict) else None),
+            "latency": round(finished - scheduled, 3),
+            "queue_delay": result["delay_time"] / 1000 if result.get("delay_time") is not None else None,
+            "execution_time": result["execution_time"] / 1000 if result.get("execution_time") is not None else None,
+            "generation_time": output.get("generation_time") if isinstance(output, dict) else None,
+        })
+        if record["status"] == "COMPLETED" and record["error"]:
+            record["status"] = "FAILED"
+
+        # The benchmark measures delivery, not storage: drop spooled videos
+        video_file = output.get("video_file") if isinstance(output, dict) else None
+        if video_file and os.path.exists(video_file):
+            os.remove(video_file)
+
+        with self._lock:
+            self.records.append(record)
+        logger.info(f"Job {index}: {record['status']} in {record['latency']:.2f}s")
+
+    def run(self) -> Dict[str, Any]:
+        start = time.time()
+        if self.rate:
+            # Open loop: send on schedule regardless of how many jobs are still running
+            with ThreadPoolExecutor(max_workers=max(1, self.num_jobs)) as pool:
+                scheduled = start
+                for index in range(self.num_jobs):
+                    delay = scheduled - time.time()
+                    if delay > 0:
+                        time.sleep(delay)
+                    pool.submit(self.run_one, index, scheduled)
+                    if self.arrival == "poisson":
+                        scheduled += random.expovariate(self.rate)
+                    else:
+                        scheduled += 1 / self.rate
+        else:
+            # Closed loop: each worker sends its next job as soon as the previous one finishes
+            counter = iter(range(self.num_jobs))
+            counter_lock = threading.Lock()
+
+            def worker():
+                while True:
+                    with counter_lock:
+                        index = next(counter, None)
+                    if index is None:
+                        return
+                    self.run_one(index, time.time())
+
+            with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+                for _ in range(self.concurrency):
+                    pool.submit(worker)
+        return self.report(time.time() - start)
+
+    def report(self, wall_time: float) -> Dict[str, Any]:
+        records = sorted(self.records, key=lambda r: r["index"])
+        completed = [r for r in records if r["status"] == "COMPLETED"]
+        statuses: Dict[str, int] = {}
+        for record in records:
+            statuses[record["status"]] = statuses.get(record["status"], 0) + 1
+
+        return {
+            "config": {
+                "mode": "open_loop" if self.rate else "closed_loop",
+                "rate": self.rate,
+                "arrival": self.arrival if self.rate else None,
+                "concurrency": None if self.rate else self.concurrency,
+                "num_jobs": self.num_jobs,
+                "wait_mode": self.client.wait_mode,
+                "endpoint": self.client.runpod_api_endpoint,
+            },
+            "wall_time": round(wall_time, 3),
+            "jobs": len(records),
+            "completed": len(completed),
+            "statuses": statuses,
+            "failure_rate": round(1 - len(completed) / len(records), 4) if records else None,
+            "throughput": round(len(completed) / wall_time, 4) if wall_time > 0 else None,
+            "latency": summarize([r["latency"] for r in completed]),
+            "queue_delay": summarize([r["queue_delay"] for r in completed]),
+            "execution_time": summarize([r["execution_time"] for r in completed]),
+            "generation_time": summarize([r["generation_time"] for r in completed]),
+            "send_lag": summarize([r["send_lag"] for r in records]),
+            "records": records,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark a generate_video endpoint")
+    parser.add_argument("--endpoint-id", required=True, help="RunPod endpoint ID")
+    parser.add_argument("--api-key", default=os.getenv("RUNPOD_API_KEY", ""), help="RunPod API key (default: $RUNPOD_API_KEY)")
+    parser.add_argument("--api-base-url", default="https://api.runpod.ai/v2", help="API base URL (runpod_api_stub.py for offline runs)")
+    parser.add_argument("--input", required=True, help="JSONL of job inputs")
+    parser.add_argument("--num-jobs", type=int, help="Jobs to send (default: one per input line)")
+    load = parser.add_mutually_exclusive_group()
+    load.add_argument("--rate", type=float, help="Open-loop arrival rate (jobs/second)")
+    load.add_argument("--concurrency", type=int, default=1, help="Closed-loop jobs in flight (default: 1)")
+    parser.add_argument("--arrival", choices=("poisson", "uniform"), default="poisson", help="Open-loop inter-arrival distribution")
+    parser.add_argument("--wait-mode", choices=WAIT_MODES, default="backoff", help="Client completion tracking")
+    parser.add_argument("--check-interval", type=float, default=10, help="Longest status check interval (seconds)")
+    parser.add_argument("--max-wait", type=float, default=1800, help="Per-job wait limit (seconds)")
+    parser.add_argument("--seed", type=int, help="Random seed for Poisson arrivals")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    parser.add_argument("--no-records", action="store_true", help="Omit per-job records from the report")
+    parser.add_argument("--verbose", action="store_true", help="Log each job and client request")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    jobs = load_jobs(args.input)
+    num_jobs = args.num_jobs or len(jobs)
+
+    client = GenerateVideoClient(
+        args.endpoint_id,
+        args.api_key,
+        api_base_url=args.api_base_url,
+        wait_mode=args.wait_mode
+    )
+    pool_size = num_jobs if args.rate else args.concurrency
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(10, pool_size))
+    client.session.mount("https://", adapter)
+    client.session.mount("http://", adapter)
+
+    benchmark = Benchmark(
+        client,
+        jobs,
+        num_jobs,
+        rate=args.rate,
+        concurrency=args.concurrency,
+        arrival=args.arrival,
+        check_interval=args.check_interval,
+        max_wait_time=args.max_wait
+    )
+    report = benchmark.run()
+    if args.no_records:
+        del report["records"]
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+    sys.exit(0 if report["completed"] == report["jobs"] else 1)
+
+
+if __name__ == "__main__":
+    main()
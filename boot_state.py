@@ -0,0 +1,90 @@
+"""
+Worker boot readiness shared by the supervisor and the handler.
+Boot phases (ComfyUI up, models present, workflow validation, warmup) run in
+parallel; each one ends as done or failed. The handler accepts jobs as soon
+as it is imported and holds each job until the phases it needs have ended,
+instead of polling ComfyUI itself.
+"""
+
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional
+
+PHASES = ("comfy", "models", "validate", "warmup")
+
+# Phases a job waits for; validation only reports, it never blocks jobs
+JOB_PHASES = ("comfy", "models", "warmup")
+
+
+class BootState:
+    def __init__(self):
+        """All phases pending until the supervisor (or start_external) ends them"""
+        self.started = time.monotonic()
+        self._phases: Dict[str, Dict[str, Any]] = {phase: {"status": "pending"} for phase in PHASES}
+        self._condition = threading.Condition()
+
+    def _set(self, phase: str, status: str, detail: Optional[str] = None) -> None:
+        with self._condition:
+            entry = {"status": status, "at": round(time.monotonic() - self.started, 3)}
+            if detail:
+                entry["detail"] = detail
+            self._phases[phase] = entry
+            self._condition.notify_all()
+
+    def begin(self, phase: str) -> None:
+        self._set(phase, "running")
+
+    def done(self, phase: str, detail: Optional[str] = None) -> None:
+        self._set(phase, "done", detail)
+
+    def fail(self, phase: str, detail: str) -> None:
+        self._set(phase, "failed", detail)
+
+    def reset(self, phase: str, detail: Optional[str] = None) -> None:
+        """Back to running (ComfyUI restarting after a crash)"""
+        self._set(phase, "running", detail)
+
+    def status(self, phase: str) -> str:
+        with self._condition:
+            return self._phases[phase]["status"]
+
+    def start_external(self) -> None:
+        """No supervisor: ComfyUI and models are managed outside this process"""
+        for phase in PHASES:
+            if self.status(phase) == "pending":
+                self.done(phase, "external")
+
+    def wait(self, phases: Iterable[str] = JOB_PHASES, timeout: Optional[float] = None) -> None:
+        """
+        Block until every phase has ended
+
+        Args:
+            phases: Phases to wait for
+            timeout: Give up after this many seconds (None = wait indefinitely)
+
+        Raises:
+            Exception: ComfyUI failed to start, or the timeout passed
+        """
+        phases = tuple(phases)
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._condition:
+            while True:
+                if self._phases.get("comfy", {}).get("status") == "failed" and "comfy" in phases:
+                    raise Exception(f"ComfyUI failed to start: {self._phases['comfy'].get('detail')}")
+                if all(self._phases[phase]["status"] in ("done", "failed") for phase in phases):
+                    return
+                wait = None
+                if deadline is not None:
+                    wait = deadline - time.monotonic()
+                    if wait <= 0:
+                        pending = [phase for phase in phases if self._phases[phase]["status"] not in ("done", "failed")]
+                        raise Exception(f"Worker not ready after {timeout}s (waiting for {', '.join(pending)})")
+                self._condition.wait(wait)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._condition:
+            return {phase: dict(entry) for phase, entry in self._phases.items()}
+
+
+# Process-wide state; the supervisor imports the handler in-process, so both see this instance
+state = BootState()
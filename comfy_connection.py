@@ -0,0 +1,327 @@
+"""
+Persistent connection to the local ComfyUI server.
+Connects once at worker start and is shared by every job: a health-checked,
+auto-reconnecting WebSocket plus a pooled keep-alive HTTP session.
+A single reader thread owns the socket and dispatches messages to
+per-prompt_id waiters, so several jobs can be queued into ComfyUI at once.
+"""
+
+import json
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import requests
+import websocket
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+
+class ComfyConnection:
+    def __init__(self, server_address: str, client_id: str, port: int = 8188):
+        """
+        Initialize ComfyUI connection (does not connect yet)
+
+        Args:
+            server_address: ComfyUI host
+            client_id: Client ID used for the WebSocket session
+            port: ComfyUI port
+        """
+        self.client_id = client_id
+        self.http_url = f"http://{server_address}:{port}"
+        self.ws_url = f"ws://{server_address}:{port}/ws?clientId={client_id}"
+
+        # Keep-alive HTTP session for /prompt and /history
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=16)
+        self.session.mount("http://", adapter)
+
+        self.ws = None
+        self.recv_timeout = 30
+        self._lock = threading.Lock()
+        self._reconnect_lock = threading.Lock()
+        self._submit_lock = threading.Lock()
+
+        # prompt_id -> queue of messages for the job waiting on it
+        self._waiters = {}
+        # Messages that arrived before their job registered (queue_prompt race)
+        self._orphans = OrderedDict()
+        self._max_orphans = 64
+        self._waiters_lock = threading.Lock()
+        self._reader = None
+        self._stopped = False
+
+    def wait_for_http(self, max_attempts: int = 180, interval: float = 1) -> None:
+        """Block until ComfyUI answers HTTP requests"""
+        for attempt in range(max_attempts):
+            try:
+                self.session.get(f"{self.http_url}/", timeout=5)
+                logger.info(f"HTTP connected (attempt {attempt+1})")
+                return
+            except requests.exceptions.RequestException:
+                if attempt == max_attempts - 1:
+                    raise Exception("ComfyUI server not reachable")
+                time.sleep(interval)
+
+    def connect(self, max_attempts: int = 36, interval: float = 5) -> None:
+        """(Re)open the WebSocket"""
+        with self._lock:
+            self._close_ws()
+            for attempt in range(max_attempts):
+                try:
+                    ws = websocket.WebSocket()
+                    ws.connect(self.ws_url, timeout=10)
+                    ws.settimeout(self.recv_timeout)
+                    self.ws = ws
+                    logger.info(f"WebSocket connected (attempt {attempt+1})")
+                    return
+                except Exception as e:
+                    if attempt == max_attempts - 1:
+                        raise Exception(f"WebSocket connection timeout: {e}")
+                    time.sleep(interval)
+
+    def start(self) -> None:
+        """Connect once at worker start"""
+        # Jobs arriving meanwhile wait in ensure_connected() and find the connection open
+        with self._reconnect_lock:
+            if not self.is_healthy():
+                self.wait_for_http()
+                self.connect()
+        self._start_reader()
+
+    def _start_reader(self) -> None:
+        if self._reader is not None and self._reader.is_alive():
+            return
+        self._stopped = False
+        self._reader = threading.Thread(target=self._reader_loop, name="comfy-ws-reader", daemon=True)
+        self._reader.start()
+
+    def is_healthy(self) -> bool:
+        """Check the WebSocket is open and still answers pings"""
+        ws = self.ws
+        if ws is None or not ws.connected:
+            return False
+        try:
+            ws.ping()
+            return True
+        except Exception as e:
+            logger.warning(f"WebSocket health check failed: {e}")
+            return False
+
+    def ensure_connected(self) -> None:
+        """Reconnect only if the cached connection went bad"""
+        if not self.is_healthy():
+            with self._reconnect_lock:
+                # Another thread may have reconnected while we waited
+                if not self.is_healthy():
+                    logger.info("🔌 Reconnecting to ComfyUI...")
+                    self.wait_for_http(max_attempts=60)
+                    self.connect(max_attempts=12, interval=1)
+        self._start_reader()
+
+    def _close_ws(self) -> None:
+        if self.ws is not None:
+            try:
+                self.ws.close()
+            except Exception:
+                pass
+            self.ws = None
+
+    def close(self) -> None:
+        self._stopped = True
+        with self._lock:
+            self._close_ws()
+        self.session.close()
+
+    def _request(self, method: str, path: str, **kwargs) -> dict:
+        """HTTP request with a single retry after a dropped keep-alive connection"""
+        url = f"{self.http_url}{path}"
+        try:
+            response = self.session.request(method, url, timeout=30, **kwargs)
+        except requests.exceptions.ConnectionError:
+            logger.warning(f"HTTP connection dropped, retrying: {url}")
+            self.wait_for_http(max_attempts=30)
+            response = self.session.request(method, url, timeout=30, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    def queue_prompt(self, prompt: dict) -> dict:
+        return self.queue_prompts([prompt])[0]
+
+    def queue_prompts(self, prompts: list) -> list:
+        """Queue prompts back to back, with no other job's prompt between them"""
+        logger.info(f"Queueing {len(prompts)} prompt(s) to: {self.http_url}/prompt")
+        with self._submit_lock:
+            return [
+                self._request("POST", "/prompt", json={"prompt": prompt, "client_id": self.client_id})
+                for prompt in prompts
+            ]
+
+    def get_history(self, prompt_id: str) -> dict:
+        return self._request("GET", f"/history/{prompt_id}")
+
+    def is_prompt_done(self, prompt_id: str) -> bool:
+        """Check /history in case completion was missed on the socket"""
+        try:
+            return prompt_id in self.get_history(prompt_id)
+        except Exception as e:
+            logger.warning(f"History check failed: {e}")
+            return False
+
+    def is_prompt_pending(self, prompt_id: str) -> bool:
+        """Check /queue for prompt_id (running or waiting); True if the check itself fails"""
+        try:
+            queue_state = self._request("GET", "/queue")
+        except Exception as e:
+            logger.warning(f"Queue check failed: {e}")
+            return True
+        for item in queue_state.get("queue_running", []) + queue_state.get("queue_pending", []):
+            if len(item) > 1 and item[1] == prompt_id:
+                return True
+        return False
+
+    def cancel_prompts(self, prompt_ids: list) -> None:
+        """Drop prompt_ids from ComfyUI's queue and interrupt whichever of them is running"""
+        try:
+            queue_state = self._request("GET", "/queue")
+            running = {item[1] for item in queue_state.get("queue_running", []) if len(item) > 1}
+            pending = {item[1] for item in queue_state.get("queue_pending", []) if len(item) > 1}
+            delete = [prompt_id for prompt_id in prompt_ids if prompt_id in pending]
+            if delete:
+                self._request("POST", "/queue", json={"delete": delete})
+            for prompt_id in prompt_ids:
+                if prompt_id in running:
+                    # The prompt_id keeps a ComfyUI that supports it from interrupting a prompt started since the check
+                    self._request("POST", "/interrupt", json={"prompt_id": prompt_id})
+            if delete or running & set(prompt_ids):
+                logger.info(f"🛑 Cancelled in ComfyUI: {len(delete)} queued, {len(running & set(prompt_ids))} running")
+        except Exception as e:
+            logger.warning(f"Could not cancel prompts {prompt_ids}: {e}")
+
+    def _reader_loop(self) -> None:
+        """Single consumer of the WebSocket; routes messages by prompt_id"""
+        while not self._stopped:
+            try:
+                out = self.ws.recv()
+                if not out and not self.ws.connected:
+                    raise websocket.WebSocketConnectionClosedException("socket closed")
+            except websocket.WebSocketTimeoutException:
+                continue
+            except Exception as e:
+                if self._stopped:
+                    return
+                logger.warning(f"WebSocket dropped ({e}), reconnecting...")
+                try:
+                    self.ensure_connected()
+                except Exception as reconnect_error:
+                    logger.error(f"❌ Reconnect failed: {reconnect_error}")
+                    time.sleep(5)
+                # Completion messages may have been lost; waiters re-check /history
+                self._broadcast({"type": "reconnected", "data": {}})
+                continue
+            # Binary frames are latent previews
+            if isinstance(out, str) and out:
+                try:
+                    self._dispatch(json.loads(out))
+                except Exception as e:
+                    logger.warning(f"Ignoring malformed ComfyUI message: {e}")
+
+    def _dispatch(self, message: dict) -> None:
+        data = message.get('data')
+        prompt_id = data.get('prompt_id') if isinstance(data, dict) else None
+        if prompt_id is None:
+            return
+        with self._waiters_lock:
+            waiter = self._waiters.get(prompt_id)
+            if waiter is not None:
+                waiter.put(message)
+                return
+            self._orphans.setdefault(prompt_id, []).append(message)
+            while len(self._orphans) > self._max_orphans:
+                self._orphans.popitem(last=False)
+
+    def _broadcast(self, message: dict) -> None:
+        with self._waiters_lock:
+            for waiter in self._waiters.values():
+                waiter.put(message)
+
+    def _register(self, prompt_id: str) -> queue.Queue:
+        waiter = queue.Queue()
+        with self._waiters_lock:
+            for message in self._orphans.pop(prompt_id, []):
+                waiter.put(message)
+            self._waiters[prompt_id] = waiter
+        return waiter
+
+    def _unregister(self, prompt_id: str) -> None:
+        with self._waiters_lock:
+            self._waiters.pop(prompt_id, None)
+
+    def wait_for_prompt(
+        self,
+        prompt_id: str,
+        on_message=None,
+        timeout: Optional[float] = None,
+        cancelled: Optional[threading.Event] = None
+    ) -> None:
+        """
+        Block until ComfyUI finishes executing prompt_id
+
+        Args:
+            prompt_id: Prompt returned by queue_prompt
+            on_message: Optional callback receiving every message for this prompt
+            timeout: Give up after this many seconds (None = wait indefinitely)
+            cancelled: Give up as soon as this event is set
+
+        Raises:
+            Exception: Execution error, interruption, timeout, cancellation or a lost prompt
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        # Polled this often while a cancel event is given
+        poll = 0.5 if cancelled is not None else self.recv_timeout
+        last_message = time.monotonic()
+        waiter = self._register(prompt_id)
+        try:
+            while True:
+                if cancelled is not None and cancelled.is_set():
+                    raise Exception(f"Prompt {prompt_id} cancelled")
+                wait = poll
+                if deadline is not None:
+                    wait = min(wait, deadline - time.monotonic())
+                    if wait <= 0:
+                        raise Exception(f"Prompt {prompt_id} did not finish within {timeout}s")
+                try:
+                    message = waiter.get(timeout=wait)
+                    last_message = time.monotonic()
+                except queue.Empty:
+                    if time.monotonic() - last_message < self.recv_timeout:
+                        continue
+                    last_message = time.monotonic()
+                    message = None
+                if message is None or message['type'] == 'reconnected':
+                    # We may have missed the final message, so confirm against /history.
+                    # /queue is checked first: a prompt leaves it only once its history is written
+                    pending = self.is_prompt_pending(prompt_id)
+                    if self.is_prompt_done(prompt_id):
+                        return
+                    if not pending:
+                        # A restarted ComfyUI has neither queue nor history for it
+                        raise Exception(f"Prompt {prompt_id} was lost by ComfyUI (server restarted?)")
+                    continue
+                if on_message is not None:
+                    on_message(message)
+                data = message['data']
+                if message['type'] == 'executing' and data.get('node') is None:
+                    return
+                if message['type'] == 'execution_interrupted':
+                    raise Exception(f"Prompt {prompt_id} was interrupted")
+                if message['type'] == 'execution_error':
+                    raise Exception(
+                        f"ComfyUI execution error in node {data.get('node_id')}: {data.get('exception_message')}"
+                    )
+        finally:
+            self._unregister(prompt_id)
@@ -0,0 +1,455 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for a ComfyUI server, for end-to-end tests without a GPU.
+Serves /, /object_info, /prompt, /history, /queue and /interrupt over HTTP
+and the /ws WebSocket (standard library only). Prompts execute node by node
+in dependency order with ComfyUI's message sequence (execution_start,
+execution_cached, executing, progress, executing None) and node caching:
+a node whose inputs match the previous prompt's is reported cached.
+Cold-start costs are emulated: model loaders take --load-time and the first
+sampler run pays --compile-time on top of --step-time per step.
+
+Usage:
+    python comfyui_stub.py --port 8188 --workflow new_CogVideoX_api.json
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import logging
+import os
+import queue
+import socket
+import struct
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+LOADER_CLASSES = ("DownloadAndLoadCogVideoModel", "CLIPLoader")
+SAMPLER_CLASSES = ("CogVideoSampler",)
+OUTPUT_CLASSES = ("VHS_VideoCombine",)
+
+
+class WebSocketClient:
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.lock = threading.Lock()
+        self.open = True
+
+    def send(self, payload: bytes, opcode: int = 0x1) -> None:
+        header = bytearray([0x80 | opcode])
+        length = len(payload)
+        if length < 126:
+            header.append(length)
+        elif length < 65536:
+            header.append(126)
+            header += struct.pack(">H", length)
+        else:
+            header.append(127)
+            header += struct.pack(">Q", length)
+        with self.lock:
+            try:
+                self.sock.sendall(bytes(header) + payload)
+            except OSError:
+                self.open = False
+
+    def send_json(self, message: Dict[str, Any]) -> None:
+        self.send(json.dumps(message).encode("utf-8"))
+
+    def _read_exact(self, n: int) -> bytes:
+        data = b""
+        while len(data) < n:
+            chunk = self.sock.recv(n - len(data))
+            if not chunk:
+                raise ConnectionError("closed")
+            data += chunk
+        return data
+
+    def serve(self) -> None:
+        """Read client frames until close; answer pings"""
+        try:
+            while self.open:
+                first, second = self._read_exact(2)
+                opcode = first & 0x0F
+                length = second & 0x7F
+                if length == 126:
+                    length = struct.unpack(">H", self._read_exact(2))[0]
+                elif length == 127:
+                    length = struct.unpack(">Q", self._read_exact(8))[0]
+                mask = self._read_exact(4) if second & 0x80 else b"\0\0\0\0"
+                payload = bytes(b ^ mask[i % 4] for i, b in enumerate(self._read_exact(length)))
+                if opcode == 0x8:
+                    self.send(payload[:2], opcode=0x8)
+                    break
+                if opcode == 0x9:
+                    self.send(payload, opcode=0xA)
+        except (ConnectionError, OSError, ValueError):
+            pass
+        self.open = False
+
+
+class ComfyStub:
+    def __init__(
+        self,
+        output_dir: str,
+        workflows: Optional[List[Dict[str, Any]]] = None,
+        step_time: float = 0.01,
+        node_time: float = 0.005,
+        load_time: float = 1.0,
+        compile_time: float = 1.0,
+        preview_method: str = "auto"
+    ):
+        """
+        Initialize stub server state
+
+        Args:
+            output_dir: Where fake output videos are written
+            workflows: API-format workflows whose node classes /object_info reports
+            step_time: Sampler seconds per step
+            node_time: Seconds for every other node
+            load_time: Seconds for model loader nodes
+            compile_time: Extra seconds for the first sampler execution
+            preview_method: "none" stops the binary latent preview frames sent per sampler step
+        """
+        self.output_dir = output_dir
+        self.step_time = step_time
+        self.node_time = node_time
+        self.load_time = load_time
+        self.compile_time = compile_time
+        self.preview_method = preview_method
+        self.object_info = self._object_info(workflows or [])
+        self.clients: Dict[str, WebSocketClient] = {}
+        self.history: Dict[str, Dict[str, Any]] = {}
+        self.pending: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+        self.queued: List[str] = []
+        self.deleted: set = set()
+        self.running: Optional[str] = None
+        self.interrupted = False
+        self.compiled = False
+        self.last_signatures: Dict[str, str] = {}
+        self.last_outputs: Dict[str, Any] = {}
+        self.counter = 0
+        self.lock = threading.Lock()
+        os.makedirs(output_dir, exist_ok=True)
+        threading.Thread(target=self._worker, daemon=True).start()
+
+    @staticmethod
+    def _object_info(workflows: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Node definitions accepting exactly the inputs the workflows use"""
+        info: Dict[str, Any] = {}
+        for workflow in workflows:
+            for node in workflow.values():
+                node_def = info.setdefault(node["class_type"], {
+                    "input": {"required": {}, "optional": {}},
+                    "output": [],
+                    "name": node["class_type"],
+                })
+                for name, value in node.get("inputs", {}).items():
+                    node_def["input"]["required"][name] = [_input_type(value), {}]
+        return info
+
+    def send(self, client_id: str, message_type: str, data: Dict[str, Any]) -> None:
+        client = self.clients.get(client_id)
+        if client is not None and client.open:
+            client.send_json({"type": message_type, "data": data})
+
+    def submit(self, prompt: Dict[str, Any], client_id: str) -> Dict[str, Any]:
+        for node_id, node in prompt.items():
+            if node.get("class_type") not in self.object_info and self.object_info:
+                return {"error": {"type": "invalid_prompt", "message": f"Unknown node {node_id}: {node.get('class_type')}"}}
+        with self.lock:
+            self.counter += 1
+            number = self.counter
+            prompt_id = str(uuid.uuid4())
+            self.queued.append(prompt_id)
+        self.pending.put({"prompt_id": prompt_id, "prompt": prompt, "client_id": client_id, "number": number})
+        return {"prompt_id": prompt_id, "number": number, "node_errors": {}}
+
+    @staticmethod
+    def _order(prompt: Dict[str, Any]) -> List[str]:
+        """Node IDs in dependency order"""
+        order: List[str] = []
+        seen = set()
+
+        def visit(node_id: str) -> None:
+            if node_id in seen:
+                return
+            seen.add(node_id)
+            for value in prompt[node_id].get("inputs", {}).values():
+                if isinstance(value, list) and len(value) == 2 and str(value[0]) in prompt:
+                    visit(str(value[0]))
+            order.append(node_id)
+
+        for node_id in sorted(prompt, key=lambda n: (0, int(n), "") if n.isdigit() else (1, 0, n)):
+            visit(node_id)
+        return order
+
+    @staticmethod
+    def _signature(prompt: Dict[str, Any], node_id: str, signatures: Dict[str, str]) -> str:
+        node = prompt[node_id]
+        inputs = {}
+        for name, value in node.get("inputs", {}).items():
+            if isinstance(value, list) and len(value) == 2 and str(value[0]) in signatures:
+                value = [signatures[str(value[0])], value[1]]
+            inputs[name] = value
+        canonical = json.dumps({"class_type": node.get("class_type"), "inputs": inputs}, sort_keys=True, default=str)
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    def _node_time(self, node: Dict[str, Any]) -> float:
+        class_type = node.get("class_type")
+        if class_type in LOADER_CLASSES:
+            return self.load_time
+        if class_type in SAMPLER_CLASSES:
+            return 0.0
+        return self.node_time
+
+    def _worker(self) -> None:
+        while True:
+            job = self.pending.get()
+            prompt_id, prompt, client_id = job["prompt_id"], job["prompt"], job["client_id"]
+            with self.lock:
+                if prompt_id in self.deleted:
+                    # Removed from the queue before it ran: no history, no messages
+                    self.deleted.discard(prompt_id)
+                    continue
+                if prompt_id in self.queued:
+                    self.queued.remove(prompt_id)
+                self.running = prompt_id
+                self.interrupted = False
+            try:
+                outputs = self._execute(prompt_id, prompt, client_id)
+                status = {"status_str": "success", "completed": True}
+            except InterruptedError:
+                outputs = {}
+                status = {"status_str": "error", "completed": False}
+                self.send(client_id, "execution_interrupted", {"prompt_id": prompt_id})
+            with self.lock:
+                self.running = None
+                self.history[prompt_id] = {"prompt": [job["number"], prompt_id, prompt], "outputs": outputs, "status": status}
+            self.send(client_id, "executing", {"node": None, "prompt_id": prompt_id})
+
+    def _execute(self, prompt_id: str, prompt: Dict[str, Any], client_id: str) -> Dict[str, Any]:
+        self.send(client_id, "execution_start", {"prompt_id": prompt_id})
+        order = self._order(prompt)
+        signatures: Dict[str, str] = {}
+        for node_id in order:
+            signatures[node_id] = self._signature(prompt, node_id, signatures)
+        cached = [node_id for node_id in order if self.last_signatures.get(node_id) == signatures[node_id]]
+        self.send(client_id, "execution_cached", {"nodes": cached, "prompt_id": prompt_id})
+
+        outputs: Dict[str, Any] = {}
+        for node_id in order:
+            if node_id in cached:
+                # Like ComfyUI, a cached output node reports its previous outputs
+                if node_id in self.last_outputs:
+                    outputs[node_id] = self.last_outputs[node_id]
+                continue
+            if self.interrupted:
+                raise InterruptedError()
+            node = prompt[node_id]
+            self.send(client_id, "executing", {"node": node_id, "display_node": node_id, "prompt_id": prompt_id})
+            time.sleep(self._node_time(node))
+            if node.get("class_type") in SAMPLER_CLASSES:
+                if not self.compiled:
+                    time.sleep(self.compile_time)
+                    self.compiled = True
+                steps = int(node["inputs"].get("steps", 1))
+                for step in range(1, steps + 1):
+                    if self.interrupted:
+                        raise InterruptedError()
+                    time.sleep(self.step_time)
+                    self.send(client_id, "progress", {"value": step, "max": steps, "prompt_id": prompt_id, "node": node_id})
+                    # Latent preview frame, like ComfyUI's binary messages
+                    client = self.clients.get(client_id)
+                    if client is not None and client.open and self.preview_method != "none":
+                        client.send(struct.pack(">II", 1, 2) + b"\xff\xd8preview", opcode=0x2)
+            if node.get("class_type") in OUTPUT_CLASSES:
+                outputs[node_id] = {"gifs": [self._write_video(node)]}
+        self.last_signatures = signatures
+        self.last_outputs = outputs
+        return outputs
+
+    def _write_video(self, node: Dict[str, Any]) -> Dict[str, Any]:
+        prefix = node["inputs"].get("filename_prefix", "stub")
+        video_format = node["inputs"].get("format", "video/h264-mp4")
+        extension = {"image/webp": "webp", "image/gif": "gif"}.get(video_format, "mp4")
+        with self.lock:
+            filename = f"{prefix}_{uuid.uuid4().hex[:8]}.{extension}"
+        fullpath = os.path.join(self.output_dir, filename)
+        with open(fullpath, "wb") as f:
+            if extension == "mp4":
+                f.write(b"\x00\x00\x00\x18ftypmp42" + os.urandom(2048))
+            else:
+                f.write(b"RIFF\x00\x00\x00\x00WEBP" if extension == "webp" else b"GIF89a")
+                f.write(os.urandom(256))
+        output_type = "output" if node["inputs"].get("save_output", True) else "temp"
+        return {"filename": filename, "subfolder": "", "type": output_type, "format": video_format, "fullpath": fullpath}
+
+    def interrupt(self, prompt_id: Optional[str] = None) -> None:
+        """Interrupt the running prompt (only if it is prompt_id, when given)"""
+        with self.lock:
+            if self.running is not None and prompt_id in (None, self.running):
+                self.interrupted = True
+
+    def delete(self, prompt_ids: List[str]) -> None:
+        """Remove queued prompts (POST /queue {"delete": [...]})"""
+        with self.lock:
+            for prompt_id in prompt_ids:
+                if prompt_id in self.queued:
+                    self.queued.remove(prompt_id)
+                    self.deleted.add(prompt_id)
+
+
+def _input_type(value: Any) -> Any:
+    """object_info type for an input as the workflow uses it (links accept anything)"""
+    if isinstance(value, bool):
+        return "BOOLEAN"
+    if isinstance(value, int):
+        return "INT"
+    if isinstance(value, float):
+        return "FLOAT"
+    if isinstance(value, str):
+        return "STRING"
+    return ["*"]
+
+
+def make_handler(stub: ComfyStub):
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+        def _send(self, code: int, data: Any) -> None:
+            body = json.dumps(data).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _body(self) -> Dict[str, Any]:
+            length = int(self.headers.get("Content-Length", 0))
+            return json.loads(self.rfile.read(length) or b"{}")
+
+        def do_GET(self):
+            path, _, query = self.path.partition("?")
+            if path == "/ws":
+                self._websocket(query)
+            elif path == "/":
+                body = b"<html>ComfyUI stub</html>"
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            elif path == "/object_info":
+                self._send(200, stub.object_info)
+            elif path.startswith("/history/"):
+                prompt_id = path[len("/history/"):]
+                entry = stub.history.get(prompt_id)
+                self._send(200, {prompt_id: entry} if entry else {})
+            elif path == "/queue":
+                running = [[0, stub.running]] if stub.running else []
+                self._send(200, {"queue_running": running, "queue_pending": [[0, p] for p in stub.queued]})
+            else:
+                self._send(404, {"error": "not found"})
+
+        def do_POST(self):
+            path = self.path.partition("?")[0]
+            if path == "/prompt":
+                body = self._body()
+                result = stub.submit(body.get("prompt", {}), body.get("client_id", ""))
+                self._send(400 if "error" in result else 200, result)
+            elif path == "/interrupt":
+                stub.interrupt(self._body().get("prompt_id"))
+                self._send(200, {})
+            elif path == "/queue":
+                body = self._body()
+                if body.get("clear"):
+                    stub.delete(list(stub.queued))
+                stub.delete(body.get("delete", []))
+                self._send(200, {})
+            else:
+                self._send(404, {"error": "not found"})
+
+        def _websocket(self, query: str) -> None:
+            params = dict(part.split("=", 1) for part in query.split("&") if "=" in part)
+            key = self.headers.get("Sec-WebSocket-Key", "")
+            accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+            self.send_response(101)
+            self.send_header("Upgrade", "websocket")
+            self.send_header("Connection", "Upgrade")
+            self.send_header("Sec-WebSocket-Accept", accept)
+            self.end_headers()
+            self.wfile.flush()
+            client = WebSocketClient(self.connection)
+            client_id = params.get("clientId", uuid.uuid4().hex)
+            stub.clients[client_id] = client
+            client.send_json({"type": "status", "data": {"status": {"exec_info": {"queue_remaining": len(stub.queued)}}, "sid": client_id}})
+            client.serve()
+            if stub.clients.get(client_id) is client:
+                del stub.clients[client_id]
+            self.close_connection = True
+
+    return StubHandler
+
+
+def serve(port: int = 8188, **kwargs) -> ThreadingHTTPServer:
+    """Start the stub in a background thread and return the server (ComfyStub arguments as kwargs)"""
+    stub = ComfyStub(**kwargs)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(stub))
+    server.daemon_threads = True
+    server.stub = stub
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logger.info(f"🧪 ComfyUI stub on http://127.0.0.1:{server.server_port}")
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local ComfyUI stub")
+    parser.add_argument("--port", type=int, default=8188)
+    parser.add_argument("--workflow", action="append", default=[], help="API-format workflow whose nodes /object_info reports (repeatable)")
+    parser.add_argument("--output-dir", default="/tmp/comfyui_stub_output")
+    parser.add_argument("--step-time", type=float, default=0.01, help="Sampler seconds per step")
+    parser.add_argument("--node-time", type=float, default=0.005, help="Seconds per other node")
+    parser.add_argument("--load-time", type=float, default=1.0, help="Seconds per model loader node")
+    parser.add_argument("--compile-time", type=float, default=1.0, help="Extra seconds for the first sampler run")
+    parser.add_argument("--startup-time", type=float, default=0.0, help="Seconds before the server listens (custom node import)")
+    parser.add_argument("--preview-method", default="auto", help="none disables latent preview frames, as in ComfyUI")
+    args = parser.parse_args()
+
+    workflows = []
+    for path in args.workflow:
+        with open(path) as f:
+            workflows.append(json.load(f))
+
+    time.sleep(args.startup_time)
+    server = serve(
+        args.port,
+        output_dir=args.output_dir,
+        workflows=workflows,
+        step_time=args.step_time,
+        node_time=args.node_time,
+        load_time=args.load_time,
+        compile_time=args.compile_time,
+        preview_method=args.preview_method
+    )
+    # The line supervisor.py watches for, as printed by ComfyUI
+    print(f"To see the GUI go to: http://127.0.0.1:{server.server_port}", flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
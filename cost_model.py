@@ -0,0 +1,394 @@
+"""
+Online runtime cost model and deadline-aware admission.
+Every finished job adds its sampler, VAE decode and remaining time to
+per-workflow/profile least-squares fits over frames, steps and cfg, with
+older jobs gradually forgotten. Each worker saves its own fits as one file
+in the COST_MODEL_PATH directory and adds up the other workers' files, so on
+a network volume estimates are shared and survive restarts. A job is
+estimated before its input is fetched.
+With a deadline_s it then runs as requested, runs with fewer steps (then
+fewer frames), or is rejected.
+"""
+
+import json
+import logging
+import os
+import socket
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Features are scaled to the production job (50 steps, 81 frames = 21 latent
+# frames, cfg on) so the ridge term treats every coefficient alike
+_REF_STEPS = 50
+_REF_LATENT = 21
+_REF_FRAMES = 81
+
+COMPONENTS = ("sampler", "vae_decode", "rest")
+
+# Sampler and decode hold the GPU; "rest" (encodes, video combine, input and
+# output delivery) mostly overlaps other jobs
+GPU_COMPONENTS = ("sampler", "vae_decode")
+
+
+def latent_frames(frames: int) -> int:
+    """CogVideoX's VAE compresses 4 frames into one latent frame (plus the first)"""
+    return (max(frames, 1) - 1) // 4 + 1
+
+
+def features(component: str, steps: int, frames: int, cfg: float) -> List[float]:
+    """
+    Regression inputs for one component
+
+    The sampler runs steps transformer passes over every latent frame, twice
+    with cfg (conditional + unconditional), and attention adds a term that
+    grows with the square of the frame count. Decode and the rest scale with frames.
+    """
+    if component == "sampler":
+        latent = latent_frames(frames) / _REF_LATENT
+        work = (steps / _REF_STEPS) * latent * (2 if cfg > 1 else 1) / 2
+        return [1.0, work, work * latent]
+    return [1.0, frames / _REF_FRAMES]
+
+
+class _Fit:
+    def __init__(self, size: int, state: Optional[Dict[str, Any]] = None):
+        """Exponentially weighted normal equations of one linear fit"""
+        self.size = size
+        self.n = 0
+        self.weight = 0.0
+        self.xtx = [[0.0] * size for _ in range(size)]
+        self.xty = [0.0] * size
+        if state and len(state.get("xty", [])) == size:
+            self.n = state["n"]
+            self.weight = state["weight"]
+            self.xtx = state["xtx"]
+            self.xty = state["xty"]
+        self._coef: Optional[List[float]] = None
+
+    def add(self, x: List[float], y: float, decay: float) -> None:
+        for i in range(self.size):
+            self.xty[i] = self.xty[i] * decay + x[i] * y
+            for j in range(self.size):
+                self.xtx[i][j] = self.xtx[i][j] * decay + x[i] * x[j]
+        self.weight = self.weight * decay + 1
+        self.n += 1
+        self._coef = None
+
+    def coef(self) -> List[float]:
+        """Ridge solution; the small ridge keeps it defined while the jobs seen are all alike"""
+        if self._coef is None:
+            ridge = 1e-3 * max(self.weight, 1e-9)
+            a = [row[:] + [self.xty[i]] for i, row in enumerate(self.xtx)]
+            for i in range(self.size):
+                a[i][i] += ridge
+            # Gaussian elimination with partial pivoting (the system is tiny)
+            for col in range(self.size):
+                pivot = max(range(col, self.size), key=lambda r: abs(a[r][col]))
+                a[col], a[pivot] = a[pivot], a[col]
+                for r in range(self.size):
+                    if r != col and a[col][col]:
+                        factor = a[r][col] / a[col][col]
+                        a[r] = [value - factor * a[col][k] for k, value in enumerate(a[r])]
+            self._coef = [a[i][-1] / a[i][i] if a[i][i] else 0.0 for i in range(self.size)]
+        return self._coef
+
+    def predict(self, x: List[float]) -> float:
+        return max(0.0, sum(c * v for c, v in zip(self.coef(), x)))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"n": self.n, "weight": self.weight, "xtx": self.xtx, "xty": self.xty}
+
+    @classmethod
+    def combine(cls, fits: List["_Fit"]) -> "_Fit":
+        """One fit over the jobs of several (the normal equations add up)"""
+        combined = cls(fits[0].size)
+        for fit in fits:
+            combined.n += fit.n
+            combined.weight += fit.weight
+            for i in range(combined.size):
+                combined.xty[i] += fit.xty[i]
+                for j in range(combined.size):
+                    combined.xtx[i][j] += fit.xtx[i][j]
+        return combined
+
+
+class CostModel:
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        worker_id: Optional[str] = None,
+        min_samples: int = 3,
+        decay: float = 0.98,
+        margin: float = 1.15,
+        min_steps: int = 20,
+        min_frames: int = 25
+    ):
+        """
+        Initialize cost model
+
+        Args:
+            path: Directory of per-worker fit files (None = in memory)
+            worker_id: Name of this worker's file (default: RUNPOD_POD_ID, else the hostname)
+            min_samples: Jobs a fit needs before it is used for estimates
+            decay: Weight kept by older jobs each time a new one is added
+            margin: Estimates are multiplied by this before comparing with a deadline
+            min_steps: Downgrades never go below this many steps
+            min_frames: Downgrades never go below this many frames
+        """
+        self.path = path
+        self.worker_id = worker_id or os.getenv("RUNPOD_POD_ID") or socket.gethostname()
+        self.min_samples = min_samples
+        self.decay = decay
+        self.margin = margin
+        self.min_steps = min_steps
+        self.min_frames = min_frames
+        # This worker's fits (the only ones it writes), and every other worker's file
+        self._fits: Dict[str, Dict[str, _Fit]] = {}
+        self._peers: Dict[str, Tuple[Tuple[float, int], Dict[str, Dict[str, _Fit]]]] = {}
+        self._combined: Dict[str, Dict[str, _Fit]] = {}
+        self._peers_read = 0.0
+        self._reserved: Dict[int, float] = {}
+        self._next_reservation = 0
+        self._lock = threading.Lock()
+        self._load()
+
+    @classmethod
+    def from_env(cls) -> "CostModel":
+        # On a network volume every worker adds to, and learns from, the same directory
+        volume = os.getenv("COST_MODEL_VOLUME", "/runpod-volume")
+        default_path = os.path.join(volume, "cost_model") if os.path.isdir(volume) else "/tmp/cost_model"
+        return cls(
+            path=os.getenv("COST_MODEL_PATH", default_path) or None,
+            min_samples=int(os.getenv("COST_MODEL_MIN_SAMPLES", "3")),
+            decay=float(os.getenv("COST_MODEL_DECAY", "0.98")),
+            margin=float(os.getenv("COST_MODEL_MARGIN", "1.15")),
+            min_steps=int(os.getenv("DEADLINE_MIN_STEPS", "20")),
+            min_frames=int(os.getenv("DEADLINE_MIN_FRAMES", "25"))
+        )
+
+    @property
+    def own_file(self) -> str:
+        return os.path.join(self.path, f"{self.worker_id}.json")
+
+    def _read(self, path: str) -> Dict[str, Dict[str, _Fit]]:
+        with open(path) as f:
+            data = json.load(f)
+        return {
+            key: {component: _Fit(len(features(component, 1, 1, 1)), components.get(component)) for component in COMPONENTS}
+            for key, components in data.get("fits", {}).items()
+        }
+
+    def _load(self) -> None:
+        if not self.path or not os.path.isdir(self.path):
+            return
+        if os.path.exists(self.own_file):
+            try:
+                self._fits = self._read(self.own_file)
+            except Exception as e:
+                logger.warning(f"Cost model {self.own_file} unreadable, starting empty: {e}")
+        self._refresh_peers()
+        keys = sorted(set(self._fits) | {key for _, fits in self._peers.values() for key in fits})
+        if keys:
+            logger.info(
+                f"📈 Cost model loaded from {self.path} ({len(self._peers)} other workers): "
+                f"{', '.join(f'{key} ({self.samples(key)} jobs)' for key in keys)}"
+            )
+
+    def _refresh_peers(self) -> None:
+        """Re-read other workers' files that changed since the last read"""
+        self._peers_read = time.monotonic()
+        try:
+            names = [name for name in os.listdir(self.path) if name.endswith(".json")]
+        except OSError:
+            return
+        seen = set()
+        for name in names:
+            path = os.path.join(self.path, name)
+            if path == self.own_file:
+                continue
+            seen.add(path)
+            try:
+                stat = os.stat(path)
+                stamp = (stat.st_mtime, stat.st_size)
+                if path in self._peers and self._peers[path][0] == stamp:
+                    continue
+                self._peers[path] = (stamp, self._read(path))
+            except Exception as e:
+                logger.warning(f"Cost model {path} skipped: {e}")
+        for path in set(self._peers) - seen:
+            del self._peers[path]
+        self._combined = {}
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        data = {"fits": {key: {component: fit.to_dict() for component, fit in fits.items()} for key, fits in self._fits.items()}}
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            # A unique temporary name in the same directory, so the rename is atomic
+            fd, tmp_path = tempfile.mkstemp(dir=self.path, prefix=f".{self.worker_id}.", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(data, f)
+                os.replace(tmp_path, self.own_file)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        except OSError as e:
+            logger.warning(f"Cost model not saved: {e}")
+
+    def _fits_for(self, key: str) -> Dict[str, _Fit]:
+        if key not in self._fits:
+            self._fits[key] = {component: _Fit(len(features(component, 1, 1, 1))) for component in COMPONENTS}
+        return self._fits[key]
+
+    def _all_fits(self, key: str) -> Optional[Dict[str, _Fit]]:
+        """This worker's fits for a key added up with every other worker's"""
+        if key not in self._combined:
+            sources = [fits[key] for fits in [self._fits] + [peer for _, peer in self._peers.values()] if key in fits]
+            self._combined[key] = {
+                component: _Fit.combine([fits[component] for fits in sources]) for component in COMPONENTS
+            } if sources else None
+        return self._combined[key]
+
+    def samples(self, key: str) -> int:
+        fits = self._all_fits(key)
+        return fits["sampler"].n if fits else 0
+
+    def observe(self, workflow: str, profile: str, steps: int, frames: int, cfg: float, seconds: Dict[str, float]) -> None:
+        """
+        Add one finished job
+
+        Args:
+            workflow: Workflow name
+            profile: Profile name
+            steps, frames, cfg: The job's parameters
+            seconds: Component -> measured seconds (components missing, e.g. cached, are skipped)
+        """
+        with self._lock:
+            # The workflow-wide fit stands in for profiles that have too few jobs yet
+            for key in (f"{workflow}/{profile}", f"{workflow}/*"):
+                fits = self._fits_for(key)
+                for component, value in seconds.items():
+                    if component in fits:
+                        fits[component].add(features(component, steps, frames, cfg), value, self.decay)
+            self._combined = {}
+            self._save()
+            if self.path:
+                self._refresh_peers()
+
+    def estimate(self, workflow: str, profile: str, steps: int, frames: int, cfg: float) -> Optional[Dict[str, Any]]:
+        """Component -> predicted seconds, or None while neither the profile nor the workflow has enough jobs"""
+        with self._lock:
+            if self.path and time.monotonic() - self._peers_read > 60:
+                self._refresh_peers()
+            for key in (f"{workflow}/{profile}", f"{workflow}/*"):
+                if self.samples(key) >= self.min_samples:
+                    fits = self._all_fits(key)
+                    estimate = {
+                        component: round(fits[component].predict(features(component, steps, frames, cfg)), 3)
+                        for component in COMPONENTS
+                    }
+                    return {**estimate, "fit": key, "samples": self.samples(key)}
+        return None
+
+    def reserve(self, seconds: float) -> int:
+        """Count an admitted job's GPU time as backlog for jobs admitted after it"""
+        with self._lock:
+            self._next_reservation += 1
+            self._reserved[self._next_reservation] = seconds
+            return self._next_reservation
+
+    def release(self, reservation: Optional[int]) -> None:
+        with self._lock:
+            self._reserved.pop(reservation, None)
+
+    def backlog(self) -> float:
+        with self._lock:
+            return sum(self._reserved.values())
+
+    def _completion(self, estimate: Dict[str, Any], backlog: float, elapsed: float) -> float:
+        return elapsed + backlog + self.margin * sum(estimate[component] for component in COMPONENTS)
+
+    def plan(
+        self,
+        workflow: str,
+        profile: str,
+        steps: int,
+        frames: int,
+        cfg: float,
+        deadline: Optional[float] = None,
+        elapsed: float = 0.0,
+        policy: str = "downgrade"
+    ) -> Dict[str, Any]:
+        """
+        Admission decision for one job
+
+        Args:
+            workflow, profile: Which fit to use
+            steps, frames, cfg: Requested parameters
+            deadline: Seconds from when the worker received the job (None = no deadline)
+            elapsed: Seconds already spent on the job (boot wait)
+            policy: "downgrade" to trade steps, then frames, for time; "reject" to only accept or reject
+
+        Returns:
+            {"decision": "accepted" | "downgraded" | "rejected" | "no_estimate",
+             "steps", "frames" (to run with), "estimate_s", "breakdown", ...}
+        """
+        decision: Dict[str, Any] = {
+            "deadline_s": deadline,
+            "policy": policy,
+            "requested": {"steps": steps, "length": frames},
+        }
+        estimate = self.estimate(workflow, profile, steps, frames, cfg)
+        if estimate is None:
+            # Nothing learned yet: run as requested rather than guess
+            return {**decision, "decision": "no_estimate", "steps": steps, "frames": frames, "estimate_s": None}
+
+        backlog = self.backlog()
+        completion = self._completion(estimate, backlog, elapsed)
+        breakdown = {**estimate, "backlog": round(backlog, 3), "elapsed": round(elapsed, 3), "margin": self.margin}
+        result = {**decision, "steps": steps, "frames": frames, "estimate_s": round(completion, 3), "breakdown": breakdown}
+        if deadline is None or completion <= deadline:
+            return {**result, "decision": "accepted"}
+        if policy != "downgrade":
+            return {**result, "decision": "rejected"}
+
+        best = self._downgrade(workflow, profile, steps, frames, cfg, deadline, backlog, elapsed)
+        if best is None:
+            return {**result, "decision": "rejected"}
+        best_steps, best_frames, best_estimate = best
+        return {
+            **result,
+            "decision": "downgraded",
+            "steps": best_steps,
+            "frames": best_frames,
+            "estimate_s": round(self._completion(best_estimate, backlog, elapsed), 3),
+            "breakdown": {**best_estimate, "backlog": round(backlog, 3), "elapsed": round(elapsed, 3), "margin": self.margin},
+        }
+
+    def _downgrade(
+        self, workflow: str, profile: str, steps: int, frames: int, cfg: float,
+        deadline: float, backlog: float, elapsed: float
+    ) -> Optional[Tuple[int, int, Dict[str, Any]]]:
+        """Most frames that fit at the lowest allowed step count, then the most steps that fit at those frames"""
+        def fits(s: int, f: int) -> Optional[Dict[str, Any]]:
+            estimate = self.estimate(workflow, profile, s, f, cfg)
+            return estimate if estimate and self._completion(estimate, backlog, elapsed) <= deadline else None
+
+        floor_steps = min(self.min_steps, steps)
+        floor_frames = min(self.min_frames, frames)
+        # Frame counts stay of the form 4k+1, as CogVideoX expects
+        candidates = [frames] + [f for f in range(frames - 1, floor_frames - 1, -1) if (f - 1) % 4 == 0]
+        for f in candidates:
+            if fits(floor_steps, f) is None:
+                continue
+            for s in range(steps, floor_steps - 1, -1):
+                estimate = fits(s, f)
+                if estimate is not None:
+                    return s, f, estimate
+        return None
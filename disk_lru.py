@@ -0,0 +1,115 @@
+"""
+Size-bounded directory of files with least-recently-used eviction.
+Shared bookkeeping for the input and result caches. Pinned files (in use
+by a running job) are skipped by eviction until they are unpinned.
+"""
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+
+class DiskLRU:
+    def __init__(self, root: str, max_bytes: int, name: str = "cache"):
+        """
+        Initialize from the files already in root (oldest mtime first)
+
+        Args:
+            root: Directory holding the files
+            max_bytes: Disk budget; LRU files are deleted beyond it
+            name: Label used in logs
+        """
+        self.root = os.path.abspath(root)
+        self.max_bytes = max_bytes
+        self.name = name
+        self.lock = threading.RLock()
+        os.makedirs(self.root, exist_ok=True)
+
+        # path -> size, ordered oldest access first
+        self._entries = OrderedDict()
+        files = []
+        for entry in os.scandir(self.root):
+            if entry.is_file() and not entry.name.startswith("."):
+                stat = entry.stat()
+                files.append((stat.st_mtime, entry.path, stat.st_size))
+        for _, path, size in sorted(files):
+            self._entries[path] = size
+        self.total_bytes = sum(self._entries.values())
+        # path -> number of holders
+        self._pins: Dict[str, int] = {}
+        logger.info(f"🗄️ {self.name}: {len(self._entries)} files, {self.total_bytes / (1024*1024):.1f}MB in {self.root}")
+
+    def __contains__(self, path: str) -> bool:
+        with self.lock:
+            return path in self._entries and os.path.exists(path)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def touch(self, path: str) -> None:
+        """Mark a file as recently used"""
+        with self.lock:
+            if path in self._entries:
+                os.utime(path, None)
+                self._entries.move_to_end(path)
+
+    def pin(self, path: str) -> bool:
+        """Protect a file from eviction until unpin(); False if it is not cached (any more)"""
+        with self.lock:
+            if path not in self._entries:
+                return False
+            self._pins[path] = self._pins.get(path, 0) + 1
+            return True
+
+    def unpin(self, path: str) -> None:
+        with self.lock:
+            count = self._pins.get(path, 0) - 1
+            if count > 0:
+                self._pins[path] = count
+            else:
+                self._pins.pop(path, None)
+            # Eviction skipped while it was pinned may be due now
+            self.evict()
+
+    def add(self, path: str) -> int:
+        """
+        Register a file just written into root and enforce the budget
+
+        Returns:
+            Bytes reclaimed by eviction
+        """
+        with self.lock:
+            size = os.path.getsize(path)
+            self.total_bytes -= self._entries.pop(path, 0)
+            self._entries[path] = size
+            self.total_bytes += size
+            return self.evict(keep=path)
+
+    def remove(self, path: str) -> int:
+        """Delete a file and forget it; returns bytes reclaimed"""
+        with self.lock:
+            size = self._entries.pop(path, 0)
+            self.total_bytes -= size
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            return size
+
+    def evict(self, keep: str = None, max_bytes: int = None) -> int:
+        """Delete least-recently-used files until under budget; returns bytes reclaimed"""
+        budget = self.max_bytes if max_bytes is None else max_bytes
+        reclaimed = 0
+        with self.lock:
+            for path in list(self._entries):
+                if self.total_bytes <= budget:
+                    break
+                if path == keep or path in self._pins:
+                    continue
+                reclaimed += self.remove(path)
+                logger.info(f"🧹 Evicted from {self.name}: {path}")
+        return reclaimed
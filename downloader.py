@@ -0,0 +1,200 @@
+"""
+In-process streaming downloader for URL inputs.
+Pooled keep-alive session, bounded timeouts and size, ranged resume with
+backoff between retries, and magic-byte sniffing of the payload.
+"""
+
+import logging
+import os
+import time
+from typing import Optional, Dict, Any
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Leading bytes -> image kind
+IMAGE_SIGNATURES = [
+    (b"\xff\xd8\xff", "jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+    (b"BM", "bmp"),
+    (b"II*\x00", "tiff"),
+    (b"MM\x00*", "tiff"),
+]
+
+
+def sniff_image_type(header: bytes) -> Optional[str]:
+    """Detect image kind from the first bytes, or None if not a known image"""
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "webp"
+    for signature, kind in IMAGE_SIGNATURES:
+        if header.startswith(signature):
+            return kind
+    return None
+
+
+class _RetryableDownloadError(Exception):
+    pass
+
+
+class Downloader:
+    def __init__(
+        self,
+        connect_timeout: float = 10,
+        read_timeout: float = 30,
+        total_timeout: float = 300,
+        max_bytes: int = 50 * 1024 * 1024,
+        max_retries: int = 3,
+        backoff: float = 1.0,
+        chunk_size: int = 64 * 1024
+    ):
+        """
+        Initialize downloader
+
+        Args:
+            connect_timeout: TCP/TLS connect timeout (seconds)
+            read_timeout: Max stall between received chunks (seconds)
+            total_timeout: Deadline for the whole download including retries (seconds)
+            max_bytes: Reject payloads larger than this
+            max_retries: Retries after the first attempt
+            backoff: Base delay for exponential backoff between retries (seconds)
+            chunk_size: Streaming chunk size (bytes)
+        """
+        self.timeout = (connect_timeout, read_timeout)
+        self.total_timeout = total_timeout
+        self.max_bytes = max_bytes
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.chunk_size = chunk_size
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=8)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    @classmethod
+    def from_env(cls) -> "Downloader":
+        return cls(
+            connect_timeout=float(os.getenv("DOWNLOAD_CONNECT_TIMEOUT", "10")),
+            read_timeout=float(os.getenv("DOWNLOAD_READ_TIMEOUT", "30")),
+            total_timeout=float(os.getenv("DOWNLOAD_TOTAL_TIMEOUT", "300")),
+            max_bytes=int(os.getenv("DOWNLOAD_MAX_BYTES", str(50 * 1024 * 1024))),
+            max_retries=int(os.getenv("DOWNLOAD_MAX_RETRIES", "3"))
+        )
+
+    def download(
+        self,
+        url: str,
+        output_path: str,
+        require_image: bool = True,
+        etag: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Stream url into output_path
+
+        Args:
+            url: Source URL
+            output_path: Destination file (written via a .part file)
+            require_image: Reject payloads that are not a known image format
+            etag: ETag of a copy we already hold; sent as If-None-Match
+
+        Returns:
+            Dict with path, size, content_type, kind and etag, or
+            {"not_modified": True} if the server answered 304 to etag
+        """
+        part_path = output_path + ".part"
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        deadline = time.monotonic() + self.total_timeout
+        validator = None
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                info = self._attempt(url, part_path, deadline, validator, require_image, etag)
+                if info.get("not_modified"):
+                    logger.info(f"✅ Not modified: {url}")
+                    return info
+                os.replace(part_path, output_path)
+                info["path"] = output_path
+                logger.info(f"✅ Downloaded: {url} -> {output_path} ({info['size'] / 1024:.0f}KB, {info['kind']})")
+                return info
+            except _RetryableDownloadError as e:
+                validator = e.args[1] if len(e.args) > 1 else validator
+                delay = self.backoff * (2 ** attempt)
+                if attempt == self.max_retries or time.monotonic() + delay >= deadline:
+                    self._cleanup(part_path)
+                    raise Exception(f"Download failed after {attempt+1} attempts: {e.args[0]}")
+                logger.warning(f"Download attempt {attempt+1} failed ({e.args[0]}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+            except Exception:
+                self._cleanup(part_path)
+                raise
+
+    def _cleanup(self, part_path: str) -> None:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+
+    def _attempt(self, url, part_path, deadline, validator, require_image, etag=None):
+        """One GET, resuming from an existing .part file when the server supports ranges"""
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {}
+        if offset and validator:
+            headers["Range"] = f"bytes={offset}-"
+            headers["If-Range"] = validator
+        elif etag:
+            headers["If-None-Match"] = etag
+
+        try:
+            with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+                if response.status_code == 304 and etag:
+                    return {"not_modified": True, "etag": etag}
+                if response.status_code == 429 or response.status_code >= 500:
+                    raise _RetryableDownloadError(f"HTTP {response.status_code}", validator)
+                if response.status_code >= 400:
+                    raise Exception(f"Download failed: HTTP {response.status_code}")
+
+                validator = response.headers.get("ETag") or response.headers.get("Last-Modified")
+                if response.status_code != 206:
+                    # Full body (first attempt, or server ignored the range)
+                    offset = 0
+                content_type = response.headers.get("Content-Type", "")
+
+                content_length = response.headers.get("Content-Length")
+                if content_length is not None and offset + int(content_length) > self.max_bytes:
+                    raise Exception(f"Download too large: {offset + int(content_length)} bytes (max {self.max_bytes})")
+
+                size = offset
+                header = b""
+                if offset:
+                    with open(part_path, "rb") as f:
+                        header = f.read(16)
+                with open(part_path, "ab" if offset else "wb") as f:
+                    for chunk in response.iter_content(chunk_size=self.chunk_size):
+                        if time.monotonic() > deadline:
+                            raise Exception(f"Download timeout after {self.total_timeout}s")
+                        if not header:
+                            header = chunk[:16]
+                            if require_image and sniff_image_type(header) is None:
+                                raise Exception(f"URL did not return an image (Content-Type: {content_type or 'unknown'})")
+                        size += len(chunk)
+                        if size > self.max_bytes:
+                            raise Exception(f"Download too large: exceeded {self.max_bytes} bytes")
+                        f.write(chunk)
+        except (requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout,
+                requests.exceptions.ChunkedEncodingError) as e:
+            raise _RetryableDownloadError(str(e), validator)
+
+        if content_length is not None and size < offset + int(content_length):
+            raise _RetryableDownloadError(f"Truncated body ({size} bytes)", validator)
+        if require_image and sniff_image_type(header) is None:
+            raise Exception("URL returned an empty or non-image body")
+        return {
+            "size": size,
+            "content_type": content_type,
+            "kind": sniff_image_type(header),
+            "etag": response.headers.get("ETag")
+        }
@@ -5,22 +5,296 @@ Client for generating videos from images using RunPod's generate_video endpoint
 """
 
 import os
+import re
 import requests
 import json
 import time
 import base64
-from typing import Optional, Dict, Any, List, Union
+import asyncio
+import hashlib
+import random
+import shutil
+import tempfile
+import threading
+import uuid
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Dict, Any, Callable, List, Tuple, Union
 import logging
+from requests.adapters import HTTPAdapter
+
+from job_journal import JobJournal, file_sha256, job_key
+
+try:
+    # Same preprocessing as the worker, so a resized upload is used there as it is
+    from image_prep import ImagePreprocessor
+except ImportError:
+    # Without Pillow (or image_prep.py next to this file) images are sent as they are
+    ImagePreprocessor = None
 
 # Logging configuration
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# auto: /runsync once completed jobs show they finish inside the runsync window, else backoff
+# poll: fixed check_interval polling of /status
+# backoff: jittered polling of /status, scheduled around the learned job duration
+# stream: /stream for incremental output, then /status for the final result
+# runsync: submit with /runsync, falling back to backoff polling if it returns unfinished
+WAIT_MODES = ("auto", "poll", "backoff", "stream", "runsync")
+
+# RunPod rejects larger request bodies
+RUN_PAYLOAD_LIMIT = 10 * 1024 * 1024
+RUNSYNC_PAYLOAD_LIMIT = 20 * 1024 * 1024
+
+_IMAGE_TYPES = {"jpeg": "image/jpeg", "png": "image/png", "webp": "image/webp"}
+
+# Placeholder left in a parsed response where a streamed "video" value was cut out
+_STREAMED_VIDEO = "__streamed_video__"
+_STRING_SPECIAL = re.compile(rb'["\\]')
+_OUTSIDE_SPECIAL = re.compile(rb'[":]')
+
+
+class _Base64FileWriter:
+    """Incremental base64 decoder writing straight to a file"""
+    
+    def __init__(self, f):
+        self.f = f
+        self.carry = b""
+        self.size = 0
+    
+    def write(self, data: bytes) -> None:
+        data = self.carry + data
+        cut = len(data) - len(data) % 4
+        if cut:
+            decoded = base64.b64decode(data[:cut])
+            self.f.write(decoded)
+            self.size += len(decoded)
+        self.carry = data[cut:]
+    
+    def close(self) -> None:
+        if self.carry:
+            # Tolerate unpadded input
+            decoded = base64.b64decode(self.carry + b"=" * (-len(self.carry) % 4))
+            self.f.write(decoded)
+            self.size += len(decoded)
+            self.carry = b""
+
+
+class _VideoFieldExtractor:
+    """
+    Incremental JSON scan of an API response. The first "video" string value is
+    decoded into a spool file as it arrives; everything else is kept for json.loads,
+    so the response body is never held in memory as a whole.
+    """
+    
+    def __init__(self, spool_dir: Optional[str] = None):
+        self.spool_dir = spool_dir
+        self.rest = bytearray()
+        self.in_string = False
+        self.escape = False
+        self.string_start = 0
+        self.last_string: Optional[bytes] = None
+        self.key: Optional[bytes] = None
+        self.streaming = False
+        self.pending_backslash = False
+        self.video_path: Optional[str] = None
+        self.file = None
+        self.writer: Optional[_Base64FileWriter] = None
+    
+    def feed(self, chunk: bytes) -> None:
+        i = 0
+        n = len(chunk)
+        while i < n:
+            if self.streaming:
+                # base64 needs no JSON escapes apart from an optional "\/"
+                j = chunk.find(b'"', i)
+                part = chunk[i:n if j < 0 else j]
+                if self.pending_backslash:
+                    part = b"\\" + part
+                    self.pending_backslash = False
+                if part.endswith(b"\\"):
+                    part = part[:-1]
+                    self.pending_backslash = True
+                self.writer.write(part.replace(b"\\/", b"/"))
+                if j < 0:
+                    return
+                self.writer.close()
+                self.file.close()
+                self.streaming = False
+                self.rest += _STREAMED_VIDEO.encode() + b'"'
+                i = j + 1
+            elif self.in_string:
+                if self.escape:
+                    self.rest += chunk[i:i + 1]
+                    self.escape = False
+                    i += 1
+                    continue
+                match = _STRING_SPECIAL.search(chunk, i)
+                if match is None:
+                    self.rest += chunk[i:]
+                    return
+                j = match.start()
+                self.rest += chunk[i:j + 1]
+                i = j + 1
+                if chunk[j] == 0x5C:
+                    self.escape = True
+                else:
+                    self.in_string = False
+                    content = self.rest[self.string_start:-1]
+                    self.last_string = bytes(content) if len(content) <= 16 else None
+            else:
+                match = _OUTSIDE_SPECIAL.search(chunk, i)
+                j = n if match is None else match.start()
+                if chunk[i:j].strip():
+                    self.key = None
+                self.rest += chunk[i:j]
+                if match is None:
+                    return
+                self.rest += chunk[j:j + 1]
+                i = j + 1
+                if chunk[j] == 0x3A:
+                    self.key = self.last_string
+                elif self.key == b"video" and self.video_path is None:
+                    self._start_video()
+                else:
+                    self.in_string = True
+                    self.string_start = len(self.rest)
+                    self.key = None
+    
+    def _start_video(self) -> None:
+        fd, self.video_path = tempfile.mkstemp(suffix=".mp4", dir=self.spool_dir)
+        self.file = os.fdopen(fd, "wb")
+        self.writer = _Base64FileWriter(self.file)
+        self.streaming = True
+    
+    def finish(self) -> Any:
+        """Parse the response; a streamed video is reported as "video_file": spool path"""
+        if self.streaming:
+            raise ValueError("Response ended inside the video field")
+        data = json.loads(bytes(self.rest))
+        if self.video_path is not None:
+            self._replace_placeholder(data)
+        return data
+    
+    def _replace_placeholder(self, node: Any) -> bool:
+        if isinstance(node, dict):
+            if node.get("video") == _STREAMED_VIDEO:
+                del node["video"]
+                node["video_file"] = self.video_path
+                return True
+            return any(self._replace_placeholder(value) for value in node.values())
+        if isinstance(node, list):
+            return any(self._replace_placeholder(value) for value in node)
+        return False
+    
+    def discard(self) -> None:
+        """Remove the spool file after a failed read"""
+        if self.file is not None:
+            self.file.close()
+        if self.video_path and os.path.exists(self.video_path):
+            os.remove(self.video_path)
+
+def redact(value: Any, limit: int = 200) -> Any:
+    """Copy of a JSON-like value with long strings (base64 images, ...) cut down, for logs"""
+    if isinstance(value, str):
+        if len(value) <= limit:
+            return value
+        return f"{value[:32]}...<{len(value)} chars>"
+    if isinstance(value, dict):
+        return {key: redact(item, limit) for key, item in value.items()}
+    if isinstance(value, list):
+        return [redact(item, limit) for item in value]
+    return value
+
+
+class LocalImageStore:
+    """
+    Upload-by-reference stand-in for an object store: images are written to a
+    directory served over HTTP, and jobs get their URL as image_url
+    """
+
+    def __init__(self, root: str, base_url: Optional[str] = None, port: int = 0):
+        """
+        Initialize local image store
+
+        Args:
+            root: Directory images are written to
+            base_url: URL the directory is already served under (None = serve it from here on port)
+            port: Port for the built-in HTTP server (0 = any free port)
+        """
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+        self.server = None
+        if base_url is None:
+            handler = partial(SimpleHTTPRequestHandler, directory=self.root)
+            handler.log_message = lambda *args: None
+            self.server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+            self.server.daemon_threads = True
+            threading.Thread(target=self.server.serve_forever, name="image-store", daemon=True).start()
+            base_url = f"http://127.0.0.1:{self.server.server_port}"
+        self.base_url = base_url.rstrip("/")
+
+    def put(self, data: bytes, name: str, content_type: str = "image/jpeg") -> str:
+        """Store data as name (content-addressed names are written once) and return its URL"""
+        path = os.path.join(self.root, name)
+        if not os.path.exists(path):
+            tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return f"{self.base_url}/{name}"
+
+    def close(self) -> None:
+        if self.server is not None:
+            self.server.shutdown()
+
+
+class S3ImageStore:
+    """Upload-by-reference to an S3-compatible bucket; jobs get a presigned URL"""
+
+    def __init__(self, storage, prefix: str = "inputs/"):
+        """
+        Initialize S3 image store
+
+        Args:
+            storage: storage.ObjectStorage for the bucket
+            prefix: Key prefix for uploaded images
+        """
+        self.storage = storage
+        self.prefix = prefix
+
+    @classmethod
+    def from_env(cls, prefix: str = "inputs/") -> Optional["S3ImageStore"]:
+        """Bucket from the BUCKET_* environment variables, or None if BUCKET_NAME is unset"""
+        from storage import ObjectStorage
+        storage = ObjectStorage.from_env()
+        return cls(storage, prefix) if storage else None
+
+    def put(self, data: bytes, name: str, content_type: str = "image/jpeg") -> str:
+        with tempfile.NamedTemporaryFile(suffix=os.path.splitext(name)[1]) as f:
+            f.write(data)
+            f.flush()
+            return self.storage.upload_file(f.name, f"{self.prefix}{name}", content_type=content_type)["url"]
+
+
 class GenerateVideoClient:
     def __init__(
         self,
         runpod_endpoint_id: str,
-        runpod_api_key: str
+        runpod_api_key: str,
+        api_base_url: str = "https://api.runpod.ai/v2",
+        wait_mode: str = "auto",
+        min_poll_interval: float = 1.0,
+        runsync_max_eta: float = 60.0,
+        stream_downloads: bool = True,
+        spool_dir: Optional[str] = None,
+        chunk_size: int = 1024 * 1024,
+        image_size: Optional[Tuple[int, int]] = (720, 480),
+        image_format: str = "jpeg",
+        image_quality: int = 95,
+        image_store=None,
+        log_field_limit: int = 200
     ):
         """
         Initialize Generate Video client
@@ -28,11 +302,50 @@ class GenerateVideoClient:
         Args:
             runpod_endpoint_id: RunPod endpoint ID
             runpod_api_key: RunPod API key
+            api_base_url: RunPod API base URL (point at runpod_api_stub.py for local testing)
+            wait_mode: Completion tracking strategy, one of WAIT_MODES
+            min_poll_interval: Shortest status poll interval (seconds)
+            runsync_max_eta: In auto mode, use /runsync when jobs are expected to finish within this (seconds)
+            stream_downloads: Decode the response "video" into a spool file while it downloads
+                (reported as output["video_file"]) instead of loading the whole body
+            spool_dir: Directory for spooled videos (default: system temp dir)
+            chunk_size: Buffer size for streaming encode/decode (bytes)
+            image_size: The endpoint workflow's input (width, height); images are resized to it
+                before upload, as the worker would (None = send images as they are)
+            image_format: Format resized images are sent in: "jpeg", "png" or "webp"
+            image_quality: JPEG/WebP quality of resized images
+            image_store: LocalImageStore/S3ImageStore (anything with put(data, name, content_type) -> url);
+                images are uploaded there and sent as image_url instead of image_base64
+            log_field_limit: Longer strings (base64 images, ...) are cut down in logs
         """
+        if wait_mode not in WAIT_MODES:
+            raise Exception(f"Unknown wait_mode '{wait_mode}'. Use one of {WAIT_MODES}")
         self.runpod_endpoint_id = runpod_endpoint_id
         self.runpod_api_key = runpod_api_key
-        self.runpod_api_endpoint = f"https://api.runpod.ai/v2/{runpod_endpoint_id}/run"
-        self.status_url = f"https://api.runpod.ai/v2/{runpod_endpoint_id}/status"
+        self.wait_mode = wait_mode
+        self.min_poll_interval = min_poll_interval
+        self.runsync_max_eta = runsync_max_eta
+        self.stream_downloads = stream_downloads
+        self.spool_dir = spool_dir
+        # Multiple of 3 and 4 so base64 chunks concatenate without padding
+        self.chunk_size = max(12, chunk_size - chunk_size % 12)
+        # Moving average of submit-to-completion time, learned from finished jobs
+        self.eta: Optional[float] = None
+        self.image_size = tuple(image_size) if image_size else None
+        self.image_store = image_store
+        self.log_field_limit = log_field_limit
+        self.preprocessor = None
+        if self.image_size and ImagePreprocessor is not None:
+            # No pixel limit here: the worker enforces its own
+            self.preprocessor = ImagePreprocessor(max_pixels=1 << 62, fmt=image_format, quality=image_quality)
+        elif self.image_size:
+            logger.warning("Pillow is not installed; images are sent at their original size")
+        
+        endpoint_url = f"{api_base_url.rstrip('/')}/{runpod_endpoint_id}"
+        self.runpod_api_endpoint = f"{endpoint_url}/run"
+        self.runsync_url = f"{endpoint_url}/runsync"
+        self.status_url = f"{endpoint_url}/status"
+        self.stream_url = f"{endpoint_url}/stream"
         
         # Initialize HTTP session
         self.session = requests.Session()
@@ -58,9 +371,14 @@ class GenerateVideoClient:
                 logger.error(f"File does not exist: {file_path}")
                 return None
             
+            parts = []
             with open(file_path, 'rb') as f:
-                file_data = f.read()
-                base64_data = base64.b64encode(file_data).decode('utf-8')
+                while True:
+                    data = f.read(self.chunk_size)
+                    if not data:
+                        break
+                    parts.append(base64.b64encode(data).decode('ascii'))
+            base64_data = ''.join(parts)
             
             logger.info(f"✅ File base64 encoding completed: {file_path}")
             return base64_data
@@ -69,6 +387,75 @@ class GenerateVideoClient:
             logger.error(f"❌ File base64 encoding failed: {e}")
             return None
     
+    def prepare_image(self, image_path: str) -> Dict[str, Any]:
+        """
+        Resize an image to image_size and encode it for the request
+        
+        Args:
+            image_path: Image file path
+        
+        Returns:
+            {"image_url": ...} with an image_store, {"image_base64": ...} without,
+            or {"error": ...} on failure
+        """
+        try:
+            with open(image_path, 'rb') as f:
+                data = f.read()
+        except OSError as e:
+            return {"error": f"Image file could not be read: {e}"}
+        
+        content_type = "application/octet-stream"
+        if self.preprocessor is not None:
+            try:
+                data, stats = self.preprocessor.prepare(data, self.image_size)
+            except Exception as e:
+                return {"error": str(e)}
+            if not stats.get("unchanged"):
+                content_type = _IMAGE_TYPES[self.preprocessor.fmt]
+            logger.info(
+                f"🖼 Image {stats['source']} ({stats['source_bytes'] / 1024:.0f}KB) -> "
+                f"{stats.get('output', 'unchanged')} ({stats['output_bytes'] / 1024:.0f}KB) in {stats['seconds']:.2f}s"
+            )
+        
+        if self.image_store is not None:
+            ext = {"image/jpeg": ".jpg", "image/png": ".png", "image/webp": ".webp"}.get(
+                content_type, os.path.splitext(image_path)[1].lower()
+            )
+            # Content-addressed, so the same image is only stored once
+            name = f"{hashlib.sha256(data).hexdigest()}{ext}"
+            try:
+                url = self.image_store.put(data, name, content_type=content_type)
+            except Exception as e:
+                return {"error": f"Image upload failed: {e}"}
+            logger.info(f"✅ Image uploaded: {url}")
+            return {"image_url": url}
+        
+        return {"image_base64": base64.b64encode(data).decode('ascii')}
+    
+    def encode_payload(self, input_data: Dict[str, Any], limit: int) -> Optional[bytes]:
+        """
+        Serialize a request body once, logging it with long fields cut down
+        
+        Args:
+            input_data: API input data
+            limit: RunPod's body size limit for the route (bytes)
+        
+        Returns:
+            JSON body, or None if it exceeds limit
+        """
+        body = json.dumps({"input": input_data}, ensure_ascii=False).encode('utf-8')
+        logger.info(
+            f"Input data ({len(body) / 1024:.0f}KB): "
+            f"{json.dumps(redact(input_data, self.log_field_limit), ensure_ascii=False)}"
+        )
+        if len(body) > limit:
+            logger.error(
+                f"❌ Request body is {len(body) / (1024*1024):.1f}MB, over RunPod's {limit / (1024*1024):.0f}MB limit; "
+                f"set image_size or pass an image_store to send the image by URL"
+            )
+            return None
+        return body
+    
     def submit_job(self, input_data: Dict[str, Any]) -> Optional[str]:
         """
         Submit job to RunPod
@@ -79,13 +466,13 @@ class GenerateVideoClient:
         Returns:
             Job ID or None (on failure)
         """
-        payload = {"input": input_data}
+        logger.info(f"Submitting job to RunPod: {self.runpod_api_endpoint}")
+        body = self.encode_payload(input_data, RUN_PAYLOAD_LIMIT)
+        if body is None:
+            return None
         
         try:
-            logger.info(f"Submitting job to RunPod: {self.runpod_api_endpoint}")
-            logger.info(f"Input data: {json.dumps(input_data, indent=2, ensure_ascii=False)}")
-            
-            response = self.session.post(self.runpod_api_endpoint, json=payload, timeout=30)
+            response = self.session.post(self.runpod_api_endpoint, data=body, timeout=30)
             response.raise_for_status()
             
             response_data = response.json()
@@ -102,58 +489,204 @@ class GenerateVideoClient:
             logger.error(f"❌ Job submission failed: {e}")
             return None
     
-    def wait_for_completion(self, job_id: str, check_interval: int = 10, max_wait_time: int = 1800) -> Dict[str, Any]:
+    def submit_job_sync(self, input_data: Dict[str, Any], timeout: int = 120):
+        """
+        Submit job to RunPod with /runsync, which holds the request open until the job finishes
+        or RunPod's sync window runs out
+        
+        Args:
+            input_data: API input data
+            timeout: HTTP read timeout (seconds)
+        
+        Returns:
+            (Job ID or None on failure, job result dictionary or None if still running)
+        """
+        logger.info(f"Submitting sync job to RunPod: {self.runsync_url}")
+        body = self.encode_payload(input_data, RUNSYNC_PAYLOAD_LIMIT)
+        if body is None:
+            return None, None
+        
+        try:
+            with self.session.post(self.runsync_url, data=body, timeout=timeout, stream=True) as response:
+                response.raise_for_status()
+                response_data = self.read_json(response)
+            job_id = response_data.get('id')
+            if not job_id:
+                logger.error(f"❌ Failed to receive Job ID: {response_data}")
+                return None, None
+            
+            logger.info(f"✅ Sync job returned (Job ID: {job_id}, Status: {response_data.get('status')})")
+            return job_id, self.job_result(job_id, response_data)
+            
+        except requests.exceptions.RequestException as e:
+            logger.error(f"❌ Sync job submission failed: {e}")
+            return None, None
+    
+    def run_job(
+        self,
+        input_data: Dict[str, Any],
+        check_interval: int = 10,
+        max_wait_time: int = 1800,
+        on_submit: Optional[Callable[[str], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Submit job and wait for it according to wait_mode
+        
+        Args:
+            input_data: API input data
+            check_interval: Longest status check interval (seconds)
+            max_wait_time: Maximum wait time (seconds)
+            on_submit: Called with the job ID as soon as RunPod assigns it
+        
+        Returns:
+            Job result dictionary
+        """
+        start_time = time.time()
+        wait_mode = self.wait_mode
+        if wait_mode == "auto":
+            wait_mode = "runsync" if self.eta is not None and self.eta <= self.runsync_max_eta else "backoff"
+        
+        if wait_mode == "runsync":
+            job_id, result = self.submit_job_sync(input_data)
+            if not job_id:
+                return {"error": "Job submission failed"}
+            if on_submit is not None:
+                on_submit(job_id)
+            if result is None:
+                remaining = max_wait_time - (time.time() - start_time)
+                result = self.wait_for_completion(job_id, check_interval, remaining, wait_mode="backoff")
+        else:
+            job_id = self.submit_job(input_data)
+            if not job_id:
+                return {"error": "Job submission failed"}
+            if on_submit is not None:
+                on_submit(job_id)
+            result = self.wait_for_completion(job_id, check_interval, max_wait_time, wait_mode=wait_mode)
+        
+        if result.get('status') == 'COMPLETED':
+            self.record_duration(time.time() - start_time)
+        return result
+    
+    def record_duration(self, duration: float) -> None:
+        """Fold a finished job's submit-to-completion time into the ETA estimate"""
+        self.eta = duration if self.eta is None else 0.7 * self.eta + 0.3 * duration
+    
+    def poll_interval(self, elapsed: float, check_interval: float, wait_mode: Optional[str] = None) -> float:
+        """
+        Seconds to sleep before the next status check
+        
+        Args:
+            elapsed: Seconds since the job was submitted
+            check_interval: Longest interval
+            wait_mode: Overrides the client's wait_mode
+        
+        Returns:
+            Sleep time (seconds)
+        """
+        if (wait_mode or self.wait_mode) == "poll":
+            return check_interval
+        
+        if self.eta is None:
+            # Geometric backoff: each sleep is a quarter of the time waited so far
+            interval = elapsed / 4
+        elif elapsed < self.eta:
+            # Close in on the expected finish time
+            interval = (self.eta - elapsed) / 2
+        else:
+            # Overdue: back off again from the expected finish time
+            interval = (elapsed - self.eta) / 4
+        interval = min(max(interval, self.min_poll_interval), check_interval)
+        # Jitter keeps many clients from polling in lockstep
+        return interval * random.uniform(0.8, 1.2)
+    
+    def wait_for_completion(
+        self,
+        job_id: str,
+        check_interval: int = 10,
+        max_wait_time: int = 1800,
+        wait_mode: Optional[str] = None
+    ) -> Dict[str, Any]:
         """
         Wait for job completion
         
         Args:
             job_id: Job ID
-            check_interval: Status check interval (seconds)
+            check_interval: Status check interval in poll mode, longest interval otherwise (seconds)
             max_wait_time: Maximum wait time (seconds)
+            wait_mode: Overrides the client's wait_mode ("stream", "poll", anything else polls with backoff)
         
         Returns:
             Job result dictionary
         """
+        wait_mode = wait_mode or self.wait_mode
+        if wait_mode == "stream":
+            return self.wait_for_stream(job_id, check_interval, max_wait_time)
+        
         start_time = time.time()
         
         while time.time() - start_time < max_wait_time:
             try:
                 logger.info(f"⏱️ Checking job status... (Job ID: {job_id})")
                 
-                response = self.session.get(f"{self.status_url}/{job_id}", timeout=30)
+                result = self.job_result(job_id, self.get_status(job_id))
+                if result is not None:
+                    return result
+                    
+            except requests.exceptions.RequestException as e:
+                logger.error(f"❌ Status check error: {e}")
+            time.sleep(self.poll_interval(time.time() - start_time, check_interval, wait_mode))
+        
+        logger.error(f"❌ Job wait timeout ({max_wait_time} seconds)")
+        return {
+            'status': 'TIMEOUT',
+            'job_id': job_id
+        }
+    
+    def wait_for_stream(self, job_id: str, check_interval: int = 10, max_wait_time: int = 1800) -> Dict[str, Any]:
+        """
+        Wait for job completion through /stream, collecting incremental outputs
+        
+        Args:
+            job_id: Job ID
+            check_interval: Longest interval between stream reads (seconds)
+            max_wait_time: Maximum wait time (seconds)
+        
+        Returns:
+            Job result dictionary (with a "stream" list if the job streamed any output)
+        """
+        start_time = time.time()
+        stream_outputs = []
+        
+        while time.time() - start_time < max_wait_time:
+            try:
+                response = self.session.get(f"{self.stream_url}/{job_id}", timeout=60)
                 response.raise_for_status()
+                stream_data = response.json()
                 
-                status_data = response.json()
-                status = status_data.get('status')
+                items = stream_data.get('stream') or []
+                for item in items:
+                    output = item.get('output')
+                    stream_outputs.append(output)
+                    if isinstance(output, dict) and output.get('status') == 'progress':
+                        logger.info(f"📡 Progress: node {output.get('node')} {output.get('value')}/{output.get('max')}")
+                    elif isinstance(output, dict):
+                        logger.info(f"📡 Stream output: {output.get('status', 'result')} ({', '.join(output)})")
+                    else:
+                        logger.info(f"📡 Stream output: {output}")
                 
-                if status == 'COMPLETED':
-                    logger.info("✅ Job completed!")
-                    return {
-                        'status': 'COMPLETED',
-                        'output': status_data.get('output'),
-                        'job_id': job_id
-                    }
-                elif status == 'FAILED':
-                    logger.error("❌ Job failed.")
-                    return {
-                        'status': 'FAILED',
-                        'error': status_data.get('error', 'Unknown error'),
-                        'job_id': job_id
-                    }
-                elif status in ['IN_QUEUE', 'IN_PROGRESS']:
-                    logger.info(f"🏃 Job in progress... (Status: {status})")
-                    time.sleep(check_interval)
-                else:
-                    logger.warning(f"❓ Unknown status: {status}")
-                    return {
-                        'status': 'UNKNOWN',
-                        'data': status_data,
-                        'job_id': job_id
-                    }
+                if stream_data.get('status') not in ['IN_QUEUE', 'IN_PROGRESS']:
+                    # The final (or aggregated) output is only reported by /status
+                    result = self.job_result(job_id, self.get_status(job_id))
+                    if result is not None:
+                        if stream_outputs:
+                            result['stream'] = stream_outputs
+                        return result
+                if items:
+                    continue
                     
             except requests.exceptions.RequestException as e:
-                logger.error(f"❌ Status check error: {e}")
-                time.sleep(check_interval)
+                logger.error(f"❌ Stream read error: {e}")
+            time.sleep(self.poll_interval(time.time() - start_time, check_interval, "backoff"))
         
         logger.error(f"❌ Job wait timeout ({max_wait_time} seconds)")
         return {
@@ -161,6 +694,91 @@ class GenerateVideoClient:
             'job_id': job_id
         }
     
+    def get_status(self, job_id: str) -> Dict[str, Any]:
+        """
+        Fetch job status once
+        
+        Args:
+            job_id: Job ID
+        
+        Returns:
+            RunPod status response
+        """
+        with self.session.get(f"{self.status_url}/{job_id}", timeout=30, stream=True) as response:
+            response.raise_for_status()
+            return self.read_json(response)
+    
+    def read_json(self, response: requests.Response) -> Dict[str, Any]:
+        """
+        Parse a JSON response, spooling any "video" value to disk as it downloads
+        
+        Args:
+            response: Response opened with stream=True
+        
+        Returns:
+            Parsed response
+        """
+        if not self.stream_downloads:
+            return response.json()
+        
+        extractor = _VideoFieldExtractor(self.spool_dir)
+        try:
+            for chunk in response.iter_content(self.chunk_size):
+                extractor.feed(chunk)
+            return extractor.finish()
+        except Exception:
+            extractor.discard()
+            raise
+    
+    def job_result(self, job_id: str, status_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Convert a status response to a job result dictionary
+        
+        Args:
+            job_id: Job ID
+            status_data: RunPod status response
+        
+        Returns:
+            Job result dictionary, or None while the job is still queued/running
+        """
+        status = status_data.get('status')
+        
+        if status == 'COMPLETED':
+            logger.info("✅ Job completed!")
+            result = {
+                'status': 'COMPLETED',
+                'output': status_data.get('output'),
+                'job_id': job_id,
+                # RunPod's queue wait and worker execution time (ms)
+                'delay_time': status_data.get('delayTime'),
+                'execution_time': status_data.get('executionTime')
+            }
+            if isinstance(result['output'], list):
+                # Streaming worker (STREAM_OUTPUT=1): progress and preview updates, then the result
+                outputs = result['output']
+                result['output'] = outputs[-1] if outputs else None
+                result['stream'] = outputs[:-1]
+            return result
+        elif status == 'FAILED':
+            logger.error("❌ Job failed.")
+            return {
+                'status': 'FAILED',
+                'error': status_data.get('error', 'Unknown error'),
+                'job_id': job_id,
+                'delay_time': status_data.get('delayTime'),
+                'execution_time': status_data.get('executionTime')
+            }
+        elif status in ['IN_QUEUE', 'IN_PROGRESS']:
+            logger.info(f"🏃 Job in progress... (Status: {status})")
+            return None
+        else:
+            logger.warning(f"❓ Unknown status: {status}")
+            return {
+                'status': 'UNKNOWN',
+                'data': status_data,
+                'job_id': job_id
+            }
+    
     def save_video_result(self, result: Dict[str, Any], output_path: str) -> bool:
         """
         Save video file from job result
@@ -177,21 +795,42 @@ class GenerateVideoClient:
                 logger.error(f"Job not completed: {result.get('status')}")
                 return False
             
-            output = result.get('output', {})
+            output = result.get('output') or {}
+            video_file = output.get('video_file')
             video_b64 = output.get('video')
+            video_url = output.get('video_url')
             
-            if not video_b64:
+            if not (video_file or video_b64 or video_url):
                 logger.error("Video data not found")
                 return False
             
             # Create directory
-            os.makedirs(os.path.dirname(output_path), exist_ok=True)
-            
-            # Decode base64 and save video
-            decoded_video = base64.b64decode(video_b64)
+            output_dir = os.path.dirname(output_path) or '.'
+            os.makedirs(output_dir, exist_ok=True)
             
-            with open(output_path, 'wb') as f:
-                f.write(decoded_video)
+            # Write next to the destination, then rename, so a failed save never leaves a partial video
+            tmp_path = os.path.join(output_dir, f".{uuid.uuid4().hex}.part")
+            try:
+                if video_file:
+                    # Already decoded to disk while the response downloaded
+                    shutil.move(video_file, tmp_path)
+                elif video_b64:
+                    with open(tmp_path, 'wb') as f:
+                        writer = _Base64FileWriter(f)
+                        for i in range(0, len(video_b64), self.chunk_size):
+                            writer.write(video_b64[i:i + self.chunk_size].encode('ascii'))
+                        writer.close()
+                else:
+                    # Presigned bucket URL; the RunPod Authorization header must not be sent with it
+                    with requests.get(video_url, stream=True, timeout=(10, 60)) as response:
+                        response.raise_for_status()
+                        with open(tmp_path, 'wb') as f:
+                            for chunk in response.iter_content(self.chunk_size):
+                                f.write(chunk)
+                os.replace(tmp_path, output_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
             
             file_size = os.path.getsize(output_path)
             logger.info(f"✅ Video saved successfully: {output_path} ({file_size / (1024*1024):.1f}MB)")
@@ -201,7 +840,7 @@ class GenerateVideoClient:
             logger.error(f"❌ Video save failed: {e}")
             return False
     
-    def create_video_from_image(
+    def build_input_data(
         self,
         image_path: str,
         prompt: str = "running man, grab the gun",
@@ -216,32 +855,19 @@ class GenerateVideoClient:
         lora_pairs: Optional[List[Dict[str, Any]]] = None
     ) -> Dict[str, Any]:
         """
-        Generate video from image
-        
-        Args:
-            image_path: Image file path
-            prompt: Prompt text
-            negative_prompt: Negative prompt to exclude unwanted elements
-            width: Output width
-            height: Output height
-            length: Number of frames
-            steps: Number of steps
-            seed: Seed value
-            cfg: CFG scale
-            context_overlap: Context overlap
-            lora_pairs: LoRA settings list (max 4)
+        Build API input data for one image
         
         Returns:
-            Job result dictionary
+            Input data dictionary, or {"error": ...} on failure
         """
         # Check file existence
         if not os.path.exists(image_path):
             return {"error": f"Image file does not exist: {image_path}"}
         
-        # Encode image to base64
-        image_base64 = self.encode_file_to_base64(image_path)
-        if not image_base64:
-            return {"error": "Image base64 encoding failed"}
+        # Resize, then base64-encode or upload the image
+        image_input = self.prepare_image(image_path)
+        if "error" in image_input:
+            return image_input
         
         # Process LoRA settings
         if lora_pairs is None:
@@ -255,7 +881,7 @@ class GenerateVideoClient:
         
         # Configure API input data
         input_data = {
-            "image_base64": image_base64,
+            **image_input,
             "prompt": prompt,
             "width": width,
             "height": height,
@@ -271,14 +897,342 @@ class GenerateVideoClient:
         if negative_prompt:
             input_data["negative_prompt"] = negative_prompt
         
+        return input_data
+    
+    def create_video_from_image(
+        self,
+        image_path: str,
+        prompt: str = "running man, grab the gun",
+        negative_prompt: Optional[str] = None,
+        width: int = 480,
+        height: int = 832,
+        length: int = 81,
+        steps: int = 10,
+        seed: int = 42,
+        cfg: float = 2.0,
+        context_overlap: int = 48,
+        lora_pairs: Optional[List[Dict[str, Any]]] = None,
+        on_submit: Optional[Callable[[str], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Generate video from image
+        
+        Args:
+            image_path: Image file path
+            prompt: Prompt text
+            negative_prompt: Negative prompt to exclude unwanted elements
+            width: Output width
+            height: Output height
+            length: Number of frames
+            steps: Number of steps
+            seed: Seed value
+            cfg: CFG scale
+            context_overlap: Context overlap
+            lora_pairs: LoRA settings list (max 4)
+            on_submit: Called with the job ID as soon as RunPod assigns it
+        
+        Returns:
+            Job result dictionary
+        """
+        input_data = self.build_input_data(
+            image_path=image_path,
+            prompt=prompt,
+            negative_prompt=negative_prompt,
+            width=width,
+            height=height,
+            length=length,
+            steps=steps,
+            seed=seed,
+            cfg=cfg,
+            context_overlap=context_overlap,
+            lora_pairs=lora_pairs
+        )
+        if "error" in input_data:
+            return input_data
+        
         # Submit job and wait
-        job_id = self.submit_job(input_data)
-        if not job_id:
-            return {"error": "Job submission failed"}
+        return self.run_job(input_data, on_submit=on_submit)
+    
+    def create_video_sweep(self, image_path: str, items: List[Dict[str, Any]], **kwargs) -> Dict[str, Any]:
+        """
+        Generate several videos from one image in a single job
+        
+        Args:
+            image_path: Image file path shared by every item
+            items: Per-item overrides, e.g. [{"seed": 1}, {"seed": 2, "prompt": "..."}]
+            **kwargs: Shared settings (same as create_video_from_image)
+        
+        Returns:
+            Job result dictionary; output["items"] holds one result per item, in order
+        """
+        input_data = self.build_input_data(image_path=image_path, **kwargs)
+        if "error" in input_data:
+            return input_data
+        input_data["items"] = items
+        return self.run_job(input_data)
+    
+    def save_item_results(self, result: Dict[str, Any], output_dir: str, name: str = "item") -> List[Optional[str]]:
+        """
+        Save each item's video of a multi-item job as <output_dir>/<name>_<index>.mp4
+        
+        Returns:
+            Saved paths in item order (None for failed items)
+        """
+        paths = []
+        for item in (result.get('output') or {}).get('items', []):
+            path = os.path.join(output_dir, f"{name}_{item['index']:03d}.mp4")
+            if item.get('status') == 'success' and self.save_video_result({'status': 'COMPLETED', 'output': item}, path):
+                paths.append(path)
+            else:
+                logger.error(f"❌ Item {item['index']}: {item.get('error', 'not saved')}")
+                paths.append(None)
+        return paths
+    
+    def list_image_files(self, image_folder_path: str, valid_extensions: tuple) -> Union[List[str], Dict[str, Any]]:
+        """
+        List image files to batch process
+        
+        Returns:
+            File names, or {"error": ...} if there is nothing to process
+        """
+        # Check path
+        if not os.path.isdir(image_folder_path):
+            return {"error": f"Image folder does not exist: {image_folder_path}"}
+        
+        # Get image file list
+        image_files = [
+            f for f in sorted(os.listdir(image_folder_path))
+            if f.lower().endswith(valid_extensions)
+        ]
+        
+        if not image_files:
+            return {"error": f"No image files to process: {image_folder_path}"}
+        return image_files
+    
+    def lookup_job(self, job_id: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """
+        Check a job submitted by an earlier run
+        
+        Args:
+            job_id: Job ID
         
-        result = self.wait_for_completion(job_id)
+        Returns:
+            (False if RunPod no longer has the job, its result dictionary or None while it is still running)
+        """
+        try:
+            result = self.job_result(job_id, self.get_status(job_id))
+        except requests.exceptions.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                logger.warning(f"Job {job_id} is no longer known to RunPod; it will be resubmitted")
+                return False, None
+            logger.error(f"❌ Status check error: {e}")
+            return True, None
+        except requests.exceptions.RequestException as e:
+            logger.error(f"❌ Status check error: {e}")
+            return True, None
+        if result is not None and result.get('status') == 'UNKNOWN':
+            # Cancelled or timed out: nothing left to wait for
+            logger.warning(f"Job {job_id} ended as {result['data'].get('status')}; it will be resubmitted")
+            return False, None
+        return True, result
+    
+    def reattach_job(self, job_id: str, check_interval: int = 10, max_wait_time: int = 1800) -> Optional[Dict[str, Any]]:
+        """
+        Wait for a job submitted by an earlier run instead of submitting it again
+        
+        Returns:
+            Job result dictionary, or None if the job has to be resubmitted
+        """
+        known, result = self.lookup_job(job_id)
+        if known and result is None:
+            result = self.wait_for_completion(job_id, check_interval, max_wait_time)
         return result
     
+    def batch_output_path(self, output_folder_path: str, filename: str) -> str:
+        """Where a batch saves the video for one source image"""
+        return os.path.join(output_folder_path, f"result_{os.path.splitext(filename)[0]}.mp4")
+    
+    def open_journal(self, output_folder_path: str, journal_path: Optional[str]) -> Optional[JobJournal]:
+        """Batch job journal (default: .jobs.sqlite in the output folder; "" disables it)"""
+        if journal_path == "":
+            return None
+        journal = JobJournal(journal_path or os.path.join(output_folder_path, ".jobs.sqlite"))
+        summary = journal.summary()
+        if summary:
+            logger.info(f"📒 Resuming from job journal {journal.path}: {summary}")
+        return journal
+    
+    def batch_tasks(self, image_folder_path: str, image_files: List[str], params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Group batch files into jobs: files with identical bytes share one job
+        
+        Returns:
+            One task per job: key, image_sha256, job_params (what the key covers) and its filenames
+        """
+        # Everything else that changes the video: the endpoint and what the image is resized to
+        job_params = {
+            **params,
+            "endpoint": self.runpod_endpoint_id,
+            "image": [self.image_size, self.preprocessor.fmt, self.preprocessor.quality] if self.preprocessor else None
+        }
+        tasks: Dict[str, Dict[str, Any]] = {}
+        for filename in image_files:
+            try:
+                image_sha256 = file_sha256(os.path.join(image_folder_path, filename), self.chunk_size)
+            except OSError as e:
+                # Left to fail in build_input_data like any unreadable image
+                logger.warning(f"[{filename}] Could not hash image: {e}")
+                tasks[f"unreadable:{filename}"] = {"key": None, "image_sha256": None, "job_params": job_params, "filenames": [filename]}
+                continue
+            key = job_key(image_sha256, job_params)
+            if key in tasks:
+                logger.info(f"♻ [{filename}] Same image as {tasks[key]['filenames'][0]}; generated once")
+                tasks[key]["filenames"].append(filename)
+            else:
+                tasks[key] = {"key": key, "image_sha256": image_sha256, "job_params": job_params, "filenames": [filename]}
+        return list(tasks.values())
+    
+    def journal_submit(self, journal: Optional[JobJournal], task: Dict[str, Any]) -> Optional[Callable[[str], None]]:
+        """on_submit callback recording a task's job ID in the journal"""
+        if journal is None or task["key"] is None:
+            return None
+        return lambda job_id: journal.submitted(
+            task["key"], task["image_sha256"], task["job_params"], task["filenames"][0], job_id
+        )
+    
+    def record_batch_result(
+        self,
+        results: Dict[str, Any],
+        filename: str,
+        result: Dict[str, Any],
+        output_folder_path: str
+    ) -> Dict[str, Any]:
+        """
+        Save one batch job's video and add its entry to the batch results
+        
+        Args:
+            results: Batch processing result dictionary (updated in place)
+            filename: Source image file name
+            result: Job result dictionary
+            output_folder_path: Folder path to save results
+        
+        Returns:
+            The added entry
+        """
+        if result.get('status') == 'COMPLETED':
+            # Save result file
+            output_filename = self.batch_output_path(output_folder_path, filename)
+            
+            if self.save_video_result(result, output_filename):
+                logger.info(f"✅ [{filename}] Processing completed")
+                results["successful"] += 1
+                entry = {
+                    "filename": filename,
+                    "status": "success",
+                    "output_file": output_filename,
+                    "job_id": result.get('job_id')
+                }
+            else:
+                logger.error(f"[{filename}] Result save failed")
+                results["failed"] += 1
+                entry = {
+                    "filename": filename,
+                    "status": "failed",
+                    "error": "Result save failed",
+                    "job_id": result.get('job_id')
+                }
+        else:
+            logger.error(f"[{filename}] Job failed: {result.get('error', 'Unknown error')}")
+            results["failed"] += 1
+            entry = {
+                "filename": filename,
+                "status": "failed",
+                "error": result.get('error', 'Unknown error'),
+                "job_id": result.get('job_id')
+            }
+        results["results"].append(entry)
+        return entry
+    
+    def record_batch_reuse(
+        self,
+        results: Dict[str, Any],
+        filename: str,
+        source_path: str,
+        job_id: Optional[str],
+        output_folder_path: str,
+        reused: str
+    ) -> None:
+        """
+        Add a batch entry whose video was already generated, copying it into place
+        
+        Args:
+            results: Batch processing result dictionary (updated in place)
+            filename: Source image file name
+            source_path: Saved video of the job that covered this image
+            job_id: That job's ID
+            output_folder_path: Folder path to save results
+            reused: "journal" (saved by an earlier run) or "duplicate" (identical image in this batch)
+        """
+        output_filename = self.batch_output_path(output_folder_path, filename)
+        try:
+            if os.path.abspath(output_filename) != os.path.abspath(source_path):
+                tmp_path = os.path.join(output_folder_path, f".{uuid.uuid4().hex}.part")
+                shutil.copyfile(source_path, tmp_path)
+                os.replace(tmp_path, output_filename)
+        except OSError as e:
+            logger.error(f"[{filename}] Copying {source_path} failed: {e}")
+            results["failed"] += 1
+            results["results"].append({"filename": filename, "status": "failed", "error": str(e), "job_id": job_id})
+            return
+        logger.info(f"⏭ [{filename}] Reused video of job {job_id} ({reused}): {output_filename}")
+        results["successful"] += 1
+        results["results"].append({
+            "filename": filename,
+            "status": "success",
+            "output_file": output_filename,
+            "job_id": job_id,
+            "reused": reused
+        })
+    
+    def reuse_batch_output(
+        self,
+        journal: Optional[JobJournal],
+        task: Dict[str, Any],
+        results: Dict[str, Any],
+        output_folder_path: str
+    ) -> bool:
+        """Record a task whose video an earlier run already saved; False if it still has to run"""
+        entry = journal.completed(task["key"]) if journal is not None and task["key"] else None
+        if entry is None:
+            return False
+        for filename in task["filenames"]:
+            self.record_batch_reuse(results, filename, entry["output_path"], entry["job_id"], output_folder_path, "journal")
+        return True
+    
+    def finish_batch_task(
+        self,
+        journal: Optional[JobJournal],
+        task: Dict[str, Any],
+        result: Dict[str, Any],
+        results: Dict[str, Any],
+        output_folder_path: str
+    ) -> None:
+        """Save a task's video, journal the outcome and cover the task's duplicate files"""
+        entry = self.record_batch_result(results, task["filenames"][0], result, output_folder_path)
+        if journal is not None and task["key"]:
+            if entry["status"] == "success":
+                journal.finished(task["key"], "completed", output_path=entry["output_file"])
+            elif result.get('status') != 'TIMEOUT':
+                journal.finished(task["key"], "failed", error=str(entry["error"]))
+            # A timed-out job may still finish; the next run reattaches to it
+        
+        for filename in task["filenames"][1:]:
+            if entry["status"] == "success":
+                self.record_batch_reuse(results, filename, entry["output_file"], entry["job_id"], output_folder_path, "duplicate")
+            else:
+                results["failed"] += 1
+                results["results"].append({**entry, "filename": filename})
+    
     def batch_process_images(
         self,
         image_folder_path: str,
@@ -293,10 +1247,14 @@ class GenerateVideoClient:
         seed: int = 42,
         cfg: float = 2.0,
         context_overlap: int = 48,
-        lora_pairs: Optional[List[Dict[str, Any]]] = None
+        lora_pairs: Optional[List[Dict[str, Any]]] = None,
+        journal_path: Optional[str] = None
     ) -> Dict[str, Any]:
         """
-        Batch process all image files in folder
+        Batch process all image files in folder.
+        Jobs are recorded in a SQLite journal, so running the same batch again
+        after a crash reuses saved videos and waits for jobs still in flight
+        instead of submitting them again. Identical images are generated once.
         
         Args:
             image_folder_path: Folder path containing image files
@@ -312,26 +1270,18 @@ class GenerateVideoClient:
             cfg: CFG scale
             context_overlap: Context overlap
             lora_pairs: LoRA settings list
+            journal_path: Job journal file (default: .jobs.sqlite in the output folder; "" disables it)
         
         Returns:
             Batch processing result dictionary
         """
-        # Check path
-        if not os.path.isdir(image_folder_path):
-            return {"error": f"Image folder does not exist: {image_folder_path}"}
+        image_files = self.list_image_files(image_folder_path, valid_extensions)
+        if isinstance(image_files, dict):
+            return image_files
         
         # Create output folder
         os.makedirs(output_folder_path, exist_ok=True)
         
-        # Get image file list
-        image_files = [
-            f for f in os.listdir(image_folder_path)
-            if f.lower().endswith(valid_extensions)
-        ]
-        
-        if not image_files:
-            return {"error": f"No image files to process: {image_folder_path}"}
-        
         logger.info(f"Starting batch processing: {len(image_files)} files")
         
         results = {
@@ -340,66 +1290,344 @@ class GenerateVideoClient:
             "failed": 0,
             "results": []
         }
+        params = {
+            "prompt": prompt,
+            "negative_prompt": negative_prompt,
+            "width": width,
+            "height": height,
+            "length": length,
+            "steps": steps,
+            "seed": seed,
+            "cfg": cfg,
+            "context_overlap": context_overlap,
+            "lora_pairs": lora_pairs
+        }
+        journal = self.open_journal(output_folder_path, journal_path)
         
-        # Process each image file
-        for filename in image_files:
-            logger.info(f"\n==================== Processing started: {filename} ====================")
-            
-            image_path = os.path.join(image_folder_path, filename)
-            
-            # Generate video
-            result = self.create_video_from_image(
-                image_path=image_path,
-                prompt=prompt,
-                negative_prompt=negative_prompt,
-                width=width,
-                height=height,
-                length=length,
-                steps=steps,
-                seed=seed,
-                cfg=cfg,
-                context_overlap=context_overlap,
-                lora_pairs=lora_pairs
-            )
-            
-            if result.get('status') == 'COMPLETED':
-                # Save result file
-                base_filename = os.path.splitext(filename)[0]
-                output_filename = os.path.join(output_folder_path, f"result_{base_filename}.mp4")
+        try:
+            # Process each distinct image
+            for task in self.batch_tasks(image_folder_path, image_files, params):
+                filename = task["filenames"][0]
+                logger.info(f"\n==================== Processing started: {filename} ====================")
                 
-                if self.save_video_result(result, output_filename):
-                    logger.info(f"✅ [{filename}] Processing completed")
-                    results["successful"] += 1
-                    results["results"].append({
-                        "filename": filename,
-                        "status": "success",
-                        "output_file": output_filename,
-                        "job_id": result.get('job_id')
-                    })
-                else:
-                    logger.error(f"[{filename}] Result save failed")
-                    results["failed"] += 1
-                    results["results"].append({
-                        "filename": filename,
-                        "status": "failed",
-                        "error": "Result save failed",
-                        "job_id": result.get('job_id')
-                    })
-            else:
-                logger.error(f"[{filename}] Job failed: {result.get('error', 'Unknown error')}")
-                results["failed"] += 1
-                results["results"].append({
-                    "filename": filename,
-                    "status": "failed",
-                    "error": result.get('error', 'Unknown error'),
-                    "job_id": result.get('job_id')
-                })
-            
-            logger.info(f"==================== Processing completed: {filename} ====================")
+                if self.reuse_batch_output(journal, task, results, output_folder_path):
+                    continue
+                
+                result = None
+                job_id = journal.in_flight(task["key"]) if journal is not None and task["key"] else None
+                if job_id:
+                    logger.info(f"🔗 [{filename}] Reattaching to job {job_id} from an earlier run")
+                    result = self.reattach_job(job_id)
+                
+                if result is None:
+                    # Generate video
+                    result = self.create_video_from_image(
+                        image_path=os.path.join(image_folder_path, filename),
+                        on_submit=self.journal_submit(journal, task),
+                        **params
+                    )
+                
+                self.finish_batch_task(journal, task, result, results, output_folder_path)
+                
+                logger.info(f"==================== Processing completed: {filename} ====================")
+        finally:
+            if journal is not None:
+                journal.close()
         
         logger.info(f"\n🎉 Batch processing completed: {results['successful']}/{results['total_files']} successful")
         return results
 
+class RateLimiter:
+    """Async token bucket limiting API requests per second to one endpoint"""
+    
+    def __init__(self, rate: float, burst: int = 1):
+        """
+        Initialize rate limiter
+        
+        Args:
+            rate: Requests per second (0 disables limiting)
+            burst: Requests allowed back-to-back before limiting kicks in
+        """
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+    
+    async def acquire(self) -> None:
+        """Wait until a request may be sent"""
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class AsyncGenerateVideoClient:
+    def __init__(
+        self,
+        runpod_endpoint_id: str,
+        runpod_api_key: str,
+        max_in_flight: int = 8,
+        requests_per_second: float = 5.0,
+        api_base_url: str = "https://api.runpod.ai/v2",
+        wait_mode: str = "backoff",
+        **client_options: Any
+    ):
+        """
+        Initialize asyncio Generate Video client
+        
+        Args:
+            runpod_endpoint_id: RunPod endpoint ID
+            runpod_api_key: RunPod API key
+            max_in_flight: Maximum jobs submitted and not yet finished
+            requests_per_second: API request rate limit for this endpoint (0 = unlimited)
+            api_base_url: RunPod API base URL
+            wait_mode: Completion tracking strategy, one of WAIT_MODES (as in GenerateVideoClient)
+            client_options: Further GenerateVideoClient options (image_size, image_store, ...)
+        """
+        self.client = GenerateVideoClient(
+            runpod_endpoint_id, runpod_api_key, api_base_url=api_base_url, wait_mode=wait_mode, **client_options
+        )
+        self.max_in_flight = max_in_flight
+        self.rate_limiter = RateLimiter(requests_per_second, burst=max(1, int(requests_per_second)))
+        
+        # One keep-alive pool shared by every in-flight job
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_in_flight)
+        self.client.session.mount("https://", adapter)
+        self.client.session.mount("http://", adapter)
+    
+    async def submit_job(self, input_data: Dict[str, Any]) -> Optional[str]:
+        """Submit job to RunPod (rate limited)"""
+        await self.rate_limiter.acquire()
+        return await asyncio.to_thread(self.client.submit_job, input_data)
+    
+    async def submit_job_sync(self, input_data: Dict[str, Any], timeout: int = 120):
+        """Submit job through /runsync (rate limited); same return value as GenerateVideoClient.submit_job_sync"""
+        await self.rate_limiter.acquire()
+        return await asyncio.to_thread(self.client.submit_job_sync, input_data, timeout)
+    
+    async def run_job(
+        self,
+        input_data: Dict[str, Any],
+        check_interval: int = 10,
+        max_wait_time: int = 1800,
+        on_submit: Optional[Callable[[str], None]] = None
+    ) -> Dict[str, Any]:
+        """Submit job and wait for it according to wait_mode (same as GenerateVideoClient.run_job)"""
+        start_time = time.time()
+        wait_mode = self.client.wait_mode
+        if wait_mode == "auto":
+            eta = self.client.eta
+            wait_mode = "runsync" if eta is not None and eta <= self.client.runsync_max_eta else "backoff"
+        
+        if wait_mode == "runsync":
+            job_id, result = await self.submit_job_sync(input_data)
+            if not job_id:
+                return {"error": "Job submission failed"}
+            if on_submit is not None:
+                await asyncio.to_thread(on_submit, job_id)
+            if result is None:
+                remaining = max_wait_time - (time.time() - start_time)
+                result = await self.wait_for_completion(job_id, check_interval, remaining, wait_mode="backoff")
+        else:
+            job_id = await self.submit_job(input_data)
+            if not job_id:
+                return {"error": "Job submission failed"}
+            if on_submit is not None:
+                await asyncio.to_thread(on_submit, job_id)
+            result = await self.wait_for_completion(job_id, check_interval, max_wait_time, wait_mode=wait_mode)
+        
+        if result.get('status') == 'COMPLETED':
+            self.client.record_duration(time.time() - start_time)
+        return result
+    
+    async def wait_for_completion(
+        self,
+        job_id: str,
+        check_interval: int = 10,
+        max_wait_time: int = 1800,
+        wait_mode: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Wait for job completion without blocking other jobs
+        
+        Args:
+            job_id: Job ID
+            check_interval: Status check interval in poll mode, longest interval otherwise (seconds)
+            max_wait_time: Maximum wait time (seconds)
+            wait_mode: Overrides the client's wait_mode ("stream", "poll", anything else polls with backoff)
+        
+        Returns:
+            Job result dictionary
+        """
+        wait_mode = wait_mode or self.client.wait_mode
+        if wait_mode == "stream":
+            # /stream reads are long-held requests; the sync client's reader runs in a worker thread
+            await self.rate_limiter.acquire()
+            return await asyncio.to_thread(self.client.wait_for_stream, job_id, check_interval, max_wait_time)
+        
+        start_time = time.time()
+        
+        while time.time() - start_time < max_wait_time:
+            try:
+                await self.rate_limiter.acquire()
+                status_data = await asyncio.to_thread(self.client.get_status, job_id)
+                result = self.client.job_result(job_id, status_data)
+                if result is not None:
+                    return result
+            except requests.exceptions.RequestException as e:
+                logger.error(f"❌ Status check error: {e}")
+            await asyncio.sleep(self.client.poll_interval(time.time() - start_time, check_interval, wait_mode))
+        
+        logger.error(f"❌ Job wait timeout ({max_wait_time} seconds)")
+        return {
+            'status': 'TIMEOUT',
+            'job_id': job_id
+        }
+    
+    async def create_video_from_image(
+        self,
+        image_path: str,
+        prompt: str = "running man, grab the gun",
+        negative_prompt: Optional[str] = None,
+        width: int = 480,
+        height: int = 832,
+        length: int = 81,
+        steps: int = 10,
+        seed: int = 42,
+        cfg: float = 2.0,
+        context_overlap: int = 48,
+        lora_pairs: Optional[List[Dict[str, Any]]] = None,
+        on_submit: Optional[Callable[[str], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Generate video from image (same arguments as GenerateVideoClient.create_video_from_image)
+        
+        Returns:
+            Job result dictionary
+        """
+        input_data = await asyncio.to_thread(
+            self.client.build_input_data,
+            image_path=image_path,
+            prompt=prompt,
+            negative_prompt=negative_prompt,
+            width=width,
+            height=height,
+            length=length,
+            steps=steps,
+            seed=seed,
+            cfg=cfg,
+            context_overlap=context_overlap,
+            lora_pairs=lora_pairs
+        )
+        if "error" in input_data:
+            return input_data
+        
+        return await self.run_job(input_data, on_submit=on_submit)
+    
+    async def reattach_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Wait for a job submitted by an earlier run (same as GenerateVideoClient.reattach_job)"""
+        await self.rate_limiter.acquire()
+        known, result = await asyncio.to_thread(self.client.lookup_job, job_id)
+        if known and result is None:
+            result = await self.wait_for_completion(job_id)
+        return result
+    
+    async def batch_process_images(
+        self,
+        image_folder_path: str,
+        output_folder_path: str,
+        valid_extensions: tuple = ('.jpg', '.jpeg', '.png', '.bmp', '.tiff'),
+        prompt: str = "running man, grab the gun",
+        negative_prompt: Optional[str] = None,
+        width: int = 480,
+        height: int = 832,
+        length: int = 81,
+        steps: int = 10,
+        seed: int = 42,
+        cfg: float = 2.0,
+        context_overlap: int = 48,
+        lora_pairs: Optional[List[Dict[str, Any]]] = None,
+        journal_path: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Batch process all image files in folder, up to max_in_flight jobs at once.
+        Same arguments, job journal and result dictionary as
+        GenerateVideoClient.batch_process_images; results are listed in completion order.
+        
+        Returns:
+            Batch processing result dictionary
+        """
+        image_files = self.client.list_image_files(image_folder_path, valid_extensions)
+        if isinstance(image_files, dict):
+            return image_files
+        
+        os.makedirs(output_folder_path, exist_ok=True)
+        
+        logger.info(f"Starting async batch processing: {len(image_files)} files, {self.max_in_flight} in flight")
+        
+        results = {
+            "total_files": len(image_files),
+            "successful": 0,
+            "failed": 0,
+            "results": []
+        }
+        params = {
+            "prompt": prompt,
+            "negative_prompt": negative_prompt,
+            "width": width,
+            "height": height,
+            "length": length,
+            "steps": steps,
+            "seed": seed,
+            "cfg": cfg,
+            "context_overlap": context_overlap,
+            "lora_pairs": lora_pairs
+        }
+        journal = self.client.open_journal(output_folder_path, journal_path)
+        semaphore = asyncio.Semaphore(self.max_in_flight)
+        results_lock = asyncio.Lock()
+        
+        async def process(task: Dict[str, Any]) -> None:
+            filename = task["filenames"][0]
+            async with results_lock:
+                if await asyncio.to_thread(self.client.reuse_batch_output, journal, task, results, output_folder_path):
+                    return
+            
+            async with semaphore:
+                result = None
+                job_id = None
+                if journal is not None and task["key"]:
+                    job_id = await asyncio.to_thread(journal.in_flight, task["key"])
+                if job_id:
+                    logger.info(f"🔗 [{filename}] Reattaching to job {job_id} from an earlier run")
+                    result = await self.reattach_job(job_id)
+                if result is None:
+                    result = await self.create_video_from_image(
+                        image_path=os.path.join(image_folder_path, filename),
+                        on_submit=self.client.journal_submit(journal, task),
+                        **params
+                    )
+            # Saving happens outside the semaphore so the next job can start
+            async with results_lock:
+                await asyncio.to_thread(self.client.finish_batch_task, journal, task, result, results, output_folder_path)
+        
+        try:
+            tasks = await asyncio.to_thread(self.client.batch_tasks, image_folder_path, image_files, params)
+            await asyncio.gather(*(process(task) for task in tasks))
+        finally:
+            if journal is not None:
+                journal.close()
+        
+        logger.info(f"\n🎉 Batch processing completed: {results['successful']}/{results['total_files']} successful")
+        return results
 
 def main():
     """Usage example"""
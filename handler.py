@@ -1,16 +1,28 @@
 import runpod
+import asyncio
 import os
-import websocket
 import base64
-import json
 import uuid
 import logging
-import urllib.request
-import urllib.parse
 import binascii
-import subprocess
+import hashlib
 import time
+import threading
 import torch
+from concurrent.futures import ThreadPoolExecutor
+
+from boot_state import state as boot_state
+from comfy_connection import ComfyConnection
+from cost_model import CostModel, GPU_COMPONENTS
+from storage import ObjectStorage
+from downloader import Downloader
+from image_prep import ImagePreprocessor
+from input_cache import InputCache
+from janitor import Janitor
+from metrics import JobTimings, Metrics
+from result_cache import ResultCache, result_cache_key
+from scheduler import AffinityScheduler
+from workflow_engine import WorkflowRegistry, node_order
 
 # ============================================
 # FAST ENDPOINT - CogVideoX-5B I2V Model
@@ -29,6 +41,144 @@ logger = logging.getLogger(__name__)
 server_address = os.getenv('SERVER_ADDRESS', '127.0.0.1')
 client_id = str(uuid.uuid4())
 
+# Workflows are loaded and their job-input bindings compiled once at startup
+# (WORKFLOW_REGISTRY, default /workflows.json)
+workflows = WorkflowRegistry.from_env()
+
+# Shared by every job; connected once at worker start
+comfy = ComfyConnection(server_address, client_id)
+
+# Output delivery: "s3" uploads to BUCKET_* storage and returns a presigned
+# URL, "base64" inlines the video in the job payload
+storage = ObjectStorage.from_env()
+default_output_mode = os.getenv("OUTPUT_MODE", "s3" if storage else "base64")
+
+# Pooled HTTP downloader for image_url inputs (DOWNLOAD_* env settings)
+downloader = Downloader.from_env()
+
+# Content-addressed image inputs: the same image always gets the same path,
+# so ComfyUI can reuse its cached LoadImage/resize/image-encode outputs
+input_cache = InputCache.from_env()
+
+# Input images are decoded once here (draft-mode for large JPEGs), size-checked
+# and resized to the workflow's input_size, so ComfyUI's LoadImage/resize
+# nodes get a small file at the final size (PREPROCESS_ENABLED=0 to disable)
+preprocessor = ImagePreprocessor.from_env()
+
+# Opt-in (RESULT_CACHE_ENABLED=1): seeded jobs with identical parameters
+# return the stored video instead of re-running the sampler
+result_cache = ResultCache.from_env(storage)
+
+# Jobs this worker runs at once. Above 1, jobs queue into ComfyUI together so
+# one job's input download / output upload overlaps another's GPU execution
+max_concurrency = int(os.getenv("MAX_CONCURRENCY", "1"))
+
+# Orders concurrent jobs into ComfyUI so consecutive prompts share text /
+# image encodes; a job never waits more than SCHEDULER_MAX_DELAY for affinity
+scheduler = AffinityScheduler(
+    max_in_flight=int(os.getenv("COMFY_MAX_IN_FLIGHT", "1")),
+    max_delay=float(os.getenv("SCHEDULER_MAX_DELAY", "120"))
+)
+
+# Stage / per-node timing histograms, served on METRICS_PORT when set
+metrics = Metrics.from_env()
+
+# Removes per-job scratch dirs and keeps ComfyUI's output folders under
+# JANITOR_MAX_BYTES, deleting delivered videos after JANITOR_MAX_AGE
+janitor = Janitor.from_env(on_reclaim=metrics.observe_reclaimed)
+
+# STREAM_OUTPUT=1 makes the handler a generator: it yields sampler progress,
+# then a small animated preview as soon as frames are decoded, then the full
+# result (aggregated for /run and /runsync via return_aggregate_stream)
+stream_output = os.getenv("STREAM_OUTPUT", "0") == "1"
+preview_size = int(os.getenv("PREVIEW_SIZE", "360"))
+preview_format = os.getenv("PREVIEW_FORMAT", "image/webp")
+
+# Jobs with an "items" array run one generation per item (the other job-input
+# fields are defaults for every item). Up to BATCH_PARALLEL items are in
+# progress at once, so the scheduler can order them for cache reuse and one
+# item's input/output work overlaps another's generation
+batch_max_items = int(os.getenv("BATCH_MAX_ITEMS", "64"))
+batch_parallel = int(os.getenv("BATCH_PARALLEL", "4"))
+
+# Runtime estimates learned from finished jobs (COST_MODEL_PATH). Jobs with a
+# "deadline_s" run with fewer steps/frames, or are rejected, when the estimate
+# says they would miss it
+cost_model = CostModel.from_env()
+
+# Sampler progress is posted to the job's /status with progress_update, at most
+# every PROGRESS_INTERVAL seconds. JOB_TIMEOUT (or a job's "timeout_s") bounds
+# a job's run time; a job that is cancelled or times out has its prompts
+# interrupted / removed in ComfyUI instead of finishing on the GPU
+progress_interval = float(os.getenv("PROGRESS_INTERVAL", "2"))
+job_timeout = float(os.getenv("JOB_TIMEOUT", "0")) or None
+
+# Jobs accepted before the worker finished booting (ComfyUI start, model
+# prefetch, warmup - see supervisor.py) wait up to this long for it
+boot_wait_timeout = float(os.getenv("BOOT_WAIT_TIMEOUT", "1800"))
+
+class JobControl:
+    def __init__(self, job, timeout=None, report=False):
+        """
+        Cancellation, timeout and progress reporting for one RunPod job (shared by its items)
+
+        Args:
+            job: RunPod job; progress updates are posted under its id
+            timeout: Seconds the job may run (None = no limit)
+            report: Post sampler progress with runpod.serverless.progress_update
+        """
+        self.job = job
+        self.timeout = timeout
+        self.received = time.monotonic()
+        self.deadline = self.received + timeout if timeout else None
+        self.cancelled = threading.Event()
+        self.reason = None
+        self.report = report
+        self._last_report = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_job(cls, job):
+        timeout = job.get("input", {}).get("timeout_s", job_timeout)
+        try:
+            timeout = float(timeout) if timeout else None
+        except (TypeError, ValueError):
+            raise Exception(f"timeout_s must be a number: {timeout!r}")
+        # progress_update posts to the RunPod job API, which local test runs don't have
+        return cls(job, timeout, report=os.getenv("RUNPOD_WEBHOOK_POST_OUTPUT") is not None)
+
+    def cancel(self, reason="Job cancelled"):
+        if not self.cancelled.is_set():
+            self.reason = reason
+            self.cancelled.set()
+
+    def elapsed(self):
+        """Seconds since the worker received the job (for items: since the whole job arrived)"""
+        return time.monotonic() - self.received
+
+    def remaining(self):
+        """Seconds left before the timeout (None = no limit)"""
+        return None if self.deadline is None else max(0.0, self.deadline - time.monotonic())
+
+    def check(self):
+        """Raise if the job was cancelled or ran out of time"""
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            self.cancel(f"Job exceeded its {self.timeout:g}s timeout")
+        if self.cancelled.is_set():
+            raise Exception(self.reason)
+
+    def progress(self, update):
+        """progress_update, throttled to PROGRESS_INTERVAL; the first and last sampler steps always go out"""
+        if not self.report:
+            return
+        now = time.monotonic()
+        with self._lock:
+            edge = update.get("value") in (1, update.get("max"))
+            if not edge and now - self._last_report < progress_interval:
+                return
+            self._last_report = now
+        runpod.serverless.progress_update(self.job, update)
+
 def to_nearest_multiple_of_16(value):
     """Round to nearest multiple of 16, minimum 16"""
     try:
@@ -40,203 +190,599 @@ def to_nearest_multiple_of_16(value):
         adjusted = 16
     return adjusted
 
-def process_input(input_data, temp_dir, output_filename, input_type):
-    """Process input data and return file path"""
+def process_input(input_data, temp_dir, output_filename, input_type, size=None, lease=None):
+    """
+    Process input data and return file path
+
+    Args:
+        size: (width, height) the workflow resizes the image to; with
+            preprocessing on, the stored file already has this size
+        lease: Job the cached file is pinned for (input_cache.release(lease) unpins it)
+    """
     if input_type == "path":
         logger.info(f"📁 Path input: {input_data}")
-        return input_data
+        if preprocessor is None:
+            return input_data
+        return preprocess_file(input_data, size, lease)
     elif input_type == "url":
         logger.info(f"🌐 URL input: {input_data}")
         os.makedirs(temp_dir, exist_ok=True)
         file_path = os.path.abspath(os.path.join(temp_dir, output_filename))
-        return download_file_from_url(input_data, file_path)
+        return download_file_from_url(input_data, file_path, size, lease)
     elif input_type == "base64":
         logger.info(f"🔢 Base64 input")
-        return save_base64_to_file(input_data, temp_dir, output_filename)
+        return save_base64_to_file(input_data, size, lease)
     else:
         raise Exception(f"Unsupported input type: {input_type}")
 
-def download_file_from_url(url, output_path):
-    """Download file from URL"""
+def store_input(data, size=None, alias=None, etag=None, lease=None):
+    """Preprocess image bytes (when enabled) and store them in the input cache"""
+    if preprocessor is not None:
+        data, stats = preprocessor.prepare(data, size)
+        logger.info(f"🖼️ Preprocessed input: {stats}")
+    return input_cache.add_bytes(data, alias=alias, etag=etag, lease=lease)
+
+def preprocess_file(path, size=None, lease=None):
+    """Preprocessed copy of a local image, reused while the file is unchanged"""
     try:
-        result = subprocess.run([
-            'wget', '-O', output_path, '--no-verbose', url
-        ], capture_output=True, text=True)
-        
-        if result.returncode == 0:
-            logger.info(f"✅ Downloaded: {url} -> {output_path}")
-            return output_path
-        else:
-            logger.error(f"❌ wget failed: {result.stderr}")
-            raise Exception(f"Download failed: {result.stderr}")
-    except subprocess.TimeoutExpired:
-        raise Exception("Download timeout")
+        stat = os.stat(path)
+    except OSError as e:
+        raise Exception(f"Input image not found: {e}")
+    alias = f"{os.path.abspath(path)}#{preprocessor.variant(size)}"
+    version = f"{stat.st_mtime_ns}:{stat.st_size}"
+    cached = input_cache.lookup_alias(alias, lease)
+    if cached and cached[0] == version:
+        input_cache.touch(cached[1])
+        return cached[1]
+    with open(path, "rb") as f:
+        return store_input(f.read(), size, alias=alias, etag=version, lease=lease)
+
+def download_file_from_url(url, output_path, size=None, lease=None):
+    """Download file from URL into the input cache"""
+    try:
+        # A URL is remembered per preprocessing variant, since that is what gets stored
+        alias = url if preprocessor is None else f"{url}#{preprocessor.variant(size)}"
+        cached = input_cache.lookup_alias(alias, lease)
+        info = downloader.download(url, output_path, etag=cached[0] if cached else None)
+        if info.get("not_modified"):
+            input_cache.touch(cached[1])
+            return cached[1]
+        if preprocessor is None:
+            return input_cache.add_file(info["path"], alias=alias, etag=info.get("etag"), lease=lease)
+        with open(info["path"], "rb") as f:
+            data = f.read()
     except Exception as e:
+        logger.error(f"❌ Download failed: {e}")
         raise Exception(f"Download error: {e}")
+    return store_input(data, size, alias=alias, etag=info.get("etag"), lease=lease)
 
-def save_base64_to_file(base64_data, temp_dir, output_filename):
-    """Save base64 data to file"""
+def save_base64_to_file(base64_data, size=None, lease=None):
+    """Save base64 data to the input cache"""
     try:
         decoded_data = base64.b64decode(base64_data)
-        os.makedirs(temp_dir, exist_ok=True)
-        file_path = os.path.abspath(os.path.join(temp_dir, output_filename))
-        with open(file_path, 'wb') as f:
-            f.write(decoded_data)
-        logger.info(f"✅ Saved base64 to: {file_path}")
-        return file_path
     except (binascii.Error, ValueError) as e:
         raise Exception(f"Base64 decode failed: {e}")
+    if preprocessor is None:
+        return input_cache.add_bytes(decoded_data, lease=lease)
+    # The same upload is only preprocessed once
+    alias = f"sha256:{hashlib.sha256(decoded_data).hexdigest()}#{preprocessor.variant(size)}"
+    cached = input_cache.lookup_alias(alias, lease)
+    if cached:
+        input_cache.touch(cached[1])
+        return cached[1]
+    return store_input(decoded_data, size, alias=alias, etag="content", lease=lease)
+
+def get_videos(conn, prompt, on_message=None, timings=None, preview=None, control=None):
+    """
+    Run prompt and return node_id -> video paths
 
-def queue_prompt(prompt):
-    url = f"http://{server_address}:8188/prompt"
-    logger.info(f"Queueing prompt to: {url}")
-    p = {"prompt": prompt, "client_id": client_id}
-    data = json.dumps(p).encode('utf-8')
-    req = urllib.request.Request(url, data=data)
-    return json.loads(urllib.request.urlopen(req).read())
-
-def get_history(prompt_id):
-    url = f"http://{server_address}:8188/history/{prompt_id}"
-    with urllib.request.urlopen(url) as response:
-        return json.loads(response.read())
-
-def get_videos(ws, prompt):
-    prompt_id = queue_prompt(prompt)['prompt_id']
-    output_videos = {}
-    while True:
-        out = ws.recv()
-        if isinstance(out, str):
-            message = json.loads(out)
-            if message['type'] == 'executing':
-                data = message['data']
-                if data['node'] is None and data['prompt_id'] == prompt_id:
-                    break
+    Args:
+        preview: Optional (preview_prompt, callback). The preview prompt is queued
+            right before prompt and callback receives its videos as soon as it finishes
+        control: Optional JobControl; on cancellation or timeout the job's
+            prompts are interrupted / removed from ComfyUI's queue
+    """
+    timings = timings or JobTimings()
+    if control is not None:
+        control.check()
+    prompts = [preview[0], prompt] if preview else [prompt]
+    timings.set_prompt({node_id: node for p in prompts for node_id, node in p.items()})
+    with timings.stage("comfy_submit"):
+        try:
+            # Back to back, so no other prompt evicts the shared nodes from ComfyUI's cache
+            prompt_ids = [response['prompt_id'] for response in conn.queue_prompts(prompts)]
+        except Exception as e:
+            if not preview:
+                raise
+            logger.warning(f"Preview prompt rejected ({e}), running without a preview")
+            preview = None
+            prompt_ids = [conn.queue_prompt(prompt)['prompt_id']]
+    timings.prompt_submitted()
+
+    def on_prompt_message(message):
+        timings.on_message(message)
+        if on_message is not None:
+            on_message(message)
+
+    def collect(prompt_id):
+        if control is None:
+            conn.wait_for_prompt(prompt_id, on_prompt_message)
         else:
-            continue
-
-    history = get_history(prompt_id)[prompt_id]
-    for node_id in history['outputs']:
-        node_output = history['outputs'][node_id]
-        videos_output = []
-        if 'gifs' in node_output:
-            for video in node_output['gifs']:
-                with open(video['fullpath'], 'rb') as f:
-                    video_data = base64.b64encode(f.read()).decode('utf-8')
-                videos_output.append(video_data)
-        output_videos[node_id] = videos_output
-
-    return output_videos
-
-def load_workflow(workflow_path):
-    with open(workflow_path, 'r') as file:
-        return json.load(file)
-
-def handler(job):
+            conn.wait_for_prompt(prompt_id, on_prompt_message, timeout=control.remaining(), cancelled=control.cancelled)
+        with timings.stage("history"):
+            history = conn.get_history(prompt_id)[prompt_id]
+        output_videos = {}
+        for node_id in history['outputs']:
+            node_output = history['outputs'][node_id]
+            videos_output = []
+            if 'gifs' in node_output:
+                for video in node_output['gifs']:
+                    videos_output.append(video['fullpath'])
+            output_videos[node_id] = videos_output
+        return output_videos
+
+    try:
+        if preview:
+            try:
+                preview[1](collect(prompt_ids[0]))
+            except Exception as e:
+                # The full video is still coming; a failed preview only costs the early frames
+                logger.warning(f"Preview failed: {e}")
+            # The full prompt's queue wait starts once the preview is out
+            timings.prompt_submitted()
+
+        return collect(prompt_ids[-1])
+    except Exception:
+        if control is not None and (control.cancelled.is_set() or control.remaining() == 0):
+            # Nobody will read the result: free the GPU instead of finishing the prompts
+            conn.cancel_prompts(prompt_ids)
+            control.check()
+        raise
+
+def deliver_video(video_path, job_id, output_mode, field="video"):
+    """Return the output fields for a finished video file"""
+    if output_mode == "s3":
+        uploaded = storage.upload_file(video_path, f"{job_id}/{os.path.basename(video_path)}")
+        return {
+            f"{field}_url": uploaded["url"],
+            f"{field}_key": uploaded["key"],
+            f"{field}_size": uploaded["size"],
+            f"{field}_sha256": uploaded["sha256"]
+        }
+    with open(video_path, 'rb') as f:
+        return {field: base64.b64encode(f.read()).decode('utf-8')}
+
+def build_result(video_path, job_id, output_mode, generation_time, workflow, values, profile=None):
+    meta = workflow.meta
+    num_frames = values.get("length")
+    fps = meta.get("fps", 30)
+    return {
+        **deliver_video(video_path, job_id, output_mode),
+        "generation_time": generation_time,
+        "model": meta.get("model"),
+        "workflow": workflow.name,
+        "frames": num_frames,
+        "fps": fps,
+        "duration_seconds": round(num_frames / fps, 2) if num_frames else None,
+        "steps": values.get("steps"),
+        "resolution": meta.get("resolution"),
+        # The settings actually applied, so callers can tell tiers apart
+        "profile": profile.to_dict() if profile else None
+    }
+
+def image_identity(image_path):
+    """Content digest of the input image (falls back to the path if unreadable)"""
+    try:
+        return input_cache.digest_of(image_path)
+    except OSError:
+        return image_path
+
+def generate_video(job, timings, emit=None, control=None, lease=None):
+    """
+    Run one job
+
+    Args:
+        job: RunPod job
+        timings: Stage/node timings for this job
+        emit: Optional callback for streamed updates (progress, then the preview)
+        control: Optional JobControl (cancellation, timeout, progress_update)
+        lease: Cache lease pinning the job's input image and result-cache hit; the caller releases it
+    """
     job_input = job.get("input", {})
     logger.info(f"🚀 FAST ENDPOINT (CogVideoX-5B I2V) - Received job")
 
     task_id = f"task_{uuid.uuid4()}"
 
-    # Process image input
+    output_mode = job_input.get("output_mode", default_output_mode)
+    if output_mode not in ("s3", "base64"):
+        raise Exception(f"Unsupported output_mode: {output_mode}")
+    if output_mode == "s3" and storage is None:
+        raise Exception("output_mode 's3' requires BUCKET_NAME to be configured")
+
+    workflow = workflows.get(job_input.get("workflow"))
+
+    # Process image input (inputs end up in the input cache, so the task dir is scratch only)
     image_path = None
-    if "image_path" in job_input:
-        image_path = process_input(job_input["image_path"], task_id, "input_image.jpg", "path")
-    elif "image_url" in job_input:
-        image_path = process_input(job_input["image_url"], task_id, "input_image.jpg", "url")
-    elif "image_base64" in job_input:
-        image_path = process_input(job_input["image_base64"], task_id, "input_image.jpg", "base64")
-    else:
-        image_path = "/example_image.png"
-        logger.info("Using default image: /example_image.png")
+    task_dir = janitor.task_dir(task_id)
+    with timings.stage("input"):
+        try:
+            if "image_path" in job_input:
+                image_path = process_input(job_input["image_path"], task_dir, "input_image", "path", workflow.input_size, lease)
+            elif "image_url" in job_input:
+                image_path = process_input(job_input["image_url"], task_dir, "input_image", "url", workflow.input_size, lease)
+            elif "image_base64" in job_input:
+                image_path = process_input(job_input["image_base64"], task_dir, "input_image", "base64", workflow.input_size, lease)
+            else:
+                image_path = "/example_image.png"
+                logger.info("Using default image: /example_image.png")
+        finally:
+            janitor.remove_task_dir(task_id)
+        image_digest = image_identity(image_path)
 
-    # Load CogVideoX workflow
-    prompt = load_workflow("/new_CogVideoX_api.json")
-    
     # ============================================
     # CogVideoX-5B I2V Settings
     # From https://huggingface.co/THUDM/CogVideoX-5b-I2V
     # - Resolution: 720x480 (fixed!)
     # - Frames: 81 (2.7 seconds at 30fps)
     # - Steps: 50 recommended
+    # Defaults and ranges live in the workflow bindings (workflows.json)
     # ============================================
-    num_frames = job_input.get("length", 81)      # 81 frames = 2.7 seconds at 30fps
-    steps = job_input.get("steps", 50)            # CogVideoX needs 50 steps
-    cfg = job_input.get("cfg", 6.0)               # CFG scale
-    seed = job_input.get("seed", int(time.time() * 1000) % (2**32))
-    
-    logger.info(f"🎞️ CogVideoX-5B I2V: {num_frames} frames @ 30fps, {steps} steps, cfg={cfg}, seed={seed}")
+    with timings.stage("workflow_build"):
+        # Profile defaults fill fields the job left out; its node settings are applied as one set
+        profile = workflow.profile(job_input.get("profile"))
+        values = workflow.resolve({**job_input, "image": image_path}, profile)
+        prompt = workflow.build(values, profile.nodes if profile else None)
 
-    # Apply to workflow
-    # Node 5: Load Image
-    prompt["5"]["inputs"]["image"] = image_path
-    
-    # Node 3: Positive prompt
-    prompt["3"]["inputs"]["prompt"] = job_input.get("prompt", "a person moving naturally")
-    
-    # Node 4: Negative prompt
-    prompt["4"]["inputs"]["prompt"] = job_input.get("negative_prompt", 
-        "blurry, distorted, low quality, static, ugly, deformed, worst quality")
-    
-    # Node 6: Resolution (CogVideoX is fixed at 720x480!)
-    # We still resize input image but output is always 720x480
-    prompt["6"]["inputs"]["width"] = 720
-    prompt["6"]["inputs"]["height"] = 480
-    
-    # Node 8: Sampler settings
-    prompt["8"]["inputs"]["num_frames"] = num_frames
-    prompt["8"]["inputs"]["steps"] = steps
-    prompt["8"]["inputs"]["cfg"] = cfg
-    prompt["8"]["inputs"]["seed"] = seed
-
-    # Connect to ComfyUI
-    ws_url = f"ws://{server_address}:8188/ws?clientId={client_id}"
-    http_url = f"http://{server_address}:8188/"
-    
-    # Wait for HTTP
-    max_http_attempts = 180
-    for http_attempt in range(max_http_attempts):
-        try:
-            urllib.request.urlopen(http_url, timeout=5)
-            logger.info(f"HTTP connected (attempt {http_attempt+1})")
-            break
-        except Exception as e:
-            if http_attempt == max_http_attempts - 1:
-                raise Exception("ComfyUI server not reachable")
-            time.sleep(1)
-    
-    ws = websocket.WebSocket()
-    max_attempts = 36
-    for attempt in range(max_attempts):
+    profile_name = profile.name if profile else "none"
+    logger.info(f"🎞️ {workflow.name} [{profile_name}]: {values.get('length')} frames, {values.get('steps')} steps, cfg={values.get('cfg')}, seed={values.get('seed')}")
+
+    # Result cache: only seeded jobs are deterministic
+    job_id = job.get("id", task_id)
+    cache_key = None
+    cache_stats = None
+    if result_cache is not None and "seed" in job_input and job_input.get("cache", True):
         try:
-            ws.connect(ws_url)
-            logger.info(f"WebSocket connected (attempt {attempt+1})")
-            break
+            with timings.stage("result_cache"):
+                cache_key = result_cache_key({
+                    "workflow": workflow.name,
+                    "version": workflow.version,
+                    "params": {**values, "image": image_digest},
+                    "profile": profile.nodes if profile else None
+                })
+                cached_path, cache_stats = result_cache.get(cache_key, lease)
         except Exception as e:
-            if attempt == max_attempts - 1:
-                raise Exception("WebSocket connection timeout")
-            time.sleep(5)
-    
-    start_time = time.time()
-    videos = get_videos(ws, prompt)
-    generation_time = time.time() - start_time
-    
-    ws.close()
+            logger.warning(f"Result cache lookup skipped: {e}")
+            cache_key, cached_path = None, None
+        if cached_path:
+            with timings.stage("output"):
+                result = build_result(cached_path, job_id, output_mode, 0.0, workflow, values, profile)
+            return {**result, "cache": cache_stats}
+
+    # Reuse the worker's ComfyUI connection (reconnects only if it went bad)
+    with timings.stage("connect"):
+        comfy.ensure_connected()
+
+    # ComfyUI reports nodes it served from cache in execution_cached
+    cached_nodes = []
+    cache_reports = []
+    def on_message(message):
+        if message['type'] == 'execution_cached':
+            # Only the job's first prompt counts: behind a preview, the full
+            # prompt's shared nodes always come from the job's own preview prompt
+            if not cache_reports:
+                cached_nodes.extend(message['data'].get('nodes', []))
+            cache_reports.append(message)
+        elif message['type'] == 'progress':
+            data = message['data']
+            update = {"status": "progress", "node": data.get('node'), "value": data.get('value'), "max": data.get('max')}
+            if emit is not None:
+                emit(update)
+            if control is not None:
+                control.progress(update)
+
+    preview = None
+    if emit is not None and job_input.get("preview", True) and workflow.output_node is not None:
+        def on_preview(preview_videos):
+            for paths in preview_videos.values():
+                for path in paths:
+                    with timings.stage("preview"):
+                        update = {"status": "preview", "preview_format": preview_format, **deliver_video(path, job_id, output_mode, "preview")}
+                    emit(update)
+                    os.remove(path)
+                    return
+        preview = (workflow.preview_prompt(prompt, preview_size, preview_format), on_preview)
 
-    logger.info(f"⚡ CogVideoX-5B I2V generation complete in {generation_time:.1f}s")
+    # Bound values plus the profile's model loader / FasterCache inputs (a change there reloads the model)
+    signature = workflow.signature(values, prompt)
+    # cached_nodes come from the first prompt queued, the preview if there is one
+    first_prompt = preview[0] if preview is not None else prompt
+    node_fields = {node_id: fields for node_id, fields in workflow.node_fields.items() if node_id in first_prompt}
+    with scheduler.slot(signature, node_fields, control.check if control is not None else None) as ticket:
+        timings.add("schedule_wait", ticket.wait_time)
+        start_time = time.time()
+        videos = get_videos(comfy, prompt, on_message, timings, preview, control)
+        generation_time = time.time() - start_time
+
+    logger.info(f"⚡ {workflow.name} generation complete in {generation_time:.1f}s")
 
     for node_id in videos:
         if videos[node_id]:
-            return {
-                "video": videos[node_id][0],
-                "generation_time": generation_time,
-                "model": "CogVideoX-5B-I2V",
-                "frames": num_frames,
-                "fps": 30,
-                "duration_seconds": round(num_frames / 30, 2),
-                "steps": steps,
-                "resolution": "720x480"
+            video_path = videos[node_id][0]
+            with timings.stage("output"):
+                result = build_result(video_path, job_id, output_mode, generation_time, workflow, values, profile)
+            result["scheduler"] = {
+                "wait_time": round(ticket.wait_time, 3),
+                "expected_cached_nodes": ticket.shared_nodes,
+                "cached_nodes": sorted(cached_nodes, key=node_order)
             }
+            if cache_key is not None:
+                with timings.stage("result_cache_store"):
+                    result_cache.put(cache_key, video_path)
+                result["cache"] = cache_stats
+            janitor.delivered(video_path)
+            return result
     
     return {"error": "No video generated"}
 
-runpod.serverless.start({"handler": handler})
+def admit(job, control):
+    """
+    Estimate the job before its input is fetched and apply its deadline
+
+    deadline_s counts from when the worker received the job, so an item of an
+    "items" job only gets what the items before it left over.
+
+    Returns:
+        (job to run, with steps/length lowered on a downgrade; admission decision,
+        or None if the workflow has no steps/length/cfg to estimate from)
+    """
+    job_input = job.get("input", {})
+    workflow = workflows.get(job_input.get("workflow"))
+    if not all(field in workflow.bindings for field in ("steps", "length", "cfg")):
+        return job, None
+    profile = workflow.profile(job_input.get("profile"))
+    values = workflow.resolve(job_input, profile)
+
+    deadline = job_input.get("deadline_s")
+    if deadline is not None:
+        try:
+            deadline = float(deadline)
+        except (TypeError, ValueError):
+            raise Exception(f"deadline_s must be a number: {deadline!r}")
+        if deadline <= 0:
+            raise Exception(f"deadline_s must be positive: {deadline}")
+    policy = job_input.get("deadline_policy", "downgrade")
+    if policy not in ("downgrade", "reject"):
+        raise Exception(f"Unsupported deadline_policy: {policy}")
+
+    profile_name = profile.name if profile else "none"
+    admission = cost_model.plan(
+        workflow.name, profile_name, values["steps"], values["length"], values["cfg"],
+        deadline=deadline, elapsed=control.elapsed(), policy=policy
+    )
+    admission = {"workflow": workflow.name, "profile": profile_name, "cfg": values["cfg"], **admission}
+    estimate = f"{admission['estimate_s']:.0f}s" if admission["estimate_s"] is not None else "unknown"
+    logger.info(
+        f"🧮 Admission {admission['decision']}: estimate {estimate} for {admission['steps']} steps x "
+        f"{admission['frames']} frames (requested {values['steps']} x {values['length']}), deadline {deadline}"
+    )
+    if admission["decision"] == "downgraded":
+        job = {**job, "input": {**job_input, "steps": admission["steps"], "length": admission["frames"]}}
+    return job, admission
+
+def observe_cost(admission, timings):
+    """Feed a finished job's measured sampler/decode/other time back into the cost model"""
+    seconds = {"sampler": 0.0, "vae_decode": 0.0}
+    for node in timings.nodes:
+        if node["label"] in seconds and not node["cached"]:
+            seconds[node["label"]] += node["seconds"]
+    if not seconds["sampler"]:
+        # Served from ComfyUI's cache; nothing to learn
+        return
+    # Waiting for the worker or behind other jobs is backlog, not this job's cost
+    waits = sum(timings.stages.get(stage, 0.0) for stage in ("boot_wait", "admission", "schedule_wait", "comfy_queue"))
+    seconds["rest"] = max(0.0, timings.total() - waits - seconds["sampler"] - seconds["vae_decode"])
+    cost_model.observe(
+        admission["workflow"], admission["profile"], admission["steps"], admission["frames"], admission["cfg"], seconds
+    )
+
+def run_job(job, emit=None, control=None):
+    """generate_video with admission control, and stage/node timings added to the output and the metrics"""
+    control = control or JobControl.for_job(job)
+    timings = JobTimings()
+    status = "exception"
+    reservation = None
+    lease = f"lease_{uuid.uuid4()}"
+    try:
+        with timings.stage("boot_wait"):
+            boot_state.wait(timeout=boot_wait_timeout)
+        with timings.stage("admission"):
+            job, admission = admit(job, control)
+        if admission is not None:
+            metrics.observe_admission(admission["decision"])
+            if emit is not None:
+                emit({"status": "admission", **admission})
+            if admission["decision"] == "rejected":
+                status = "rejected"
+                return {
+                    "error": f"Estimated {admission['estimate_s']:.0f}s exceeds deadline_s {admission['deadline_s']:g}",
+                    "admission": admission,
+                    "timings": timings.to_dict()
+                }
+            if admission.get("breakdown"):
+                # Jobs admitted while this one is running see its GPU time as backlog
+                reservation = cost_model.reserve(sum(admission["breakdown"][component] for component in GPU_COMPONENTS))
+        result = generate_video(job, timings, emit, control, lease)
+        if "error" in result:
+            status = "error"
+        elif (result.get("cache") or {}).get("hit"):
+            status = "cached"
+        else:
+            status = "success"
+        if admission is not None:
+            if status == "success":
+                observe_cost(admission, timings)
+            result["admission"] = {**admission, "actual_s": round(timings.total(), 3)}
+        result["timings"] = timings.to_dict()
+        return result
+    finally:
+        if status == "exception" and control.cancelled.is_set():
+            status = "cancelled"
+        # ComfyUI is done with the input image and the result is delivered; both may be evicted again
+        input_cache.release(lease)
+        if result_cache is not None:
+            result_cache.release(lease)
+        cost_model.release(reservation)
+        metrics.observe_job(timings, status)
+        logger.info(f"⏱️ Job {status} in {timings.total():.1f}s: {timings.to_dict()['stages']}")
+
+IMAGE_FIELDS = ("image_path", "image_url", "image_base64")
+
+def run_items(job, emit=None, control=None):
+    """
+    Run every entry of the job's "items" array
+
+    An item that fails is reported in its entry; the job only fails if every item did.
+
+    Returns:
+        {"items": [per-item results, in order], "succeeded", "failed", "timings"}
+    """
+    job_input = job.get("input", {})
+    items = job_input["items"]
+    if not isinstance(items, list) or not items or not all(isinstance(item, dict) for item in items):
+        raise Exception("items must be a non-empty list of objects")
+    if len(items) > batch_max_items:
+        raise Exception(f"At most {batch_max_items} items per job: {len(items)}")
+    shared = {field: value for field, value in job_input.items() if field != "items"}
+    job_id = job.get("id", f"batch_{uuid.uuid4()}")
+    control = control or JobControl.for_job(job)
+    start = time.monotonic()
+
+    def run_item(index):
+        item = items[index]
+        item_input = {**shared, **item}
+        if any(field in item for field in IMAGE_FIELDS):
+            # The item's own image replaces the shared one, whatever field either uses
+            for field in IMAGE_FIELDS:
+                if field not in item:
+                    item_input.pop(field, None)
+        item_emit = None
+        if emit is not None:
+            item_emit = lambda update: emit({**update, "item": index})
+        try:
+            # Items not started yet when the job is cancelled or times out are skipped
+            control.check()
+            result = run_job({"id": f"{job_id}-{index}", "input": item_input}, item_emit, control)
+        except Exception as e:
+            logger.error(f"❌ Item {index} failed: {e}")
+            return {"index": index, "status": "error", "error": str(e)}
+        return {"index": index, "status": "error" if "error" in result else "success", **result}
+
+    with ThreadPoolExecutor(max_workers=min(batch_parallel, len(items))) as pool:
+        results = list(pool.map(run_item, range(len(items))))
+
+    stages = {}
+    for result in results:
+        for stage, seconds in result.get("timings", {}).get("stages", {}).items():
+            stages[stage] = stages.get(stage, 0.0) + seconds
+    total = time.monotonic() - start
+    succeeded = sum(1 for result in results if result["status"] == "success")
+    logger.info(f"📦 Batch of {len(items)}: {succeeded} succeeded in {total:.1f}s ({total / len(items):.1f}s per item)")
+
+    output = {
+        "items": results,
+        "succeeded": succeeded,
+        "failed": len(items) - succeeded,
+        "timings": {
+            "total": round(total, 3),
+            "per_item": round(total / len(items), 3),
+            # Summed over items, so overlapping stages can add up to more than total
+            "stages": {stage: round(seconds, 3) for stage, seconds in stages.items()},
+        },
+    }
+    if not succeeded:
+        output["error"] = f"All {len(items)} items failed"
+    return output
+
+def run(job, emit=None, control=None):
+    if "items" in job.get("input", {}):
+        return run_items(job, emit, control)
+    return run_job(job, emit, control)
+
+async def handler(job):
+    # Blocking work runs in a thread so concurrent jobs don't stall the event loop
+    control = JobControl.for_job(job)
+    try:
+        return await asyncio.to_thread(run, job, None, control)
+    except asyncio.CancelledError:
+        # RunPod cancels the task when the job is cancelled or times out; the
+        # thread keeps running until it sees the flag, then frees ComfyUI
+        logger.warning(f"🛑 Job {job.get('id')} cancelled")
+        control.cancel()
+        raise
+
+async def stream_handler(job):
+    # Updates from the job thread are handed to the event loop and yielded as they arrive
+    loop = asyncio.get_running_loop()
+    updates = asyncio.Queue()
+
+    def emit(update):
+        loop.call_soon_threadsafe(updates.put_nowait, update)
+
+    control = JobControl.for_job(job)
+
+    def run_streamed():
+        try:
+            return run(job, emit, control)
+        finally:
+            emit(None)
+
+    task = asyncio.ensure_future(asyncio.to_thread(run_streamed))
+    finished = False
+    try:
+        while True:
+            update = await updates.get()
+            if update is None:
+                break
+            yield update
+        result = await task
+        finished = True
+        yield result
+    finally:
+        # Cancelled, or the consumer stopped reading
+        if not finished:
+            logger.warning(f"🛑 Job {job.get('id')} cancelled")
+            control.cancel()
+            # The job thread ends with a cancellation error that nobody awaits
+            task.add_done_callback(lambda done: done.cancelled() or done.exception())
+
+def concurrency_modifier(current_concurrency):
+    return max_concurrency
+
+def connect_comfy():
+    """Open the shared ComfyUI connection as soon as the "comfy" boot phase is ready"""
+    try:
+        boot_state.wait(("comfy",))
+        comfy.start()
+        logger.info("🔌 Connected to ComfyUI")
+    except Exception as e:
+        # Jobs retry through ensure_connected() and report the error there
+        logger.warning(f"⚠ ComfyUI connection at boot failed: {e}")
+
+def start():
+    """Accept jobs; the ComfyUI connection opens in the background once ComfyUI is up"""
+    metrics.start_server()
+    janitor.start()
+    threading.Thread(target=connect_comfy, name="comfy-connect", daemon=True).start()
+    if stream_output:
+        runpod.serverless.start({
+            "handler": stream_handler,
+            "concurrency_modifier": concurrency_modifier,
+            "return_aggregate_stream": True
+        })
+    else:
+        runpod.serverless.start({"handler": handler, "concurrency_modifier": concurrency_modifier})
+
+if __name__ == "__main__":
+    # Run without supervisor.py: ComfyUI is started and warmed up elsewhere
+    boot_state.start_external()
+    start()
@@ -0,0 +1,120 @@
+"""
+Input image preprocessing before ComfyUI.
+Every input image is decoded once here instead of by ComfyUI's LoadImage and
+resize nodes. Oversized images are rejected. Large JPEGs are decoded at 1/2,
+1/4 or 1/8 scale (draft mode), which is still at least the target size. The
+image is oriented like LoadImage does it, resized to the workflow's exact
+input size and written as a compact file, so the workflow's resize node has
+nothing left to do.
+"""
+
+import io
+import logging
+import os
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+_FORMATS = {
+    "png": ("PNG", {"compress_level": 3}),
+    "jpeg": ("JPEG", {"subsampling": 0}),
+    "webp": ("WEBP", {"method": 4}),
+}
+
+# EXIF orientations that swap width and height
+_TRANSPOSED = (5, 6, 7, 8)
+
+
+class ImagePreprocessor:
+    def __init__(self, max_pixels: int = 64_000_000, fmt: str = "png", quality: int = 95):
+        """
+        Initialize preprocessor
+
+        Args:
+            max_pixels: Images with more pixels are rejected before decoding
+            fmt: Output format: "png" (lossless), "jpeg" or "webp"
+            quality: JPEG/WebP quality
+        """
+        if fmt not in _FORMATS:
+            raise Exception(f"Unsupported preprocessing format '{fmt}'. Available: {list(_FORMATS)}")
+        self.max_pixels = max_pixels
+        self.fmt = fmt
+        self.quality = quality
+
+    @classmethod
+    def from_env(cls) -> Optional["ImagePreprocessor"]:
+        """Build from PREPROCESS_* environment variables, or None if disabled"""
+        if os.getenv("PREPROCESS_ENABLED", "1") != "1":
+            return None
+        return cls(
+            max_pixels=int(os.getenv("PREPROCESS_MAX_PIXELS", "64000000")),
+            fmt=os.getenv("PREPROCESS_FORMAT", "png"),
+            quality=int(os.getenv("PREPROCESS_QUALITY", "95"))
+        )
+
+    def variant(self, size: Optional[Tuple[int, int]]) -> str:
+        """Name of the output for a target size, part of input-cache aliases"""
+        return f"{size[0]}x{size[1]}.{self.fmt}" if size else f"native.{self.fmt}"
+
+    def prepare(self, data: bytes, size: Optional[Tuple[int, int]] = None) -> Tuple[bytes, Dict[str, Any]]:
+        """
+        Decode, guard, orient and resize one input image
+
+        Args:
+            data: Encoded image
+            size: Exact (width, height) to resize to (None = keep the size)
+
+        Returns:
+            (encoded output, stats for logs)
+        """
+        start = time.monotonic()
+        try:
+            image = Image.open(io.BytesIO(data))
+        except Exception as e:
+            raise Exception(f"Input is not a readable image: {e}")
+        source_format = image.format
+        width, height = image.size
+        if width * height > self.max_pixels:
+            raise Exception(
+                f"Input image too large: {width}x{height} ({width * height / 1e6:.0f} MP, limit {self.max_pixels / 1e6:.0f} MP)"
+            )
+
+        orientation = image.getexif().get(0x0112, 1)
+        stats: Dict[str, Any] = {"source": f"{width}x{height} {source_format}", "source_bytes": len(data)}
+
+        # Already what ComfyUI gets after resizing: store it as it is
+        if size is not None and (width, height) == tuple(size) and orientation == 1 and source_format in ("PNG", "JPEG"):
+            stats.update(output_bytes=len(data), seconds=round(time.monotonic() - start, 3), unchanged=True)
+            return data, stats
+
+        if size is not None and source_format == "JPEG":
+            # The draft covers the target in the image's stored orientation
+            target = (size[1], size[0]) if orientation in _TRANSPOSED else tuple(size)
+            image.draft("RGB", target)
+            if image.size != (width, height):
+                stats["draft"] = f"{image.size[0]}x{image.size[1]}"
+
+        try:
+            image = ImageOps.exif_transpose(image)
+            # As LoadImage does it: 16-bit integer images are scaled down, alpha is dropped
+            if image.mode == "I":
+                image = image.point(lambda value: value * (1 / 255))
+            image = image.convert("RGB")
+            if size is not None and image.size != tuple(size):
+                # Stretched like ImageResizeKJ with keep_proportion off; reducing_gap
+                # box-reduces very large images before the Lanczos pass
+                image = image.resize(tuple(size), Image.LANCZOS, reducing_gap=3.0)
+        except Exception as e:
+            raise Exception(f"Input image could not be decoded: {e}")
+
+        pil_format, options = _FORMATS[self.fmt]
+        if self.fmt != "png":
+            options = {**options, "quality": self.quality}
+        out = io.BytesIO()
+        image.save(out, pil_format, **options)
+        output = out.getvalue()
+        stats.update(output=f"{image.size[0]}x{image.size[1]} {pil_format}", output_bytes=len(output), seconds=round(time.monotonic() - start, 3))
+        return output, stats
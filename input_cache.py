@@ -0,0 +1,177 @@
+"""
+Content-addressed store for job input images.
+Identical inputs map to the same stable path, so ComfyUI's LoadImage /
+ImageResizeKJ / CogVideoImageEncode outputs stay cached across jobs.
+Least-recently-used files are evicted once the disk budget is exceeded.
+Aliases (a URL, a local path or a raw-input digest, plus the preprocessing
+variant) remember which stored file a source became, so unchanged sources
+are neither downloaded nor preprocessed again. Files handed out under a
+lease (one per job) are pinned, so eviction can't delete an input that
+ComfyUI has not loaded yet; release() unpins them when the job ends.
+"""
+
+import hashlib
+import logging
+import os
+import shutil
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from disk_lru import DiskLRU
+from downloader import sniff_image_type
+
+logger = logging.getLogger(__name__)
+
+
+def hash_file(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """sha256 hex digest of a file, read in chunks"""
+    sha256 = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+class InputCache:
+    def __init__(self, root: str, max_bytes: int = 2 * 1024 * 1024 * 1024, max_aliases: int = 1024):
+        """
+        Initialize input cache
+
+        Args:
+            root: Cache directory
+            max_bytes: Disk budget; LRU files are evicted beyond it
+            max_aliases: Alias -> (ETag, path) entries remembered (URLs for conditional GETs, preprocessed sources)
+        """
+        self.lru = DiskLRU(root, max_bytes, name="Input cache")
+        self.root = self.lru.root
+        self.max_aliases = max_aliases
+        self._aliases = OrderedDict()
+        # Lease (job) -> files it pinned
+        self._leases: Dict[str, List[str]] = {}
+
+    @classmethod
+    def from_env(cls) -> "InputCache":
+        return cls(
+            root=os.getenv("INPUT_CACHE_DIR", "/input_cache"),
+            max_bytes=int(os.getenv("INPUT_CACHE_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+        )
+
+    def _path_for(self, digest: str, header: bytes) -> str:
+        ext = sniff_image_type(header) or "img"
+        return os.path.join(self.root, f"{digest}.{ext}")
+
+    def _pin(self, path: str, lease: Optional[str]) -> bool:
+        """Pin path for lease (caller holds lru.lock)"""
+        if lease is None:
+            return path in self.lru
+        if not self.lru.pin(path):
+            return False
+        self._leases.setdefault(lease, []).append(path)
+        return True
+
+    def _insert(
+        self, src_path: Optional[str], data: Optional[bytes], digest: str, header: bytes, lease: Optional[str] = None
+    ) -> Tuple[str, bool]:
+        """Move src_path (or write data) to the digest path; returns (path, hit)"""
+        path = self._path_for(digest, header)
+        with self.lru.lock:
+            if path in self.lru:
+                self.lru.touch(path)
+                self._pin(path, lease)
+                if src_path is not None:
+                    os.remove(src_path)
+                return path, True
+            if src_path is not None:
+                # shutil.move falls back to copy when the cache is on another filesystem
+                shutil.move(src_path, path)
+            else:
+                tmp_path = os.path.join(self.root, f".{uuid.uuid4().hex}.tmp")
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            self.lru.add(path)
+            self._pin(path, lease)
+            return path, False
+
+    def add_bytes(
+        self, data: bytes, alias: Optional[str] = None, etag: Optional[str] = None, lease: Optional[str] = None
+    ) -> str:
+        """
+        Store input bytes, returning their stable path
+
+        Args:
+            data: File contents
+            alias: Source the bytes came from, remembered with etag
+            etag: Version of the source (ETag, mtime/size, ...)
+            lease: Job the file is pinned for until release(lease)
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        path, hit = self._insert(None, data, digest, data[:16], lease)
+        logger.info(f"{'♻️ Input cache hit' if hit else '💾 Input cached'}: {path}")
+        self._remember(alias, etag, path)
+        return path
+
+    def add_file(
+        self, file_path: str, alias: Optional[str] = None, etag: Optional[str] = None, lease: Optional[str] = None
+    ) -> str:
+        """
+        Move a file into the cache, returning its stable path
+
+        Args:
+            file_path: File to adopt (moved, or deleted if already cached)
+            alias: Source URL, remembered with etag for conditional re-downloads
+            etag: ETag the server returned for the URL
+            lease: Job the file is pinned for until release(lease)
+        """
+        digest = hash_file(file_path)
+        with open(file_path, "rb") as f:
+            header = f.read(16)
+        path, hit = self._insert(file_path, None, digest, header, lease)
+        logger.info(f"{'♻️ Input cache hit' if hit else '💾 Input cached'}: {path}")
+        self._remember(alias, etag, path)
+        return path
+
+    def _remember(self, alias: Optional[str], etag: Optional[str], path: str) -> None:
+        if not alias or not etag:
+            return
+        with self.lru.lock:
+            self._aliases[alias] = (etag, path)
+            self._aliases.move_to_end(alias)
+            while len(self._aliases) > self.max_aliases:
+                self._aliases.popitem(last=False)
+
+    def lookup_alias(self, alias: str, lease: Optional[str] = None) -> Optional[Tuple[str, str]]:
+        """
+        (etag, path) of the still-cached file alias was stored as, or None
+
+        Args:
+            alias: Source to look up
+            lease: Job the file is pinned for until release(lease), so it stays
+                cached while the job revalidates or uses it
+        """
+        with self.lru.lock:
+            entry = self._aliases.get(alias)
+            if entry is None:
+                return None
+            if not self._pin(entry[1], lease):
+                del self._aliases[alias]
+                return None
+            return entry
+
+    def release(self, lease: str) -> None:
+        """Unpin every file a job's lease holds"""
+        with self.lru.lock:
+            paths = self._leases.pop(lease, [])
+            for path in paths:
+                self.lru.unpin(path)
+
+    def touch(self, path: str) -> None:
+        """Mark a cached file as recently used"""
+        self.lru.touch(path)
+
+    def digest_of(self, path: str) -> str:
+        """sha256 of an input file; free for files stored in this cache"""
+        if os.path.dirname(os.path.abspath(path)) == self.root:
+            return os.path.basename(path).split(".")[0]
+        return hash_file(path)
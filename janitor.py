@@ -0,0 +1,199 @@
+"""
+Disk lifecycle for per-job scratch space and ComfyUI output files.
+Per-job task directories are removed when the job's input stage ends.
+ComfyUI outputs (videos, VHS first-frame PNGs, temp previews) are deleted
+once delivered and older than JANITOR_MAX_AGE, and least-recently-written
+first whenever the output folders exceed JANITOR_MAX_BYTES. Files a job may
+still be delivering are only touched once they are JANITOR_MIN_AGE old.
+"""
+
+import logging
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class Janitor:
+    def __init__(
+        self,
+        output_dirs: List[str],
+        task_root: str = "/tmp/tasks",
+        max_bytes: int = 5 * 1024 * 1024 * 1024,
+        max_age: float = 3600,
+        min_age: float = 900,
+        interval: float = 300,
+        on_reclaim: Optional[Callable[[str, int], None]] = None
+    ):
+        """
+        Initialize janitor
+
+        Args:
+            output_dirs: ComfyUI output/temp folders to keep under budget
+            task_root: Parent of the per-job task directories
+            max_bytes: Disk budget for the output folders
+            max_age: Delivered outputs older than this are deleted (seconds)
+            min_age: Undelivered outputs younger than this are never deleted (seconds)
+            interval: Seconds between background sweeps
+            on_reclaim: Called with (kind, bytes) after space is reclaimed
+        """
+        self.output_dirs = [os.path.abspath(d) for d in output_dirs]
+        self.task_root = os.path.abspath(task_root)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.min_age = min_age
+        self.interval = interval
+        self.on_reclaim = on_reclaim
+        self.reclaimed: Dict[str, int] = {"task": 0, "output": 0}
+        # Delivered output path -> delivery time, oldest first
+        self._delivered: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        os.makedirs(self.task_root, exist_ok=True)
+
+    @classmethod
+    def from_env(cls, on_reclaim: Optional[Callable[[str, int], None]] = None) -> "Janitor":
+        output_dirs = os.getenv("JANITOR_OUTPUT_DIRS", "/ComfyUI/output,/ComfyUI/temp")
+        return cls(
+            output_dirs=[d.strip() for d in output_dirs.split(",") if d.strip()],
+            task_root=os.getenv("TASK_DIR_ROOT", "/tmp/tasks"),
+            max_bytes=int(os.getenv("JANITOR_MAX_BYTES", str(5 * 1024 * 1024 * 1024))),
+            max_age=float(os.getenv("JANITOR_MAX_AGE", "3600")),
+            min_age=float(os.getenv("JANITOR_MIN_AGE", "900")),
+            interval=float(os.getenv("JANITOR_INTERVAL", "300")),
+            on_reclaim=on_reclaim
+        )
+
+    def _reclaim(self, kind: str, size: int) -> None:
+        if size <= 0:
+            return
+        with self._lock:
+            self.reclaimed[kind] += size
+        if self.on_reclaim is not None:
+            self.on_reclaim(kind, size)
+
+    def task_dir(self, task_id: str) -> str:
+        """Scratch directory for one job (created by whoever writes into it)"""
+        return os.path.join(self.task_root, task_id)
+
+    def remove_task_dir(self, task_id: str) -> int:
+        """Delete a job's scratch directory; returns bytes reclaimed"""
+        path = self.task_dir(task_id)
+        if not os.path.isdir(path):
+            return 0
+        size = _tree_size(path)
+        shutil.rmtree(path, ignore_errors=True)
+        self._reclaim("task", size)
+        return size
+
+    def delivered(self, path: str) -> None:
+        """Mark an output file as delivered; it becomes eligible for age/LRU eviction"""
+        with self._lock:
+            self._delivered.pop(path, None)
+            self._delivered[path] = time.time()
+        self._wake.set()
+
+    def _scan(self) -> List[Dict]:
+        """Every file in the output folders, oldest mtime first"""
+        files = []
+        for root in self.output_dirs:
+            if not os.path.isdir(root):
+                continue
+            for dirpath, _, filenames in os.walk(root):
+                for filename in filenames:
+                    path = os.path.join(dirpath, filename)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    files.append({"path": path, "size": stat.st_size, "mtime": stat.st_mtime})
+        files.sort(key=lambda f: f["mtime"])
+        return files
+
+    def sweep(self) -> int:
+        """
+        Enforce the age limit and the disk budget on the output folders
+
+        Returns:
+            Bytes reclaimed
+        """
+        now = time.time()
+        files = self._scan()
+        total = sum(f["size"] for f in files)
+        reclaimed = 0
+        removed = 0
+
+        # A delivered video's name stem also covers its VHS first-frame PNG
+        with self._lock:
+            delivered_stems = {os.path.splitext(path)[0] for path in self._delivered}
+        for f in files:
+            expired = now - f["mtime"] >= self.max_age
+            over_budget = total - reclaimed > self.max_bytes
+            if not (expired or over_budget):
+                continue
+            # A young file nobody delivered may belong to a job that is still running
+            if now - f["mtime"] < self.min_age and os.path.splitext(f["path"])[0] not in delivered_stems:
+                continue
+            try:
+                os.remove(f["path"])
+            except FileNotFoundError:
+                continue
+            reclaimed += f["size"]
+            removed += 1
+
+        with self._lock:
+            for path in list(self._delivered):
+                if not os.path.exists(path):
+                    del self._delivered[path]
+
+        if reclaimed:
+            self._reclaim("output", reclaimed)
+            logger.info(
+                f"🧹 Reclaimed {reclaimed / (1024*1024):.1f}MB ({removed} files); outputs now "
+                f"{(total - reclaimed) / (1024*1024):.1f}MB of {self.max_bytes / (1024*1024):.0f}MB budget"
+            )
+        elif total > self.max_bytes:
+            logger.warning(f"Outputs at {total / (1024*1024):.1f}MB exceed the budget, but nothing is evictable yet")
+        return reclaimed
+
+    def sweep_stale_tasks(self) -> int:
+        """Remove task directories left behind by a previous run"""
+        reclaimed = 0
+        for entry in os.scandir(self.task_root):
+            if entry.is_dir():
+                reclaimed += self.remove_task_dir(entry.name)
+        return reclaimed
+
+    def start(self) -> None:
+        """Sweep now and then every interval (or sooner after a delivery) in a background thread"""
+        if self._thread is not None:
+            return
+        self.sweep_stale_tasks()
+
+        def loop():
+            while True:
+                try:
+                    self.sweep()
+                except Exception as e:
+                    logger.warning(f"Janitor sweep failed: {e}")
+                self._wake.wait(self.interval)
+                self._wake.clear()
+
+        self._thread = threading.Thread(target=loop, name="janitor", daemon=True)
+        self._thread.start()
+
+
+def _tree_size(path: str) -> int:
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, filename))
+            except OSError:
+                pass
+    return total
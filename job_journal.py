@@ -0,0 +1,141 @@
+"""
+Durable job journal for client batches.
+Every batch input is keyed by the SHA-256 of its image bytes and its job
+parameters, and its RunPod job ID, status and output path are recorded in
+SQLite as the job progresses. A batch rerun after a crash reattaches to jobs
+that are still in flight instead of resubmitting them, reuses outputs that
+were already saved, and identical inputs are only generated once.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# submitted: job ID known, result not saved yet (a rerun reattaches)
+# completed: output saved at output_path (a rerun reuses it)
+# failed: job or save failed (a rerun resubmits)
+STATUSES = ("submitted", "completed", "failed")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    key TEXT PRIMARY KEY,
+    image_sha256 TEXT NOT NULL,
+    params TEXT NOT NULL,
+    source TEXT,
+    job_id TEXT,
+    status TEXT NOT NULL,
+    output_path TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+)
+"""
+
+
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """SHA-256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            data = f.read(chunk_size)
+            if not data:
+                break
+            digest.update(data)
+    return digest.hexdigest()
+
+
+def job_key(image_sha256: str, params: Dict[str, Any]) -> str:
+    """Journal key: identical image bytes and parameters produce the same video"""
+    canonical = json.dumps(params, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(f"{image_sha256}\n{canonical}".encode("utf-8")).hexdigest()
+
+
+class JobJournal:
+    def __init__(self, path: str):
+        """
+        Open (or create) a journal
+
+        Args:
+            path: SQLite database file
+        """
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        # Shared by the async batch's worker threads; writes are serialized by the lock
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(_SCHEMA)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Journal entry for a key, or None"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        entry = dict(row)
+        entry["params"] = json.loads(entry["params"])
+        return entry
+
+    def completed(self, key: str) -> Optional[Dict[str, Any]]:
+        """Entry whose output was saved and is still on disk, or None"""
+        entry = self.get(key)
+        if entry is None or entry["status"] != "completed":
+            return None
+        if not entry["output_path"] or not os.path.exists(entry["output_path"]):
+            logger.warning(f"Journaled output {entry['output_path']} is gone; job will be resubmitted")
+            return None
+        return entry
+
+    def in_flight(self, key: str) -> Optional[str]:
+        """Job ID submitted by an earlier run whose result was not saved yet, or None"""
+        entry = self.get(key)
+        if entry is None or entry["status"] != "submitted":
+            return None
+        return entry["job_id"]
+
+    def submitted(self, key: str, image_sha256: str, params: Dict[str, Any], source: str, job_id: str) -> None:
+        """Record a new RunPod job for a key, replacing any earlier attempt"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO jobs (key, image_sha256, params, source, job_id, status, attempts, created, updated)
+                VALUES (?, ?, ?, ?, ?, 'submitted', 1, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET
+                    source = excluded.source, job_id = excluded.job_id, status = 'submitted',
+                    output_path = NULL, error = NULL, attempts = attempts + 1, updated = excluded.updated
+                """,
+                (key, image_sha256, json.dumps(params, sort_keys=True, ensure_ascii=False), source, job_id, now, now)
+            )
+
+    def finished(self, key: str, status: str, output_path: Optional[str] = None, error: Optional[str] = None) -> None:
+        """Record a key's outcome ("completed" with output_path, or "failed" with error)"""
+        if status not in STATUSES:
+            raise Exception(f"Unknown journal status '{status}'. Use one of {STATUSES}")
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, output_path = ?, error = ?, updated = ? WHERE key = ?",
+                (status, output_path and os.path.abspath(output_path), error, time.time(), key)
+            )
+
+    def summary(self) -> Dict[str, int]:
+        """Entry count per status"""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
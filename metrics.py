@@ -0,0 +1,254 @@
+"""
+Per-job stage and per-node timings, exported as Prometheus histograms.
+Each job records how long it spent in every handler stage (input fetch,
+workflow build, ComfyUI queue, execution, output delivery, ...) and in
+every workflow node, derived from ComfyUI's `executing` WebSocket
+messages. Timings are returned in the job output and aggregated into
+histograms served in the Prometheus text format on METRICS_PORT.
+"""
+
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+# Node class -> stage name reported for it
+NODE_LABELS = {
+    "DownloadAndLoadCogVideoModel": "model_load",
+    "CLIPLoader": "model_load",
+    "CogVideoXFasterCache": "faster_cache",
+    "CogVideoTextEncode": "text_encode",
+    "LoadImage": "image_load",
+    "ImageResizeKJ": "image_resize",
+    "CogVideoImageEncode": "image_encode",
+    "CogVideoSampler": "sampler",
+    "CogVideoDecode": "vae_decode",
+    "VHS_VideoCombine": "video_combine",
+}
+
+
+class JobTimings:
+    def __init__(self):
+        """Timings of one job; stages are added by the handler, nodes by on_message"""
+        self.started = time.monotonic()
+        self.stages: Dict[str, float] = {}
+        self.nodes: List[Dict[str, Any]] = []
+        self._classes: Dict[str, str] = {}
+        self._labels: Dict[str, str] = {}
+        self._submitted: Optional[float] = None
+        self._execution_start: Optional[float] = None
+        self._current: Optional[Tuple[str, float]] = None
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, stage: str):
+        """Time the enclosed block as stage"""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.add(stage, time.monotonic() - start)
+
+    def set_prompt(self, prompt: Dict[str, Any]) -> None:
+        """Node ID -> class_type lookup for labelling node timings (a node's _meta.label overrides the label)"""
+        self._classes = {node_id: node.get("class_type") for node_id, node in prompt.items()}
+        self._labels = {node_id: node["_meta"]["label"] for node_id, node in prompt.items() if "label" in node.get("_meta", {})}
+
+    def prompt_submitted(self) -> None:
+        """Mark the prompt as queued; the ComfyUI queue wait runs until execution_start"""
+        self._submitted = time.monotonic()
+
+    def _node(self, node_id: str, seconds: float, cached: bool = False) -> None:
+        class_type = self._classes.get(node_id)
+        self.nodes.append({
+            "node": node_id,
+            "class_type": class_type,
+            "label": self._labels.get(node_id) or NODE_LABELS.get(class_type, class_type),
+            "seconds": round(seconds, 3),
+            "cached": cached,
+        })
+
+    def _close_node(self, now: float) -> None:
+        if self._current is not None:
+            node_id, start = self._current
+            self._node(node_id, now - start)
+            self._current = None
+
+    def on_message(self, message: Dict[str, Any]) -> None:
+        """ComfyUI WebSocket message for this job's prompt"""
+        now = time.monotonic()
+        data = message.get("data") or {}
+        message_type = message.get("type")
+        if message_type == "execution_start":
+            self._execution_start = now
+            if self._submitted is not None:
+                self.add("comfy_queue", now - self._submitted)
+        elif message_type == "execution_cached":
+            for node_id in data.get("nodes", []):
+                self._node(str(node_id), 0.0, cached=True)
+        elif message_type == "executing":
+            # A node's "executing" message marks the end of the previous one
+            self._close_node(now)
+            node_id = data.get("node")
+            if node_id is not None:
+                self._current = (str(node_id), now)
+            elif self._execution_start is not None:
+                self.add("comfy_execute", now - self._execution_start)
+        elif message_type == "execution_error":
+            self._close_node(now)
+
+    def total(self) -> float:
+        return time.monotonic() - self.started
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "total": round(self.total(), 3),
+            "stages": {stage: round(seconds, 3) for stage, seconds in self.stages.items()},
+            "nodes": self.nodes,
+        }
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...], buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        """
+        Prometheus histogram with labels
+
+        Args:
+            name: Metric name
+            help_text: HELP line
+            label_names: Label names, in the order observe() receives values
+            buckets: Upper bounds (seconds); +Inf is implicit
+        """
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = tuple(sorted(buckets))
+        # label values -> (per-bucket counts, sum, count)
+        self._series: Dict[Tuple[str, ...], List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        with self._lock:
+            series = self._series.setdefault(label_values, [[0] * len(self.buckets), 0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_values, (counts, total, count) in sorted(self._series.items()):
+                labels = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, label_values))
+                prefix = f"{labels}," if labels else ""
+                for bound, bucket_count in zip(self.buckets, counts):
+                    lines.append(f'{self.name}_bucket{{{prefix}le="{bound:g}"}} {bucket_count}')
+                lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {count}')
+                label_block = f"{{{labels}}}" if labels else ""
+                lines.append(f"{self.name}_sum{label_block} {total:.6f}")
+                lines.append(f"{self.name}_count{label_block} {count}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...]):
+        """Prometheus counter with labels"""
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, value: float, *label_values: str) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                labels = ",".join(f'{name}="{_escape(v)}"' for name, v in zip(self.label_names, label_values))
+                lines.append(f"{self.name}{{{labels}}} {value:g}" if labels else f"{self.name} {value:g}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Metrics:
+    def __init__(self, port: Optional[int] = None):
+        """
+        Initialize job metrics
+
+        Args:
+            port: Serve /metrics on this port (None = collect only)
+        """
+        self.port = port
+        self.job_seconds = Histogram("generate_video_job_seconds", "End-to-end handler time per job", ("status",))
+        self.stage_seconds = Histogram("generate_video_stage_seconds", "Time per handler stage", ("stage",))
+        self.node_seconds = Histogram("generate_video_node_seconds", "Execution time per workflow node (cache misses only)", ("label", "class_type"))
+        self.reclaimed_bytes = Counter("generate_video_disk_reclaimed_bytes_total", "Disk space freed by the janitor", ("kind",))
+        self.admissions = Counter("generate_video_admission_total", "Admission decisions against job deadlines", ("decision",))
+        self._server = None
+
+    @classmethod
+    def from_env(cls) -> "Metrics":
+        port = os.getenv("METRICS_PORT")
+        return cls(port=int(port) if port else None)
+
+    def observe_job(self, timings: JobTimings, status: str) -> None:
+        self.job_seconds.observe(timings.total(), status)
+        for stage, seconds in timings.stages.items():
+            self.stage_seconds.observe(seconds, stage)
+        for node in timings.nodes:
+            if not node["cached"]:
+                self.node_seconds.observe(node["seconds"], node["label"] or "", node["class_type"] or "")
+
+    def observe_reclaimed(self, kind: str, size: int) -> None:
+        self.reclaimed_bytes.inc(size, kind)
+
+    def observe_admission(self, decision: str) -> None:
+        self.admissions.inc(1, decision)
+
+    def render(self) -> str:
+        lines = []
+        for metric in (self.job_seconds, self.stage_seconds, self.node_seconds, self.reclaimed_bytes, self.admissions):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def start_server(self) -> None:
+        """Serve /metrics in a background thread (no-op without a port)"""
+        if self.port is None or self._server is not None:
+            return
+        metrics = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                body = metrics.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._server = ThreadingHTTPServer(("0.0.0.0", self.port), MetricsHandler)
+        threading.Thread(target=self._server.serve_forever, name="metrics-server", daemon=True).start()
+        logger.info(f"📊 Metrics on :{self.port}/metrics")
@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+"""
+Manifest-driven model prefetch.
+Downloads every artifact listed in models_manifest.json concurrently
+(hf_transfer when installed, ranged resume otherwise), verifies sizes and
+sha256 digests, and records a stamp so verified artifacts are skipped with
+a stat() per file on the next boot. When a network volume is mounted the
+artifact lives there and is linked into ComfyUI's model folders, so
+workers sharing the volume download it once.
+
+Usage:
+    python prefetch_models.py [--manifest /models_manifest.json] [--only NAME] [--verify full]
+"""
+
+import argparse
+import fcntl
+import fnmatch
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+import requests
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+STAMP_NAME = ".prefetch.json"
+HASH_CHUNK = 8 * 1024 * 1024
+
+
+def sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(HASH_CHUNK)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _matches(path: str, allow: Optional[List[str]], ignore: Optional[List[str]]) -> bool:
+    if allow and not any(fnmatch.fnmatch(path, pattern) for pattern in allow):
+        return False
+    return not (ignore and any(fnmatch.fnmatch(path, pattern) for pattern in ignore))
+
+
+class Artifact:
+    def __init__(self, spec: Dict[str, Any], volume_root: Optional[str] = None):
+        """
+        One manifest entry
+
+        Args:
+            spec: {"name", "repo", "mirrors", "revision", "files": [{"path", "size", "sha256", "url"}],
+                   "allow_patterns", "ignore_patterns", "layout", "target", "volume_path"}
+            volume_root: Mounted network volume, or None
+        """
+        self.name = spec["name"]
+        self.repo = spec.get("repo")
+        self.mirrors = spec.get("mirrors", [])
+        self.revision = spec.get("revision", "main")
+        self.files = spec.get("files")
+        self.allow_patterns = spec.get("allow_patterns")
+        self.ignore_patterns = spec.get("ignore_patterns")
+        self.target = spec["target"]
+        # "files": placed into a shared folder (e.g. models/clip);
+        # "dir": the artifact owns its target folder (default for whole repos)
+        self.shared_dir = spec.get("layout", "files" if self.files is not None else "dir") == "files"
+        volume_path = spec.get("volume_path")
+        self.home = volume_path if volume_path and volume_root and os.path.isdir(volume_root) else self.target
+
+    def stamp_path(self, location: str) -> str:
+        name = f".prefetch-{self.name}.json" if self.shared_dir else STAMP_NAME
+        return os.path.join(location, name)
+
+    def read_stamp(self, location: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.stamp_path(location)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def stamp_is_current(self, location: str, full: bool = False) -> bool:
+        """Every stamped file is present with the recorded size and mtime (and digest if full)"""
+        stamp = self.read_stamp(location)
+        if not stamp or stamp.get("revision") != self.revision:
+            return False
+        for path, entry in stamp["files"].items():
+            file_path = os.path.join(location, path)
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                return False
+            if stat.st_size != entry["size"] or stat.st_mtime_ns != entry["mtime_ns"]:
+                return False
+            if full and entry.get("sha256") and sha256_file(file_path) != entry["sha256"]:
+                return False
+        return True
+
+
+class Prefetcher:
+    def __init__(
+        self,
+        endpoint: str = "https://huggingface.co",
+        token: Optional[str] = None,
+        workers: int = 4,
+        volume_root: Optional[str] = "/runpod-volume",
+        use_hf_transfer: bool = True,
+        chunk_size: int = 8 * 1024 * 1024,
+        max_retries: int = 5
+    ):
+        """
+        Initialize prefetcher
+
+        Args:
+            endpoint: Hub base URL (files are fetched from {endpoint}/{repo}/resolve/{revision}/{path})
+            token: Hub access token
+            workers: Files downloaded at once
+            volume_root: Network volume mount point
+            use_hf_transfer: Use hf_transfer's parallel-connection downloads when installed
+            chunk_size: Streaming chunk size (bytes)
+            max_retries: Retries per file after the first attempt
+        """
+        self.endpoint = endpoint.rstrip("/")
+        self.workers = workers
+        self.volume_root = volume_root
+        self.chunk_size = chunk_size
+        self.max_retries = max_retries
+        self.token = token
+        self.headers = {"Authorization": f"Bearer {token}"} if token else {}
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        self.hf_transfer = None
+        if use_hf_transfer:
+            try:
+                import hf_transfer
+                self.hf_transfer = hf_transfer
+            except ImportError:
+                logger.info("hf_transfer not installed; using single-connection downloads")
+
+    @classmethod
+    def from_env(cls) -> "Prefetcher":
+        return cls(
+            endpoint=os.getenv("HF_ENDPOINT", "https://huggingface.co"),
+            token=os.getenv("HF_TOKEN"),
+            workers=int(os.getenv("PREFETCH_WORKERS", "4")),
+            volume_root=os.getenv("PREFETCH_VOLUME_ROOT", "/runpod-volume"),
+            use_hf_transfer=os.getenv("PREFETCH_HF_TRANSFER", "1") == "1"
+        )
+
+    def file_url(self, repo: str, revision: str, path: str) -> str:
+        return f"{self.endpoint}/{repo}/resolve/{revision}/{path}"
+
+    def hub_files(self, artifact: Artifact) -> Dict[str, Dict[str, Any]]:
+        """Expected size/sha256 per file from the hub's metadata (empty if unavailable)"""
+        info = None
+        for repo in [artifact.repo] + artifact.mirrors:
+            try:
+                from huggingface_hub import HfApi
+                info = HfApi(endpoint=self.endpoint, token=self.token).model_info(
+                    repo, revision=artifact.revision, files_metadata=True
+                )
+                break
+            except Exception as e:
+                logger.warning(f"[{artifact.name}] Hub metadata for {repo} unavailable ({e})")
+        if info is None:
+            return {}
+        files = {}
+        for sibling in info.siblings or []:
+            lfs = getattr(sibling, "lfs", None)
+            files[sibling.rfilename] = {
+                "path": sibling.rfilename,
+                "size": sibling.size,
+                "sha256": lfs.sha256 if lfs is not None else None,
+            }
+        return files
+
+    def resolve_files(self, artifact: Artifact) -> List[Dict[str, Any]]:
+        """File list with expected size/sha256 (manifest values win over hub metadata)"""
+        hub = {}
+        if artifact.repo and (artifact.files is None or any("size" not in f or "sha256" not in f for f in artifact.files)):
+            hub = self.hub_files(artifact)
+        if artifact.files is not None:
+            return [{**hub.get(spec["path"], {}), **spec} for spec in artifact.files]
+        if not hub:
+            raise Exception(f"[{artifact.name}] No file list in the manifest and the hub listing failed")
+        return [spec for path, spec in sorted(hub.items()) if _matches(path, artifact.allow_patterns, artifact.ignore_patterns)]
+
+    def _download_http(self, url: str, part_path: str) -> None:
+        """Stream url into part_path, resuming from whatever a previous run left there"""
+        for attempt in range(self.max_retries + 1):
+            offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+            headers = {"Range": f"bytes={offset}-"} if offset else {}
+            try:
+                with self.session.get(url, headers=headers, stream=True, timeout=(10, 60)) as response:
+                    if response.status_code == 416 and offset:
+                        # Already complete
+                        return
+                    if response.status_code == 429 or response.status_code >= 500:
+                        raise requests.exceptions.ConnectionError(f"HTTP {response.status_code}")
+                    response.raise_for_status()
+                    mode = "ab" if response.status_code == 206 else "wb"
+                    with open(part_path, mode) as f:
+                        for chunk in response.iter_content(self.chunk_size):
+                            f.write(chunk)
+                return
+            except (requests.exceptions.ConnectionError,
+                    requests.exceptions.Timeout,
+                    requests.exceptions.ChunkedEncodingError) as e:
+                if attempt == self.max_retries:
+                    raise Exception(f"Download failed after {attempt + 1} attempts: {e}")
+                delay = min(30, 2 ** attempt)
+                logger.warning(f"Download interrupted ({e}), resuming in {delay}s")
+                time.sleep(delay)
+
+    def _download(self, url: str, part_path: str) -> None:
+        if self.hf_transfer is not None and not os.path.exists(part_path):
+            try:
+                self.hf_transfer.download(
+                    url=url,
+                    filename=part_path,
+                    max_files=16,
+                    chunk_size=self.chunk_size,
+                    headers=self.headers or None,
+                    parallel_failures=3,
+                    max_retries=self.max_retries
+                )
+                return
+            except Exception as e:
+                logger.warning(f"hf_transfer failed ({e}), falling back to ranged download")
+                if os.path.exists(part_path):
+                    os.remove(part_path)
+        self._download_http(url, part_path)
+
+    def fetch_file(self, artifact: Artifact, spec: Dict[str, Any], root: str) -> Dict[str, Any]:
+        """Download one file into root (via .part) and verify it; returns its stamp entry"""
+        path = spec["path"]
+        file_path = os.path.join(root, path)
+        part_path = file_path + ".part"
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        verified = "sha256" if spec.get("sha256") else ("size" if spec.get("size") is not None else "recorded")
+
+        # A file left by an interrupted run (or an older entrypoint) is kept if it verifies
+        if os.path.exists(file_path) and verified != "recorded":
+            size = os.path.getsize(file_path)
+            if spec.get("size") is None or size == spec["size"]:
+                digest = sha256_file(file_path)
+                if not spec.get("sha256") or digest == spec["sha256"]:
+                    logger.info(f"✓ [{artifact.name}] {path}: existing copy verified")
+                    return {"size": size, "sha256": digest, "mtime_ns": os.stat(file_path).st_mtime_ns, "verified": verified}
+
+        sources = [spec["url"]] if spec.get("url") else []
+        sources += [self.file_url(repo, artifact.revision, path) for repo in [artifact.repo] + artifact.mirrors if repo]
+
+        last_error = None
+        for url in sources:
+            for _ in range(2):
+                try:
+                    start = time.time()
+                    self._download(url, part_path)
+                    size = os.path.getsize(part_path)
+                    if spec.get("size") is not None and size != spec["size"]:
+                        raise Exception(f"size {size} != expected {spec['size']}")
+                    digest = sha256_file(part_path)
+                    if spec.get("sha256") and digest != spec["sha256"]:
+                        raise Exception(f"sha256 {digest[:12]} != expected {spec['sha256'][:12]}")
+                    os.replace(part_path, file_path)
+                    elapsed = time.time() - start
+                    logger.info(f"✅ [{artifact.name}] {path}: {size / 1e6:.1f}MB in {elapsed:.1f}s")
+                    return {"size": size, "sha256": digest, "mtime_ns": os.stat(file_path).st_mtime_ns, "verified": verified}
+                except Exception as e:
+                    last_error = e
+                    logger.warning(f"[{artifact.name}] {path} from {url}: {e}")
+                    # A corrupt partial must not be resumed again
+                    if os.path.exists(part_path):
+                        os.remove(part_path)
+        raise Exception(f"[{artifact.name}] {path}: all sources failed ({last_error})")
+
+    def link(self, artifact: Artifact, paths: List[str]) -> None:
+        """Expose a volume-hosted artifact at its target path"""
+        if artifact.home == artifact.target:
+            return
+        if artifact.shared_dir:
+            os.makedirs(artifact.target, exist_ok=True)
+            for path in paths:
+                source = os.path.join(artifact.home, path)
+                destination = os.path.join(artifact.target, path)
+                os.makedirs(os.path.dirname(destination), exist_ok=True)
+                if os.path.lexists(destination):
+                    os.remove(destination)
+                try:
+                    # Hardlinks only work on the same filesystem
+                    os.link(source, destination)
+                except OSError:
+                    os.symlink(source, destination)
+        else:
+            if os.path.islink(artifact.target):
+                if os.readlink(artifact.target) == artifact.home:
+                    return
+                os.remove(artifact.target)
+            elif os.path.isdir(artifact.target):
+                # Incomplete local copy (loaders only check the folder exists)
+                shutil.rmtree(artifact.target)
+            os.makedirs(os.path.dirname(artifact.target), exist_ok=True)
+            os.symlink(artifact.home, artifact.target)
+        logger.info(f"🔗 [{artifact.name}] {artifact.target} -> {artifact.home}")
+
+    @contextmanager
+    def _locked(self, artifact: Artifact):
+        """Serialize workers populating the same volume copy (best effort on network filesystems)"""
+        if artifact.home == artifact.target:
+            yield
+            return
+        os.makedirs(os.path.dirname(artifact.home.rstrip("/")) or ".", exist_ok=True)
+        with open(artifact.home.rstrip("/") + ".lock", "w") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            except OSError as e:
+                logger.warning(f"[{artifact.name}] Could not lock ({e}); continuing unlocked")
+            yield
+
+    def prefetch(self, artifact: Artifact, full_verify: bool = False) -> Dict[str, Any]:
+        """Make one artifact present and verified at its target"""
+        start = time.time()
+        if artifact.stamp_is_current(artifact.target, full_verify):
+            return {"name": artifact.name, "status": "cached", "location": artifact.target, "seconds": round(time.time() - start, 3)}
+
+        with self._locked(artifact):
+            # Another worker may have finished the volume copy while we waited
+            if artifact.home != artifact.target and artifact.stamp_is_current(artifact.home, full_verify):
+                self.link(artifact, list(artifact.read_stamp(artifact.home)["files"]))
+                return {"name": artifact.name, "status": "linked", "location": artifact.home, "seconds": round(time.time() - start, 3)}
+
+            files = self.resolve_files(artifact)
+            if artifact.shared_dir:
+                root = artifact.home
+            else:
+                # Assembled beside its home and renamed into place when complete,
+                # because loaders treat an existing folder as a finished download
+                root = artifact.home.rstrip("/") + ".partial"
+                if os.path.islink(artifact.home):
+                    os.remove(artifact.home)
+                elif os.path.isdir(artifact.home):
+                    if os.path.exists(root):
+                        shutil.rmtree(artifact.home)
+                    else:
+                        # Incomplete or unstamped copy: files that verify are kept
+                        os.replace(artifact.home, root)
+            os.makedirs(root, exist_ok=True)
+
+            entries: Dict[str, Dict[str, Any]] = {}
+            errors = []
+            with ThreadPoolExecutor(max_workers=max(1, self.workers)) as pool:
+                futures = {spec["path"]: pool.submit(self.fetch_file, artifact, spec, root) for spec in files}
+                for path, future in futures.items():
+                    try:
+                        entries[path] = future.result()
+                    except Exception as e:
+                        errors.append(str(e))
+            if errors:
+                raise Exception("; ".join(errors))
+
+            stamp_path = artifact.stamp_path(root)
+            with open(stamp_path + ".tmp", "w") as f:
+                json.dump({"name": artifact.name, "repo": artifact.repo, "revision": artifact.revision, "files": entries}, f, indent=1)
+            os.replace(stamp_path + ".tmp", stamp_path)
+            if not artifact.shared_dir:
+                os.replace(root, artifact.home)
+            self.link(artifact, list(entries))
+
+        return {
+            "name": artifact.name,
+            "status": "downloaded",
+            "location": artifact.home,
+            "files": len(entries),
+            "bytes": sum(entry["size"] for entry in entries.values()),
+            "seconds": round(time.time() - start, 3),
+        }
+
+    def run(self, manifest: Dict[str, Any], only: Optional[List[str]] = None, full_verify: bool = False) -> List[Dict[str, Any]]:
+        """Prefetch every manifest artifact concurrently"""
+        artifacts = [Artifact(spec, self.volume_root) for spec in manifest["artifacts"] if not only or spec["name"] in only]
+
+        def run_one(artifact: Artifact) -> Dict[str, Any]:
+            try:
+                return self.prefetch(artifact, full_verify)
+            except Exception as e:
+                logger.error(f"❌ [{artifact.name}] {e}")
+                return {"name": artifact.name, "status": "failed", "error": str(e)}
+
+        with ThreadPoolExecutor(max_workers=max(1, len(artifacts))) as pool:
+            return list(pool.map(run_one, artifacts))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prefetch and verify model artifacts from a manifest")
+    parser.add_argument("--manifest", default=os.getenv("MODEL_MANIFEST", "/models_manifest.json"))
+    parser.add_argument("--only", action="append", help="Artifact name to fetch (repeatable)")
+    parser.add_argument("--verify", choices=("stamp", "full"), default=os.getenv("PREFETCH_VERIFY", "stamp"),
+                        help="stamp: trust size+mtime of stamped files; full: re-hash everything")
+    args = parser.parse_args()
+
+    with open(args.manifest) as f:
+        manifest = json.load(f)
+
+    start = time.time()
+    results = Prefetcher.from_env().run(manifest, args.only, args.verify == "full")
+    for result in results:
+        status = result["status"]
+        icon = "❌" if status == "failed" else "✓"
+        print(f"{icon} {result['name']}: {status} {result.get('location') or result.get('error')} ({result.get('seconds', 0)}s)")
+    print(f"Prefetch finished in {time.time() - start:.1f}s")
+    sys.exit(1 if any(r["status"] == "failed" for r in results) else 0)
+
+
+if __name__ == "__main__":
+    main()
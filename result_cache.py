@@ -0,0 +1,157 @@
+"""
+Deterministic result cache.
+With an explicit seed the output video is a pure function of the image,
+prompts, sampler settings and workflow, so an exact key match can return
+the stored mp4 without running the sampler. Local disk with LRU eviction,
+optionally backed by the S3-compatible bucket. A hit is pinned under the
+job's lease until release(), so concurrent jobs' puts can't evict it before
+it is delivered.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import uuid
+from typing import Optional, Dict, Any, List
+
+from disk_lru import DiskLRU
+from storage import ObjectStorage
+
+logger = logging.getLogger(__name__)
+
+
+def result_cache_key(params: Dict[str, Any]) -> str:
+    """sha256 of the canonical JSON encoding of the generation parameters"""
+    canonical = json.dumps(params, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    def __init__(
+        self,
+        root: str,
+        max_bytes: int = 10 * 1024 * 1024 * 1024,
+        storage: Optional[ObjectStorage] = None,
+        storage_prefix: str = "result-cache/"
+    ):
+        """
+        Initialize result cache
+
+        Args:
+            root: Local cache directory
+            max_bytes: Local disk budget; LRU videos are evicted beyond it
+            storage: Optional shared bucket consulted on local misses
+            storage_prefix: Key prefix for cached videos in the bucket
+        """
+        self.lru = DiskLRU(root, max_bytes, name="Result cache")
+        self.storage = storage
+        self.storage_prefix = storage_prefix
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+        # Lease (job) -> cached videos it pinned
+        self._leases: Dict[str, List[str]] = {}
+
+    @classmethod
+    def from_env(cls, storage: Optional[ObjectStorage] = None) -> Optional["ResultCache"]:
+        """Build from RESULT_CACHE_* environment variables, or None if disabled"""
+        if os.getenv("RESULT_CACHE_ENABLED", "0") != "1":
+            return None
+        use_bucket = os.getenv("RESULT_CACHE_S3", "0") == "1"
+        return cls(
+            root=os.getenv("RESULT_CACHE_DIR", "/result_cache"),
+            max_bytes=int(os.getenv("RESULT_CACHE_MAX_BYTES", str(10 * 1024 * 1024 * 1024))),
+            storage=storage if use_bucket else None
+        )
+
+    def _path_for(self, key: str) -> str:
+        return os.path.join(self.lru.root, f"{key}.mp4")
+
+    def _record(self, hit: bool) -> Dict[str, Any]:
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+            return {"hit": hit, "hits": self.hits, "misses": self.misses}
+
+    def _pin(self, path: str, lease: Optional[str]) -> bool:
+        """Pin path for lease (caller holds lru.lock)"""
+        if lease is None:
+            return path in self.lru
+        if not self.lru.pin(path):
+            return False
+        self._leases.setdefault(lease, []).append(path)
+        return True
+
+    def get(self, key: str, lease: Optional[str] = None):
+        """
+        Look up a cached video
+
+        Args:
+            key: Result cache key
+            lease: Job the video is pinned for until release(lease)
+
+        Returns:
+            (path or None, stats dict for the job output)
+        """
+        path = self._path_for(key)
+        with self.lru.lock:
+            if self._pin(path, lease):
+                self.lru.touch(path)
+                logger.info(f"♻️ Result cache hit: {key[:16]}")
+                return path, self._record(True)
+
+        if self.storage is not None:
+            tmp_path = os.path.join(self.lru.root, f".{uuid.uuid4().hex}.tmp")
+            try:
+                if self.storage.download_file(f"{self.storage_prefix}{key}.mp4", tmp_path):
+                    with self.lru.lock:
+                        os.replace(tmp_path, path)
+                        self.lru.add(path)
+                        self._pin(path, lease)
+                    logger.info(f"♻️ Result cache hit (bucket): {key[:16]}")
+                    return path, self._record(True)
+            except Exception as e:
+                logger.warning(f"Result cache bucket lookup failed: {e}")
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+        return None, self._record(False)
+
+    def put(self, key: str, video_path: str) -> None:
+        """Store a finished video under key (bucket upload runs in the background)"""
+        path = self._path_for(key)
+        tmp_path = os.path.join(self.lru.root, f".{uuid.uuid4().hex}.tmp")
+        try:
+            shutil.copyfile(video_path, tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        with self.lru.lock:
+            self.lru.add(path)
+            # Kept on disk until the background upload has read it
+            uploading = self.storage is not None and self.lru.pin(path)
+        logger.info(f"💾 Result cached: {key[:16]}")
+
+        if uploading:
+            threading.Thread(target=self._upload, args=(key, path), daemon=True).start()
+
+    def _upload(self, key: str, path: str) -> None:
+        try:
+            self.storage.upload_file(path, f"{self.storage_prefix}{key}.mp4")
+        except Exception as e:
+            logger.warning(f"Result cache bucket upload failed: {e}")
+        finally:
+            self.lru.unpin(path)
+
+    def release(self, lease: str) -> None:
+        """Unpin every cached video a job's lease holds"""
+        with self.lru.lock:
+            for path in self._leases.pop(lease, []):
+                self.lru.unpin(path)
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the RunPod serverless job API.
+Emulates /run, /runsync, /status, /stream and /cancel for one endpoint so
+the client's completion tracking can be exercised without a GPU worker.
+Jobs sit IN_QUEUE for --queue-time seconds (longer when all --workers are
+busy), then run for --job-time seconds emitting progress stream items, then
+complete with a small base64 "video". Request bodies over RunPod's limits
+(10MB for /run, 20MB for /runsync) are rejected with 413.
+
+Usage:
+    python runpod_api_stub.py --port 8000 --job-time 5
+    GenerateVideoClient("stub", "key", api_base_url="http://127.0.0.1:8000/v2")
+"""
+
+import argparse
+import base64
+import heapq
+import json
+import logging
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PAYLOAD_LIMITS = {"run": 10 * 1024 * 1024, "runsync": 20 * 1024 * 1024}
+
+
+class StubJob:
+    def __init__(self, job_input: Dict[str, Any], created: float, started: float, job_time: float):
+        self.id = uuid.uuid4().hex
+        self.input = job_input
+        self.created = created
+        self.started = started
+        self.job_time = job_time
+        self.cancelled = False
+        self.streamed = 0
+
+    def status(self) -> str:
+        if self.cancelled:
+            return "CANCELLED"
+        now = time.time()
+        if now < self.started:
+            return "IN_QUEUE"
+        if now < self.started + self.job_time:
+            return "IN_PROGRESS"
+        return "COMPLETED"
+
+    def progress(self) -> int:
+        """Whole percent of the run phase done"""
+        run_elapsed = time.time() - self.started
+        if self.job_time <= 0:
+            return 100
+        return max(0, min(100, int(100 * run_elapsed / self.job_time)))
+
+    def output(self) -> Dict[str, Any]:
+        video = f"stub video for job {self.id}".encode()
+        return {
+            "video": base64.b64encode(video).decode("utf-8"),
+            "generation_time": round(self.job_time, 2)
+        }
+
+    def to_status(self) -> Dict[str, Any]:
+        status = self.status()
+        data = {"id": self.id, "status": status}
+        if status == "COMPLETED":
+            data["output"] = self.output()
+            data["delayTime"] = int((self.started - self.created) * 1000)
+            data["executionTime"] = int(self.job_time * 1000)
+        return data
+
+
+class RunPodStub:
+    def __init__(self, queue_time: float = 0.5, job_time: float = 5.0, runsync_wait: float = 90.0, workers: int = 0):
+        """
+        Initialize stub job store
+
+        Args:
+            queue_time: Minimum seconds each job stays IN_QUEUE
+            job_time: Seconds each job stays IN_PROGRESS
+            runsync_wait: Seconds /runsync blocks before returning an unfinished job
+            workers: Jobs run at once; later jobs queue for a free worker (0 = unlimited)
+        """
+        self.queue_time = queue_time
+        self.job_time = job_time
+        self.runsync_wait = runsync_wait
+        # Time each worker becomes free
+        self.workers = [0.0] * workers
+        self.jobs: Dict[str, StubJob] = {}
+        self.requests: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def count(self, route: str) -> None:
+        with self._lock:
+            self.requests[route] = self.requests.get(route, 0) + 1
+
+    def submit(self, job_input: Dict[str, Any]) -> StubJob:
+        created = time.time()
+        with self._lock:
+            started = created + self.queue_time
+            if self.workers:
+                started = max(started, heapq.heappop(self.workers))
+                heapq.heappush(self.workers, started + self.job_time)
+            job = StubJob(job_input, created, started, self.job_time)
+            self.jobs[job.id] = job
+        return job
+
+    def get(self, job_id: str) -> Optional[StubJob]:
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def stream(self, job: StubJob) -> Dict[str, Any]:
+        """Progress items not yet delivered, one per 10%"""
+        status = job.status()
+        reached = job.progress() // 10 if status in ("IN_PROGRESS", "COMPLETED") else 0
+        items = [{"output": {"progress": step * 10}} for step in range(job.streamed + 1, reached + 1)]
+        job.streamed = max(job.streamed, reached)
+        return {"id": job.id, "status": status, "stream": items}
+
+
+def make_handler(stub: RunPodStub):
+    class StubHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+        def _send(self, code: int, data: Dict[str, Any]) -> None:
+            body = json.dumps(data).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _route(self):
+            # /v2/{endpoint_id}/{route}[/{job_id}]
+            parts = self.path.split("?", 1)[0].strip("/").split("/")
+            if len(parts) < 3 or parts[0] != "v2":
+                return None, None
+            return parts[2], parts[3] if len(parts) > 3 else None
+
+        def do_POST(self):
+            route, job_id = self._route()
+            stub.count(route)
+            if route in ("run", "runsync"):
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length)
+                if length > PAYLOAD_LIMITS[route]:
+                    self._send(413, {"error": f"request body of {length} bytes exceeds {PAYLOAD_LIMITS[route]}"})
+                    return
+                try:
+                    payload = json.loads(body or b"{}")
+                except json.JSONDecodeError:
+                    self._send(400, {"error": "invalid JSON"})
+                    return
+                job = stub.submit(payload.get("input", {}))
+                if route == "run":
+                    self._send(200, {"id": job.id, "status": "IN_QUEUE"})
+                    return
+                deadline = time.time() + stub.runsync_wait
+                while job.status() in ("IN_QUEUE", "IN_PROGRESS") and time.time() < deadline:
+                    time.sleep(0.05)
+                self._send(200, job.to_status())
+            elif route == "cancel":
+                job = stub.get(job_id)
+                if job is None:
+                    self._send(404, {"error": "job not found"})
+                    return
+                job.cancelled = True
+                self._send(200, {"id": job.id, "status": "CANCELLED"})
+            else:
+                self._send(404, {"error": f"unknown route {route}"})
+
+        def do_GET(self):
+            route, job_id = self._route()
+            stub.count(route)
+            job = stub.get(job_id) if job_id else None
+            if route == "health":
+                self._send(200, {"jobs": {"total": len(stub.jobs)}, "requests": stub.requests})
+            elif job is None:
+                self._send(404, {"error": "job not found"})
+            elif route == "status":
+                self._send(200, job.to_status())
+            elif route == "stream":
+                self._send(200, stub.stream(job))
+            else:
+                self._send(404, {"error": f"unknown route {route}"})
+
+    return StubHandler
+
+
+def serve(
+    port: int = 8000,
+    queue_time: float = 0.5,
+    job_time: float = 5.0,
+    runsync_wait: float = 90.0,
+    workers: int = 0
+) -> ThreadingHTTPServer:
+    """Start the stub in a background thread and return the server"""
+    stub = RunPodStub(queue_time, job_time, runsync_wait, workers)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(stub))
+    server.stub = stub
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logger.info(f"🧪 RunPod API stub on http://127.0.0.1:{server.server_port}/v2")
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local RunPod job API stub")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--queue-time", type=float, default=0.5, help="Minimum seconds jobs stay IN_QUEUE")
+    parser.add_argument("--job-time", type=float, default=5.0, help="Seconds jobs stay IN_PROGRESS")
+    parser.add_argument("--runsync-wait", type=float, default=90.0, help="Seconds /runsync blocks before returning")
+    parser.add_argument("--workers", type=int, default=0, help="Jobs run at once (0 = unlimited)")
+    args = parser.parse_args()
+
+    server = serve(args.port, args.queue_time, args.job_time, args.runsync_wait, args.workers)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+S3-compatible object storage for job outputs.
+Videos are streamed from disk with multipart upload and handed back as
+presigned URLs instead of being base64-inlined into the job payload.
+"""
+
+import hashlib
+import logging
+import os
+from typing import Optional, Dict, Any
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger(__name__)
+
+
+class _HashingReader:
+    """File wrapper that hashes and counts bytes as the uploader reads them"""
+
+    def __init__(self, f):
+        self._f = f
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def read(self, size=-1):
+        data = self._f.read(size)
+        self.sha256.update(data)
+        self.size += len(data)
+        return data
+
+
+class ObjectStorage:
+    def __init__(
+        self,
+        bucket: str,
+        endpoint_url: Optional[str] = None,
+        access_key_id: Optional[str] = None,
+        secret_access_key: Optional[str] = None,
+        region: Optional[str] = None,
+        prefix: str = "",
+        presign_expires: int = 3600,
+        chunk_size_mb: int = 8
+    ):
+        """
+        Initialize S3-compatible storage
+
+        Args:
+            bucket: Bucket name
+            endpoint_url: S3 endpoint (AWS, R2, MinIO, moto...); None for AWS default
+            access_key_id: Access key
+            secret_access_key: Secret key
+            region: Region name
+            prefix: Key prefix for all uploads
+            presign_expires: Presigned URL lifetime (seconds)
+            chunk_size_mb: Multipart part size (MB)
+        """
+        self.bucket = bucket
+        self.prefix = prefix
+        self.presign_expires = presign_expires
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url,
+            aws_access_key_id=access_key_id,
+            aws_secret_access_key=secret_access_key,
+            region_name=region,
+            config=Config(signature_version="s3v4", retries={"max_attempts": 5, "mode": "standard"})
+        )
+        chunk_size = chunk_size_mb * 1024 * 1024
+        self.transfer_config = TransferConfig(
+            multipart_threshold=chunk_size,
+            multipart_chunksize=chunk_size,
+            max_concurrency=4
+        )
+
+    @classmethod
+    def from_env(cls) -> Optional["ObjectStorage"]:
+        """Build from BUCKET_* environment variables, or None if no bucket is configured"""
+        bucket = os.getenv("BUCKET_NAME")
+        if not bucket:
+            return None
+        return cls(
+            bucket=bucket,
+            endpoint_url=os.getenv("BUCKET_ENDPOINT_URL") or None,
+            access_key_id=os.getenv("BUCKET_ACCESS_KEY_ID") or None,
+            secret_access_key=os.getenv("BUCKET_SECRET_ACCESS_KEY") or None,
+            region=os.getenv("BUCKET_REGION") or None,
+            prefix=os.getenv("BUCKET_PREFIX", ""),
+            presign_expires=int(os.getenv("BUCKET_PRESIGN_EXPIRES", "3600")),
+            chunk_size_mb=int(os.getenv("BUCKET_CHUNK_SIZE_MB", "8"))
+        )
+
+    def presign(self, key: str) -> str:
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket, "Key": key},
+            ExpiresIn=self.presign_expires
+        )
+
+    def upload_file(self, file_path: str, key: str, content_type: str = "video/mp4") -> Dict[str, Any]:
+        """
+        Stream a file to the bucket
+
+        Args:
+            file_path: Local file to upload
+            key: Object key (prefix is prepended)
+            content_type: Content-Type stored with the object
+
+        Returns:
+            Dict with url, key, size and sha256
+        """
+        full_key = f"{self.prefix}{key}"
+        with open(file_path, "rb") as f:
+            reader = _HashingReader(f)
+            self.client.upload_fileobj(
+                reader, self.bucket, full_key,
+                ExtraArgs={"ContentType": content_type},
+                Config=self.transfer_config
+            )
+        logger.info(f"☁️ Uploaded {file_path} -> s3://{self.bucket}/{full_key} ({reader.size / (1024*1024):.1f}MB)")
+        return {
+            "url": self.presign(full_key),
+            "key": full_key,
+            "size": reader.size,
+            "sha256": reader.sha256.hexdigest()
+        }
+
+    def download_file(self, key: str, file_path: str) -> bool:
+        """
+        Download an object (prefix is prepended to key)
+
+        Returns:
+            True if downloaded, False if the object does not exist
+        """
+        try:
+            self.client.download_file(self.bucket, f"{self.prefix}{key}", file_path, Config=self.transfer_config)
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey"):
+                return False
+            raise
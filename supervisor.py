@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Worker boot supervisor.
+Starts ComfyUI and detects readiness from its log (or a port probe every
+100 ms), and restarts it if it crashes. Model prefetch, workflow validation
+and warmup run alongside it while the handler is imported in this process.
+Every phase is recorded in boot_state, which the handler consults before
+running a job, so no layer polls ComfyUI with sleeps.
+
+Usage:
+    python supervisor.py            (same arguments as handler.py)
+"""
+
+import logging
+import os
+import shlex
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from typing import List, Optional
+
+from boot_state import BootState, state
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Printed by ComfyUI once its HTTP server is listening
+READY_PATTERN = "To see the GUI go to"
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class ComfyProcess:
+    def __init__(
+        self,
+        command: List[str],
+        boot: BootState,
+        port: int = 8188,
+        ready_pattern: str = READY_PATTERN,
+        start_timeout: float = 300,
+        max_restarts: int = 5,
+        probe_interval: float = 0.1
+    ):
+        """
+        Supervised ComfyUI server process
+
+        Args:
+            command: ComfyUI command line
+            boot: Boot state whose "comfy" phase this process drives
+            port: Port probed for readiness
+            ready_pattern: Log line marking the server as ready
+            start_timeout: Seconds a start may take before it is killed and retried
+            max_restarts: Consecutive failed starts/crashes before giving up
+            probe_interval: Seconds between port probes
+        """
+        self.command = command
+        self.boot = boot
+        self.port = port
+        self.ready_pattern = ready_pattern
+        self.start_timeout = start_timeout
+        self.max_restarts = max_restarts
+        self.probe_interval = probe_interval
+        self.process: Optional[subprocess.Popen] = None
+        self.restarts = 0
+        self._ready = False
+        self._lock = threading.Lock()
+        self._stopping = False
+
+    @classmethod
+    def from_env(cls, boot: BootState) -> "ComfyProcess":
+        return cls(
+            # No latent previews: nothing consumes them, and they cost a decode per sampler step
+            command=shlex.split(os.getenv("COMFY_COMMAND", "python /ComfyUI/main.py --listen --fast --preview-method none")),
+            boot=boot,
+            port=int(os.getenv("COMFY_PORT", "8188")),
+            start_timeout=float(os.getenv("COMFY_START_TIMEOUT", "300")),
+            max_restarts=int(os.getenv("COMFY_MAX_RESTARTS", "5"))
+        )
+
+    def start(self) -> None:
+        threading.Thread(target=self._run, name="comfy-supervisor", daemon=True).start()
+
+    def stop(self) -> None:
+        self._stopping = True
+        process = self.process
+        if process is not None and process.poll() is None:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    def _mark_ready(self, started: float, how: str) -> None:
+        with self._lock:
+            if self._ready:
+                return
+            self._ready = True
+        logger.info(f"✅ ComfyUI ready in {time.monotonic() - started:.1f}s ({how})")
+        self.boot.done("comfy", how)
+
+    def _read_log(self, process: subprocess.Popen, started: float) -> None:
+        """Echo ComfyUI's output (the pipe must keep draining) and watch for the ready line"""
+        for line in process.stdout:
+            sys.stdout.write(f"[ComfyUI] {line}")
+            sys.stdout.flush()
+            if not self._ready and self.ready_pattern in line:
+                self._mark_ready(started, "log")
+
+    def _probe(self, process: subprocess.Popen, started: float) -> None:
+        """Port probe, in case the ready line changes between ComfyUI versions"""
+        while not self._ready and process.poll() is None:
+            try:
+                with socket.create_connection(("127.0.0.1", self.port), timeout=0.5):
+                    self._mark_ready(started, "port")
+                    return
+            except OSError:
+                pass
+            if time.monotonic() - started > self.start_timeout:
+                logger.error(f"❌ ComfyUI not ready after {self.start_timeout:.0f}s, killing it")
+                process.kill()
+                return
+            time.sleep(self.probe_interval)
+
+    def _spawn(self) -> subprocess.Popen:
+        logger.info(f"🚀 Starting ComfyUI: {' '.join(self.command)}")
+        started = time.monotonic()
+        self._ready = False
+        process = subprocess.Popen(
+            self.command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            env={**os.environ, "PYTHONUNBUFFERED": "1"},
+            text=True,
+            errors="replace",
+            bufsize=1
+        )
+        self.process = process
+        threading.Thread(target=self._read_log, args=(process, started), name="comfy-log", daemon=True).start()
+        threading.Thread(target=self._probe, args=(process, started), name="comfy-probe", daemon=True).start()
+        return process
+
+    def _run(self) -> None:
+        self.boot.begin("comfy")
+        while not self._stopping:
+            started = time.monotonic()
+            code = self._spawn().wait()
+            if self._stopping:
+                return
+            # A server that stayed up for a while crashed; one that never got going failed to start
+            if self._ready and time.monotonic() - started > 60:
+                self.restarts = 0
+            self.restarts += 1
+            if self.restarts > self.max_restarts:
+                logger.error(f"❌ ComfyUI exited with code {code}; giving up after {self.max_restarts} restarts")
+                self.boot.fail("comfy", f"exited with code {code} after {self.max_restarts} restarts")
+                return
+            delay = min(2 ** (self.restarts - 1), 30)
+            logger.warning(f"💥 ComfyUI exited with code {code}; restarting in {delay}s ({self.restarts}/{self.max_restarts})")
+            self.boot.reset("comfy", f"restarting after exit code {code}")
+            time.sleep(delay)
+
+
+def run_script(script: str, *args: str) -> int:
+    """Run a boot script from this directory; output goes to the worker log"""
+    return subprocess.run([sys.executable, os.path.join(SCRIPT_DIR, script), *args]).returncode
+
+
+def prefetch_models(boot: BootState) -> None:
+    boot.begin("models")
+    start = time.monotonic()
+    if run_script("prefetch_models.py") == 0:
+        boot.done("models", f"{time.monotonic() - start:.1f}s")
+    else:
+        # Jobs still run; ComfyUI downloads missing models on first use
+        logger.warning("⚠ Model prefetch incomplete; ComfyUI will download missing models on first run")
+        boot.fail("models", "prefetch_models.py failed")
+
+
+def validate_workflows(boot: BootState) -> None:
+    boot.wait(("comfy",))
+    boot.begin("validate")
+    if run_script("validate_workflow.py") == 0:
+        boot.done("validate")
+    else:
+        # Don't block jobs - the errors and the node definitions are in the log
+        logger.error("❌ Workflow validation failed! Check node definitions above.")
+        logger.error("📋 To fix: Update the workflow JSON based on the node definitions printed above.")
+        boot.fail("validate", "validate_workflow.py failed")
+
+
+def warm_up(boot: BootState) -> None:
+    if os.getenv("WARMUP_ENABLED", "1") != "1":
+        boot.done("warmup", "disabled")
+        return
+    # One minimal generation at the production resolution, once the models are in place
+    boot.wait(("comfy", "models"))
+    boot.begin("warmup")
+    if run_script("warmup.py") == 0:
+        boot.done("warmup")
+    else:
+        logger.warning("⚠ Warmup failed; the first job will pay cold-start costs")
+        boot.fail("warmup", "warmup.py failed")
+
+
+def run_phase(target, boot: BootState) -> None:
+    def guarded():
+        try:
+            target(boot)
+        except Exception as e:
+            # e.g. ComfyUI never came up; the handler reports that to jobs
+            logger.error(f"❌ Boot phase {target.__name__} failed: {e}")
+    threading.Thread(target=guarded, name=target.__name__, daemon=True).start()
+
+
+def main():
+    boot_start = time.monotonic()
+    comfy = ComfyProcess.from_env(state)
+
+    def shutdown(signum, frame):
+        comfy.stop()
+        sys.exit(0)
+    signal.signal(signal.SIGTERM, shutdown)
+
+    # Models and ComfyUI start together: ComfyUI only opens model files when a
+    # prompt loads them, and warmup waits for both
+    comfy.start()
+    run_phase(prefetch_models, state)
+    run_phase(validate_workflows, state)
+    run_phase(warm_up, state)
+
+    # Importing the handler (torch, runpod, workflow registry) overlaps the boot phases
+    import handler
+    logger.info(f"📦 Handler imported in {time.monotonic() - boot_start:.1f}s (boot phases: {state.to_dict()})")
+
+    try:
+        handler.start()
+    finally:
+        comfy.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+import json
+import os
+import sys
+import uuid
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import comfyui_stub  # noqa: E402
+from comfy_connection import ComfyConnection  # noqa: E402
+
+
+@pytest.fixture
+def workflow_template():
+    with open(os.path.join(ROOT, "new_CogVideoX_api.json")) as f:
+        return json.load(f)
+
+
+@pytest.fixture
+def comfy_stub(tmp_path, workflow_template):
+    """ComfyUI stub on a free port, with no model load or compile delay"""
+    server = comfyui_stub.serve(
+        0,
+        output_dir=str(tmp_path / "output"),
+        workflows=[workflow_template],
+        step_time=0.02,
+        node_time=0.001,
+        load_time=0,
+        compile_time=0
+    )
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def comfy(comfy_stub):
+    """Started ComfyConnection to the stub"""
+    conn = ComfyConnection("127.0.0.1", str(uuid.uuid4()), port=comfy_stub.server_port)
+    conn.start()
+    yield conn
+    conn.close()
@@ -0,0 +1,75 @@
+import socket
+import threading
+
+import pytest
+
+
+def job_prompt(template, seed, steps):
+    prompt = {node_id: dict(node) for node_id, node in template.items()}
+    prompt["8"] = {**prompt["8"], "inputs": {**prompt["8"]["inputs"], "seed": seed, "steps": steps}}
+    return prompt
+
+
+def test_demultiplexes_concurrent_prompts(comfy, workflow_template):
+    results = {}
+
+    def job(seed, steps):
+        messages = []
+        prompt_id = comfy.queue_prompt(job_prompt(workflow_template, seed, steps))["prompt_id"]
+        comfy.wait_for_prompt(prompt_id, on_message=messages.append, timeout=30)
+        results[seed] = (prompt_id, steps, messages)
+
+    threads = [threading.Thread(target=job, args=(seed, steps)) for seed, steps in ((1, 5), (2, 8))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(30)
+
+    assert len(results) == 2
+    for prompt_id, steps, messages in results.values():
+        assert {message["data"]["prompt_id"] for message in messages} == {prompt_id}
+        progress = [message["data"]["value"] for message in messages if message["type"] == "progress"]
+        assert progress == list(range(1, steps + 1))
+        assert messages[-1]["type"] == "executing" and messages[-1]["data"]["node"] is None
+        assert prompt_id in comfy.get_history(prompt_id)
+
+
+def drop_socket(comfy_stub, client_id):
+    """Close the stub's end of a client's WebSocket, as a ComfyUI hiccup would"""
+    comfy_stub.stub.clients[client_id].sock.shutdown(socket.SHUT_RDWR)
+
+
+def test_reconnect_confirms_completion_via_history(comfy, comfy_stub, workflow_template):
+    # Lose the completion message, then the socket: only /history can tell the job finished
+    swallowed = threading.Event()
+    dispatch = comfy._dispatch
+
+    def lossy_dispatch(message):
+        if message["type"] == "executing" and message["data"].get("node") is None:
+            swallowed.set()
+            return
+        dispatch(message)
+
+    comfy._dispatch = lossy_dispatch
+    prompt_id = comfy.queue_prompt(job_prompt(workflow_template, 3, 5))["prompt_id"]
+
+    def drop_when_finished():
+        swallowed.wait(10)
+        comfy._dispatch = dispatch
+        drop_socket(comfy_stub, comfy.client_id)
+
+    dropper = threading.Thread(target=drop_when_finished)
+    dropper.start()
+    comfy.wait_for_prompt(prompt_id, timeout=30)
+    dropper.join(10)
+
+    assert swallowed.is_set()
+    assert comfy.is_healthy()
+
+
+def test_reconnect_reports_lost_prompt(comfy, comfy_stub):
+    timer = threading.Timer(0.2, drop_socket, args=(comfy_stub, comfy.client_id))
+    timer.start()
+    with pytest.raises(Exception, match="lost by ComfyUI"):
+        comfy.wait_for_prompt("never-queued", timeout=30)
+    timer.join()
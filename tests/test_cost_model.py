@@ -0,0 +1,70 @@
+import pytest
+
+from cost_model import CostModel, features
+
+
+def seconds_for(steps, frames, cfg):
+    """Synthetic job: sampler cost from the model's own features, decode and the rest per frame"""
+    sampler = features("sampler", steps, frames, cfg)
+    return {
+        "sampler": 5 + 120 * sampler[1] + 30 * sampler[2],
+        "vae_decode": 2 + 10 * features("vae_decode", steps, frames, cfg)[1],
+        "rest": 1.0,
+    }
+
+
+def job_seconds(steps, frames):
+    return sum(seconds_for(steps, frames, 6.0).values())
+
+
+@pytest.fixture
+def cost_model():
+    model = CostModel(path=None, min_samples=3, margin=1.0, min_steps=20, min_frames=25)
+    for steps, frames in ((50, 81), (25, 49), (40, 33), (30, 81), (20, 25), (50, 49)):
+        model.observe("wf", "balanced", steps, frames, 6.0, seconds_for(steps, frames, 6.0))
+    return model
+
+
+def test_accepts_within_deadline(cost_model):
+    plan = cost_model.plan("wf", "balanced", 50, 81, 6.0, deadline=1000)
+    assert plan["decision"] == "accepted"
+    assert (plan["steps"], plan["frames"]) == (50, 81)
+
+
+@pytest.mark.parametrize("fraction", [0.05, 0.2, 0.4, 0.6, 0.9])
+def test_downgrade_keeps_frames_4k_plus_1(cost_model, fraction):
+    # Between the smallest allowed job (20 steps x 25 frames) and the requested one
+    smallest, full = job_seconds(20, 25), job_seconds(50, 81)
+    deadline = smallest + (full - smallest) * fraction
+    plan = cost_model.plan("wf", "balanced", 50, 81, 6.0, deadline=deadline)
+    assert plan["decision"] == "downgraded"
+    assert (plan["frames"] - 1) % 4 == 0
+    assert 25 <= plan["frames"] <= 81
+    assert 20 <= plan["steps"] <= 50
+    assert plan["estimate_s"] <= deadline
+
+
+def test_downgrade_lowers_steps_before_frames(cost_model):
+    plan = cost_model.plan("wf", "balanced", 50, 81, 6.0, deadline=job_seconds(50, 81) * 0.8)
+    assert plan["decision"] == "downgraded"
+    assert plan["frames"] == 81
+    assert plan["steps"] < 50
+
+
+def test_rejects_when_nothing_fits(cost_model):
+    assert cost_model.plan("wf", "balanced", 50, 81, 6.0, deadline=1)["decision"] == "rejected"
+    deadline = job_seconds(50, 81) * 0.8
+    assert cost_model.plan("wf", "balanced", 50, 81, 6.0, deadline=deadline, policy="reject")["decision"] == "rejected"
+
+
+def test_elapsed_counts_against_deadline(cost_model):
+    plan = cost_model.plan("wf", "balanced", 50, 81, 6.0, deadline=1000, elapsed=999)
+    assert plan["decision"] != "accepted"
+
+
+def test_no_estimate_until_min_samples():
+    model = CostModel(path=None, min_samples=3)
+    model.observe("wf", "balanced", 50, 81, 6.0, seconds_for(50, 81, 6.0))
+    plan = model.plan("wf", "balanced", 50, 81, 6.0, deadline=1)
+    assert plan["decision"] == "no_estimate"
+    assert (plan["steps"], plan["frames"]) == (50, 81)
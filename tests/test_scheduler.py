@@ -0,0 +1,136 @@
+import threading
+import time
+
+import pytest
+
+from scheduler import AffinityScheduler
+
+NODE_FIELDS = {
+    "1": ("model", "workflow"),
+    "2": ("workflow",),
+    "3": ("prompt", "workflow"),
+    "5": ("image", "workflow"),
+}
+
+
+def signature(model="balanced", prompt="a cat", image="a.png"):
+    return {"workflow": "wf", "model": model, "prompt": prompt, "image": image}
+
+
+def run_queued(scheduler, jobs, order, settle=0.05):
+    """Hold the slot, queue jobs (name, signature) in order, then let them through"""
+    release = threading.Event()
+    holding = threading.Event()
+
+    def holder():
+        with scheduler.slot(signature(), NODE_FIELDS):
+            holding.set()
+            release.wait()
+
+    def job(name, sig):
+        with scheduler.slot(sig, NODE_FIELDS) as ticket:
+            order.append((name, ticket.shared_nodes))
+
+    threads = [threading.Thread(target=holder)]
+    threads[0].start()
+    holding.wait(5)
+    for name, sig in jobs:
+        thread = threading.Thread(target=job, args=(name, sig))
+        thread.start()
+        threads.append(thread)
+        time.sleep(settle)
+    return release, threads
+
+
+def test_same_model_first_then_most_shared_nodes():
+    scheduler = AffinityScheduler(max_in_flight=1)
+    order = []
+    release, threads = run_queued(scheduler, [
+        ("other_model_same_prompt", signature(model="quality")),
+        ("same_model_other_prompt", signature(prompt="a dog", image="b.png")),
+        ("same_model_same_prompt", signature(image="b.png")),
+    ], order)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert [name for name, _ in order] == ["same_model_same_prompt", "same_model_other_prompt", "other_model_same_prompt"]
+    assert order[0][1] == ["1", "2", "3"]
+
+
+def test_max_delay_bounds_reordering():
+    scheduler = AffinityScheduler(max_in_flight=1, max_delay=0.2)
+    order = []
+    release, threads = run_queued(scheduler, [
+        ("no_affinity", signature(model="quality", prompt="a dog", image="b.png")),
+        ("affinity", signature()),
+    ], order)
+    time.sleep(0.3)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert [name for name, _ in order] == ["no_affinity", "affinity"]
+
+
+def test_cancelled_waiter_leaves_queue():
+    scheduler = AffinityScheduler(max_in_flight=1, poll_interval=0.01)
+    cancelled = threading.Event()
+    errors = []
+
+    def check():
+        if cancelled.is_set():
+            raise Exception("Job cancelled")
+
+    def waiter():
+        try:
+            with scheduler.slot(signature(), NODE_FIELDS, check):
+                pass
+        except Exception as e:
+            errors.append(str(e))
+
+    with scheduler.slot(signature(), NODE_FIELDS):
+        thread = threading.Thread(target=waiter)
+        thread.start()
+        time.sleep(0.05)
+        assert len(scheduler._waiting) == 1
+        cancelled.set()
+        thread.join(2)
+        assert errors == ["Job cancelled"]
+        assert scheduler._waiting == []
+
+    # The slot is free again for the next job
+    with scheduler.slot(signature(), NODE_FIELDS) as ticket:
+        assert ticket.granted
+
+
+def test_other_workflow_shares_nothing():
+    scheduler = AffinityScheduler(max_in_flight=1)
+    with scheduler.slot(signature(), NODE_FIELDS):
+        pass
+    with scheduler.slot({**signature(), "workflow": "other"}, NODE_FIELDS) as ticket:
+        assert ticket.shared_nodes == []
+
+
+@pytest.mark.parametrize("max_in_flight", [1, 2])
+def test_never_exceeds_max_in_flight(max_in_flight):
+    scheduler = AffinityScheduler(max_in_flight=max_in_flight)
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def job(i):
+        with scheduler.slot(signature(prompt=str(i % 3)), NODE_FIELDS):
+            with lock:
+                active.append(i)
+                peak.append(len(active))
+            time.sleep(0.01)
+            with lock:
+                active.remove(i)
+
+    threads = [threading.Thread(target=job, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert max(peak) == max_in_flight
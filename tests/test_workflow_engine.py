@@ -0,0 +1,37 @@
+import os
+
+from workflow_engine import WorkflowRegistry, node_order
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_node_fields_follow_the_graph():
+    workflow = WorkflowRegistry(os.path.join(ROOT, "workflows.json")).get()
+
+    assert workflow.model_nodes == ["1", "11"]
+    assert workflow.settings_nodes == ["9"]
+    assert workflow.node_fields["2"] == ("workflow",)
+    assert workflow.node_fields["3"] == ("prompt", "workflow")
+    assert workflow.node_fields["6"] == ("image", "workflow")
+    # The image encode also uses the model's VAE
+    assert workflow.node_fields["7"] == ("image", "model", "workflow")
+    assert "seed" in workflow.node_fields["8"] and "profile" not in workflow.node_fields["8"]
+    assert "profile" in workflow.node_fields["9"]
+
+
+def test_signature_separates_profiles():
+    workflow = WorkflowRegistry(os.path.join(ROOT, "workflows.json")).get()
+
+    def signature(profile_name):
+        profile = workflow.profile(profile_name)
+        values = workflow.resolve({"image": "a.png", "seed": 1}, profile)
+        return workflow.signature(values, workflow.build(values, profile.nodes))
+
+    fast, balanced = signature("fast"), signature("balanced")
+    assert fast["model"] != balanced["model"]
+    assert fast["prompt"] == balanced["prompt"]
+    assert signature("fast") == fast
+
+
+def test_node_order_accepts_named_nodes():
+    assert sorted(["10", "preview", "9", "preview_resize", "1"], key=node_order) == ["1", "9", "10", "preview", "preview_resize"]
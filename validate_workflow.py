@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 """
-Validates the workflow JSON against ComfyUI's actual node definitions.
+Validates every registered workflow JSON, and the values its profiles set,
+against ComfyUI's actual node definitions.
 Run this after ComfyUI starts to catch any API mismatches before jobs fail.
 """
 
@@ -9,8 +10,10 @@ import urllib.request
 import sys
 import os
 
+from workflow_engine import WorkflowRegistry
+
 COMFYUI_URL = os.getenv("COMFYUI_URL", "http://127.0.0.1:8188")
-WORKFLOW_PATH = "/new_CogVideoX_api.json"
+WORKFLOW_REGISTRY = os.getenv("WORKFLOW_REGISTRY", "/workflows.json")
 
 
 def get_object_info():
@@ -60,19 +63,55 @@ def validate_workflow(workflow: dict, object_info: dict) -> list:
     return errors
 
 
+def validate_value(node_id: str, class_type: str, input_name: str, value, object_info: dict) -> list:
+    """Check one input value against ComfyUI's spec (combo options, numeric type and range)"""
+    input_def = object_info.get(class_type, {}).get("input", {})
+    spec = input_def.get("required", {}).get(input_name) or input_def.get("optional", {}).get(input_name)
+    if spec is None:
+        return [f"Node {node_id} ({class_type}): Unknown input '{input_name}'"]
+    kind = spec[0]
+    options = spec[1] if len(spec) > 1 and isinstance(spec[1], dict) else {}
+    where = f"Node {node_id} ({class_type}).{input_name}"
+    if isinstance(kind, list):
+        if kind and value not in kind:
+            return [f"{where}: {value!r} is not one of {kind}"]
+    elif kind in ("INT", "FLOAT"):
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or (kind == "INT" and not float(value).is_integer()):
+            return [f"{where}: {value!r} is not {kind}"]
+        if "min" in options and value < options["min"]:
+            return [f"{where}: {value} < min {options['min']}"]
+        if "max" in options and value > options["max"]:
+            return [f"{where}: {value} > max {options['max']}"]
+    elif kind == "BOOLEAN" and not isinstance(value, bool):
+        return [f"{where}: {value!r} is not BOOLEAN"]
+    return []
+
+
+def validate_profiles(compiled, object_info: dict) -> list:
+    """Every profile's node settings must be values ComfyUI accepts"""
+    errors = []
+    for profile in compiled.profiles.values():
+        for node_id, inputs in profile.nodes.items():
+            class_type = compiled.template[node_id].get("class_type")
+            for input_name, value in inputs.items():
+                errors.extend(f"profile '{profile.name}': {error}" for error in validate_value(node_id, class_type, input_name, value, object_info))
+        print(f"✓ Profile '{profile.name}': {sum(len(inputs) for inputs in profile.nodes.values())} node settings, defaults {profile.defaults}")
+    return errors
+
+
 def main():
     print("=" * 50)
     print("🔍 Validating CogVideoX workflow against ComfyUI...")
     print("=" * 50)
     
-    # Load workflow
+    # Load workflows (also checks every binding targets an existing node input)
     try:
-        with open(WORKFLOW_PATH) as f:
-            workflow = json.load(f)
-        print(f"✓ Loaded workflow from {WORKFLOW_PATH}")
-        print(f"  Nodes: {list(workflow.keys())}")
+        registry = WorkflowRegistry(WORKFLOW_REGISTRY, os.getenv("PROFILES_FILE"))
+        for name, compiled in registry.workflows.items():
+            print(f"✓ Loaded workflow '{name}' from {compiled.path}")
+            print(f"  Nodes: {list(compiled.template.keys())}")
     except Exception as e:
-        print(f"❌ Failed to load workflow: {e}")
+        print(f"❌ Failed to load workflows: {e}")
         sys.exit(1)
     
     # Get ComfyUI node definitions
@@ -116,7 +155,11 @@ def main():
     print("🔍 Validating workflow connections...")
     print("=" * 50)
     
-    errors = validate_workflow(workflow, object_info)
+    errors = []
+    for name, compiled in registry.workflows.items():
+        print(f"\n  Workflow '{name}':")
+        errors.extend(f"[{name}] {error}" for error in validate_workflow(compiled.template, object_info))
+        errors.extend(f"[{name}] {error}" for error in validate_profiles(compiled, object_info))
     
     if errors:
         print("\n❌ VALIDATION FAILED:")
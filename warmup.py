@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Startup warmup generation.
+Runs one minimal job (a few frames, one step, but the production resolution
+so compiled shapes match) through each warmed workflow before the handler
+accepts jobs, so model load into VRAM, T5 load, kernel autotuning and
+torch.compile happen at boot instead of in the first real job.
+"""
+
+import json
+import logging
+import os
+import struct
+import sys
+import time
+import uuid
+import zlib
+from typing import Any, Dict, List, Optional
+
+from comfy_connection import ComfyConnection
+from metrics import JobTimings
+from workflow_engine import CompiledWorkflow, WorkflowRegistry
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def write_warmup_image(path: str, width: int = 64, height: int = 64) -> str:
+    """Write a plain grey PNG (the workflow resizes it to the production resolution)"""
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+    rows = b"".join(b"\x00" + b"\x80\x80\x80" * width for _ in range(height))
+    png = (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(rows))
+        + chunk(b"IEND", b"")
+    )
+    with open(path, "wb") as f:
+        f.write(png)
+    return path
+
+
+def warmup_prompt(workflow: CompiledWorkflow, image_path: str, frames: int, steps: int) -> Dict[str, Any]:
+    """Workflow prompt with the smallest job the bindings allow, under the default profile (attention/precision as jobs load them)"""
+    job_input = {"prompt": "warmup", "image": image_path, "length": frames, "steps": steps, "seed": 0}
+    profile = workflow.profile()
+    values = workflow.resolve({field: value for field, value in job_input.items() if field in workflow.bindings}, profile)
+    return workflow.build(values, profile.nodes if profile else None)
+
+
+def run_warmup(
+    conn: ComfyConnection,
+    registry: WorkflowRegistry,
+    names: Optional[List[str]] = None,
+    frames: int = 9,
+    steps: int = 1,
+    timeout: float = 900,
+    image_path: str = "/tmp/warmup_input.png"
+) -> Dict[str, Any]:
+    """
+    Run one warmup generation per workflow
+
+    Args:
+        conn: Started ComfyUI connection
+        registry: Workflow registry
+        names: Workflows to warm (default: the registry default)
+        frames: Frame count for the warmup job
+        steps: Sampler steps for the warmup job
+        timeout: Per-workflow limit (seconds)
+        image_path: Where the warmup input image is written
+
+    Returns:
+        Report with per-workflow seconds and stage/node timings
+    """
+    write_warmup_image(image_path)
+    report: Dict[str, Any] = {"workflows": {}}
+    start = time.time()
+
+    for name in names or [registry.default]:
+        workflow = registry.get(name)
+        prompt = warmup_prompt(workflow, image_path, frames, steps)
+        timings = JobTimings()
+        timings.set_prompt(prompt)
+        logger.info(f"🔥 Warming up '{name}' ({frames} frames, {steps} step)...")
+
+        workflow_start = time.time()
+        prompt_id = conn.queue_prompt(prompt)["prompt_id"]
+        timings.prompt_submitted()
+        conn.wait_for_prompt(prompt_id, timings.on_message, timeout=timeout)
+        seconds = time.time() - workflow_start
+
+        # The warmup video is not needed
+        history = conn.get_history(prompt_id).get(prompt_id, {})
+        for node_output in history.get("outputs", {}).values():
+            for video in node_output.get("gifs", []):
+                if video.get("fullpath") and os.path.exists(video["fullpath"]):
+                    os.remove(video["fullpath"])
+
+        report["workflows"][name] = {
+            "seconds": round(seconds, 3),
+            "frames": frames,
+            "steps": steps,
+            "timings": timings.to_dict(),
+        }
+        logger.info(f"🔥 Warmup '{name}' done in {seconds:.1f}s")
+
+    report["total"] = round(time.time() - start, 3)
+    return report
+
+
+def main():
+    if os.getenv("WARMUP_ENABLED", "1") != "1":
+        print("Warmup disabled (WARMUP_ENABLED=0)")
+        return
+
+    names = [name.strip() for name in os.getenv("WARMUP_WORKFLOWS", "").split(",") if name.strip()]
+    report_path = os.getenv("WARMUP_REPORT", "/tmp/warmup.json")
+
+    conn = ComfyConnection(os.getenv("SERVER_ADDRESS", "127.0.0.1"), f"warmup-{uuid.uuid4()}")
+    try:
+        conn.start()
+        report = run_warmup(
+            conn,
+            WorkflowRegistry.from_env(),
+            names=names or None,
+            frames=int(os.getenv("WARMUP_FRAMES", "9")),
+            steps=int(os.getenv("WARMUP_STEPS", "1")),
+            timeout=float(os.getenv("WARMUP_TIMEOUT", "900"))
+        )
+    except Exception as e:
+        print(f"❌ Warmup failed: {e}")
+        sys.exit(1)
+    finally:
+        conn.close()
+
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Warmup complete in {report['total']:.1f}s (report: {report_path})")
+    for name, entry in report["workflows"].items():
+        print(f"   {name}: {entry['seconds']:.1f}s, stages {entry['timings']['stages']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,384 @@
+"""
+Workflow registry and declarative parameter binding.
+Each ComfyUI API workflow is loaded once at startup and compiled with a
+binding schema (job-input field -> node input, with type, default and
+range). Named profiles bundle performance settings (FasterCache, attention,
+precision, VAE tiling, step count) that jobs select with "profile".
+Per-job prompts are built by copying only the nodes they change.
+Each workflow also knows which job fields every node's output depends on,
+which the scheduler uses to order jobs for ComfyUI cache reuse.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Scheduler signature fields besides the bound ones: the profile's loader /
+# settings nodes (a change reloads the model) and its other node settings
+MODEL_FIELD = "model"
+PROFILE_FIELD = "profile"
+RESERVED_FIELDS = ("workflow", MODEL_FIELD, PROFILE_FIELD)
+
+_TYPES = {
+    "int": int,
+    "float": float,
+    "str": str,
+    "bool": bool,
+}
+
+
+def random_seed() -> int:
+    return int(time.time() * 1000) % (2**32)
+
+
+def node_order(node_id: str):
+    """Sort key for node IDs: numeric ones by value, then named ones (e.g. "preview")"""
+    node_id = str(node_id)
+    return (0, int(node_id), "") if node_id.isdigit() else (1, 0, node_id)
+
+
+class Binding:
+    def __init__(self, field: str, spec: Dict[str, Any]):
+        """
+        Binding of one job-input field to one node input
+
+        Args:
+            field: Job-input field name
+            spec: {"node", "input", "type", "default", "min", "max", "choices"}
+        """
+        self.field = field
+        self.node = str(spec["node"])
+        self.input = spec["input"]
+        self.type = spec.get("type", "str")
+        if self.type not in _TYPES:
+            raise Exception(f"Binding '{field}': unknown type '{self.type}'")
+        self.default = spec.get("default")
+        self.min = spec.get("min")
+        self.max = spec.get("max")
+        self.choices = spec.get("choices")
+
+    def coerce(self, value: Any) -> Any:
+        """Convert and range-check a job-input value"""
+        try:
+            if self.type == "bool" and isinstance(value, str):
+                value = value.lower() in ("1", "true", "yes")
+            elif self.type == "int" and isinstance(value, float) and not value.is_integer():
+                raise ValueError("not an integer")
+            value = _TYPES[self.type](value)
+        except (TypeError, ValueError):
+            raise Exception(f"{self.field} must be {self.type}: {value!r}")
+        if self.min is not None and value < self.min:
+            raise Exception(f"{self.field} must be >= {self.min}: {value}")
+        if self.max is not None and value > self.max:
+            raise Exception(f"{self.field} must be <= {self.max}: {value}")
+        if self.choices is not None and value not in self.choices:
+            raise Exception(f"{self.field} must be one of {self.choices}: {value}")
+        return value
+
+    def default_value(self) -> Any:
+        if self.default == "random":
+            return random_seed()
+        return self.default
+
+
+class Profile:
+    def __init__(self, name: str, spec: Dict[str, Any]):
+        """
+        Named set of performance settings for one workflow
+
+        Args:
+            name: Profile name (job input "profile")
+            spec: {"description", "defaults": {field: value}, "nodes": {node_id: {input: value}}}
+        """
+        self.name = name
+        self.description = spec.get("description")
+        # Defaults for bound fields (job input still wins) and fixed node inputs
+        self.defaults: Dict[str, Any] = dict(spec.get("defaults", {}))
+        self.nodes: Dict[str, Dict[str, Any]] = {str(node_id): dict(inputs) for node_id, inputs in spec.get("nodes", {}).items()}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"name": self.name, "defaults": self.defaults, "nodes": self.nodes}
+
+
+class CompiledWorkflow:
+    def __init__(
+        self,
+        name: str,
+        path: str,
+        bindings: Dict[str, Dict[str, Any]],
+        meta: Optional[Dict[str, Any]] = None,
+        profiles: Optional[Dict[str, Dict[str, Any]]] = None,
+        default_profile: Optional[str] = None
+    ):
+        """
+        Load a workflow file and compile its bindings and profiles
+
+        Args:
+            name: Registry name
+            path: ComfyUI API-format workflow JSON
+            bindings: Field -> binding spec
+            meta: Static facts reported in job outputs (model, fps, ...);
+                "output_node" names the video output node (default: the VHS_VideoCombine node);
+                "input_size" is the [width, height] the workflow resizes its input image to
+            profiles: Profile name -> profile spec
+            default_profile: Profile used when a job names none (None = the bare workflow)
+        """
+        self.name = name
+        self.path = path
+        with open(path, "rb") as f:
+            raw = f.read()
+        # Part of result cache keys, so editing the workflow invalidates old results
+        self.version = hashlib.sha256(raw).hexdigest()
+        self.template = json.loads(raw)
+        self.meta = meta or {}
+        self.bindings = {field: Binding(field, spec) for field, spec in bindings.items()}
+        reserved = set(self.bindings) & set(RESERVED_FIELDS)
+        if reserved:
+            raise Exception(f"Workflow '{name}': binding names {sorted(reserved)} are reserved")
+        self.profiles = {profile_name: Profile(profile_name, spec) for profile_name, spec in (profiles or {}).items()}
+        for profile in self.profiles.values():
+            self._check_profile(profile)
+        if default_profile is not None and default_profile not in self.profiles:
+            raise Exception(f"Workflow '{name}': default profile '{default_profile}' is not defined")
+        self.default_profile = default_profile
+
+        # Input images are preprocessed to this size before ComfyUI sees them
+        self.input_size = tuple(self.meta["input_size"]) if self.meta.get("input_size") else None
+        self.output_node = self.meta.get("output_node") or next(
+            (node_id for node_id, node in self.template.items() if node.get("class_type") == "VHS_VideoCombine"), None
+        )
+
+        for binding in self.bindings.values():
+            node = self.template.get(binding.node)
+            if node is None:
+                raise Exception(f"Workflow '{name}': binding '{binding.field}' targets missing node {binding.node}")
+            if binding.input not in node.get("inputs", {}):
+                raise Exception(
+                    f"Workflow '{name}': binding '{binding.field}' targets unknown input "
+                    f"'{binding.input}' of node {binding.node} ({node.get('class_type')})"
+                )
+
+        self.model_nodes, self.settings_nodes, self.node_fields = self._dependencies()
+
+    def _links(self, node_id: str) -> List[str]:
+        """Nodes whose outputs feed node_id"""
+        return [
+            str(value[0]) for value in self.template[node_id].get("inputs", {}).values()
+            if isinstance(value, list) and len(value) == 2 and str(value[0]) in self.template
+        ]
+
+    def _dependencies(self) -> Tuple[List[str], List[str], Dict[str, Tuple[str, ...]]]:
+        """
+        Split profile-set nodes into model nodes (no upstream links: loaders,
+        FasterCache) and other settings nodes, and map every node to the
+        signature fields its output depends on; ComfyUI reuses a node's cached
+        output when all of them match the previous prompt
+        """
+        profile_nodes = sorted({node_id for profile in self.profiles.values() for node_id in profile.nodes}, key=node_order)
+        model_nodes = [node_id for node_id in profile_nodes if not self._links(node_id)]
+        settings_nodes = [node_id for node_id in profile_nodes if node_id not in model_nodes]
+
+        own: Dict[str, set] = {}
+        for binding in self.bindings.values():
+            own.setdefault(binding.node, set()).add(binding.field)
+        for node_id in model_nodes:
+            own.setdefault(node_id, set()).add(MODEL_FIELD)
+        for node_id in settings_nodes:
+            own.setdefault(node_id, set()).add(PROFILE_FIELD)
+
+        fields: Dict[str, set] = {}
+        def depends_on(node_id: str) -> set:
+            if node_id not in fields:
+                fields[node_id] = set(own.get(node_id, ()))
+                for upstream in self._links(node_id):
+                    fields[node_id] |= depends_on(upstream)
+            return fields[node_id]
+
+        # Nodes of different workflows never share cached outputs
+        node_fields = {
+            node_id: tuple(sorted(depends_on(node_id) | {"workflow"})) for node_id in sorted(self.template, key=node_order)
+        }
+        return model_nodes, settings_nodes, node_fields
+
+    def signature(self, values: Dict[str, Any], prompt: Dict[str, Any]) -> Dict[str, str]:
+        """
+        Scheduler signature of a job (field -> value), matched against node_fields
+
+        Args:
+            values: Field -> value (from resolve)
+            prompt: Per-job prompt (from build), for the profile's node settings
+        """
+        def settings(node_ids: List[str]) -> str:
+            return json.dumps({node_id: prompt[node_id]["inputs"] for node_id in node_ids}, sort_keys=True)
+
+        signature = {field: json.dumps(value, sort_keys=True) for field, value in values.items()}
+        signature["workflow"] = self.name
+        signature[MODEL_FIELD] = settings(self.model_nodes)
+        signature[PROFILE_FIELD] = settings(self.settings_nodes)
+        return signature
+
+    def _check_profile(self, profile: Profile) -> None:
+        """Profile settings must target existing, unbound node inputs and valid field values"""
+        bound = {(binding.node, binding.input) for binding in self.bindings.values()}
+        for field, value in profile.defaults.items():
+            if field not in self.bindings:
+                raise Exception(f"Workflow '{self.name}': profile '{profile.name}' sets unknown field '{field}'")
+            profile.defaults[field] = self.bindings[field].coerce(value)
+        for node_id, inputs in profile.nodes.items():
+            node = self.template.get(node_id)
+            if node is None:
+                raise Exception(f"Workflow '{self.name}': profile '{profile.name}' targets missing node {node_id}")
+            for input_name in inputs:
+                if input_name not in node.get("inputs", {}):
+                    raise Exception(
+                        f"Workflow '{self.name}': profile '{profile.name}' targets unknown input "
+                        f"'{input_name}' of node {node_id} ({node.get('class_type')})"
+                    )
+                if (node_id, input_name) in bound:
+                    raise Exception(
+                        f"Workflow '{self.name}': profile '{profile.name}' sets bound input "
+                        f"{node_id}.{input_name}; use \"defaults\" for job-input fields"
+                    )
+
+    def profile(self, name: Optional[str] = None) -> Optional[Profile]:
+        """Named profile, else the default one (None if the workflow has no default)"""
+        name = name or self.default_profile
+        if name is None:
+            return None
+        if name not in self.profiles:
+            raise Exception(f"Unknown profile '{name}' for workflow '{self.name}'. Available: {list(self.profiles)}")
+        return self.profiles[name]
+
+    def resolve(self, job_input: Dict[str, Any], profile: Optional[Profile] = None) -> Dict[str, Any]:
+        """Validated value for every bound field (job input, else profile default, else default)"""
+        values = {}
+        for field, binding in self.bindings.items():
+            if field in job_input and job_input[field] is not None:
+                values[field] = binding.coerce(job_input[field])
+            elif profile is not None and field in profile.defaults:
+                values[field] = profile.defaults[field]
+            else:
+                default = binding.default_value()
+                if default is None:
+                    # Keep whatever the workflow file has
+                    default = self.template[binding.node]["inputs"][binding.input]
+                values[field] = default
+        return values
+
+    def build(self, values: Dict[str, Any], overrides: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """
+        Per-job prompt: the template with only mutated nodes copied
+
+        Args:
+            values: Field -> value (from resolve)
+            overrides: Extra node_id -> {input: value} to apply
+        """
+        changes: Dict[str, Dict[str, Any]] = {}
+        for field, value in values.items():
+            binding = self.bindings.get(field)
+            if binding is not None:
+                changes.setdefault(binding.node, {})[binding.input] = value
+        for node_id, inputs in (overrides or {}).items():
+            changes.setdefault(str(node_id), {}).update(inputs)
+
+        prompt = dict(self.template)
+        for node_id, inputs in changes.items():
+            node = dict(self.template[node_id])
+            node["inputs"] = {**node["inputs"], **inputs}
+            prompt[node_id] = node
+        return prompt
+
+    def preview_prompt(self, prompt: Dict[str, Any], size: int = 360, fmt: str = "image/webp") -> Dict[str, Any]:
+        """
+        Prompt that saves a small animated preview instead of the output video
+
+        Every other node keeps its ID and inputs, so when this is queued right
+        before prompt, ComfyUI serves prompt's shared nodes from its cache and
+        only the final video encode runs twice.
+
+        Args:
+            prompt: Per-job prompt (from build)
+            size: Longest side of the preview (pixels)
+            fmt: VHS_VideoCombine format, e.g. "image/webp" or "image/gif"
+        """
+        if self.output_node is None or self.output_node not in prompt:
+            raise Exception(f"Workflow '{self.name}' has no video output node to preview")
+        output = prompt[self.output_node]
+        preview = {node_id: node for node_id, node in prompt.items() if node_id != self.output_node}
+        preview["preview_resize"] = {
+            "class_type": "ImageResizeKJ",
+            "inputs": {
+                "width": size,
+                "height": size,
+                "upscale_method": "bilinear",
+                "keep_proportion": True,
+                "divisible_by": 2,
+                "image": output["inputs"]["images"],
+            },
+            "_meta": {"title": "Preview Resize", "label": "preview"},
+        }
+        preview["preview"] = {
+            "class_type": output["class_type"],
+            "inputs": {
+                **output["inputs"],
+                "format": fmt,
+                "filename_prefix": f"preview_{output['inputs'].get('filename_prefix', self.name)}",
+                # Written to ComfyUI's temp directory
+                "save_output": False,
+                "images": ["preview_resize", 0],
+            },
+            "_meta": {"title": "Preview", "label": "preview"},
+        }
+        return preview
+
+
+class WorkflowRegistry:
+    def __init__(self, registry_path: str, profiles_path: Optional[str] = None):
+        """
+        Load and compile every workflow listed in a registry file
+
+        Args:
+            registry_path: JSON with "default" and "workflows": {name: {path, bindings, meta, profiles, default_profile}}
+            profiles_path: Optional JSON {"workflows": {name: {profiles, default_profile}}} adding or
+                replacing profiles of registered workflows
+        """
+        with open(registry_path) as f:
+            registry = json.load(f)
+        extra = {}
+        if profiles_path:
+            with open(profiles_path) as f:
+                extra = json.load(f).get("workflows", {})
+            unknown = set(extra) - set(registry["workflows"])
+            if unknown:
+                raise Exception(f"{profiles_path}: profiles for unknown workflows {sorted(unknown)}")
+        base_dir = os.path.dirname(os.path.abspath(registry_path))
+        self.workflows: Dict[str, CompiledWorkflow] = {}
+        for name, entry in registry["workflows"].items():
+            path = entry["path"]
+            if not os.path.isabs(path):
+                path = os.path.join(base_dir, path)
+            custom = extra.get(name, {})
+            profiles = {**entry.get("profiles", {}), **custom.get("profiles", {})}
+            default_profile = custom.get("default_profile", entry.get("default_profile"))
+            workflow = CompiledWorkflow(name, path, entry.get("bindings", {}), entry.get("meta"), profiles, default_profile)
+            self.workflows[name] = workflow
+            logger.info(
+                f"🧩 Workflow '{name}': {len(workflow.bindings)} bindings, profiles {list(workflow.profiles)} "
+                f"(default: {workflow.default_profile}) from {path}"
+            )
+        self.default = registry.get("default") or next(iter(self.workflows))
+
+    @classmethod
+    def from_env(cls) -> "WorkflowRegistry":
+        return cls(os.getenv("WORKFLOW_REGISTRY", "/workflows.json"), os.getenv("PROFILES_FILE"))
+
+    def get(self, name: Optional[str] = None) -> CompiledWorkflow:
+        name = name or self.default
+        if name not in self.workflows:
+            raise Exception(f"Unknown workflow '{name}'. Available: {list(self.workflows)}")
+        return self.workflows[name]